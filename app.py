@@ -2,7 +2,7 @@
 import os
 import tkinter as tk
 
-from core import (
+from theme import (
     APP_BG,
     TEXT_FG,
     SUBTLE_FG,
@@ -11,8 +11,6 @@ from core import (
     FONT_TITLE,
     FONT_STATUS,
 )
-from config_page import ConfigPage
-from start_point_page import StartPointPage
 
 
 class App(tk.Tk):
@@ -86,17 +84,13 @@ class App(tk.Tk):
         # Shared state
         self.image_path = None
         self.img = None
-        self.params = {}  # scale, step, threshold, delay
+        self.mask = None  # bitmask.PackedMask when the image is too big to load whole
+        self.plan = None  # compiled StrokePlan for the current image
+        self.plan_key = None  # plan cache key for image_path + params
+        self.params = {}  # scale, step, threshold, tolerance, rate (px/s), mode
         self.img_width = 0
         self.img_height = 0
 
-        # Create pages
-        self.frames["config"] = ConfigPage(parent=self.main_container, controller=self)
-        self.frames["start"] = StartPointPage(parent=self.main_container, controller=self)
-
-        for f in self.frames.values():
-            f.grid(row=0, column=0, sticky="nsew")
-
         # =========================
         # BOTTOM STATUS BAR
         # =========================
@@ -113,9 +107,25 @@ class App(tk.Tk):
         )
         self.status_bar.pack(fill="x", side="bottom", pady=(5, 0), padx=2)
 
+        # Paint the window before the pages pull in NumPy and the planner
+        self.global_status_var.set("Loading…")
+        self.update()
+        self._build_pages()
+
         # show first page
         self.show_frame("config")
 
+    def _build_pages(self):
+        # Imported here, not at module level, so startup only needs tkinter
+        from config_page import ConfigPage
+        from start_point_page import StartPointPage
+
+        self.frames["config"] = ConfigPage(parent=self.main_container, controller=self)
+        self.frames["start"] = StartPointPage(parent=self.main_container, controller=self)
+
+        for f in self.frames.values():
+            f.grid(row=0, column=0, sticky="nsew")
+
     # -------------------------
     # PAGE CONTROL
     # -------------------------
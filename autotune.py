@@ -0,0 +1,274 @@
+# autotune.py
+"""
+Budget-driven search for step / threshold / tolerance / mode.
+
+    python autotune.py input.png --scale 0.5 --max-events 200000
+    python autotune.py input.png --max-minutes 10 --backend pyautogui
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+from PIL import Image
+
+from core import estimate_job, format_duration, load_and_prepare_image
+from parallel import process_pool
+from planner import PLANNER_MODES, dark_mask, plan_image
+from simplify import simplify_plan
+from stroke_plan import rasterize
+
+# =======================
+# SEARCH SPACE
+# =======================
+
+DEFAULT_STEPS = (1, 2, 3, 4, 6, 8)
+# Offsets below the reference threshold: lighter thresholds drop faint ink
+DEFAULT_THRESHOLD_DROPS = (0, 20, 40, 60, 80)
+DEFAULT_TOLERANCES = (0, 1, 2)
+DEFAULT_MODES = ("rows", "outline")
+
+# Fidelity is judged on view x view pixel blocks, roughly how a drawing is seen
+DEFAULT_VIEW = 4
+
+
+# =======================
+# FIDELITY
+# =======================
+
+def coverage(mask: np.ndarray, view: int) -> np.ndarray:
+    """Inked share of each view x view block, as uint8 (255 = fully inked)."""
+    # Pillow's box reduce is far faster than a NumPy reshape-mean here
+    pixels = mask.view(np.uint8) * np.uint8(255)
+    return np.asarray(Image.fromarray(pixels, mode="L").reduce(view))
+
+
+def fidelity(reference: np.ndarray, drawn: np.ndarray) -> float:
+    """Soft IoU of two coverage grids: 1.0 is identical, 0.0 disjoint."""
+    union = int(np.maximum(reference, drawn).sum(dtype=np.int64))
+    if union == 0:
+        return 1.0
+    return int(np.minimum(reference, drawn).sum(dtype=np.int64)) / union
+
+
+# =======================
+# CANDIDATE EVALUATION
+# =======================
+
+# Per-process state, set once by _init_worker so tasks carry only parameters
+_worker = {}
+
+
+def _init_worker(name, shape, ref_threshold, view, seconds_per_event, rate):
+    if name is None:
+        arr = shape  # in-process: the array itself
+        shm = None
+    else:
+        shm = shared_memory.SharedMemory(name=name)
+        arr = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    _worker.update(
+        shm=shm,
+        arr=arr,
+        view=view,
+        seconds_per_event=seconds_per_event,
+        rate=rate,
+        # The target every candidate is scored against, computed once per worker
+        reference=coverage(dark_mask(arr, 1, ref_threshold), view),
+    )
+
+
+class _ArrayImage:
+    """Just enough of a PIL image for plan_image, over a shared array."""
+
+    def __init__(self, arr):
+        self._arr = arr
+        self.size = (arr.shape[1], arr.shape[0])
+
+    def __array__(self, dtype=None, copy=None):
+        return self._arr if dtype is None else self._arr.astype(dtype, copy=False)
+
+
+def _evaluate(task):
+    """Worker: plan one (mode, step, threshold) and score it per tolerance."""
+    mode, step, threshold, tolerances = task
+    arr = _worker["arr"]
+    results = []
+    base = plan_image(_ArrayImage(arr), step, threshold, mode)
+    # Two-point row strokes have nothing to simplify
+    for tolerance in (tolerances if mode != "rows" else (0,)):
+        plan = simplify_plan(base, tolerance)
+        drawn = coverage(rasterize(plan, arr.shape), _worker["view"])
+        est = estimate_job(plan, _worker["seconds_per_event"] or 0.0, _worker["rate"])
+        results.append({
+            "mode": mode,
+            "step": step,
+            "threshold": threshold,
+            "tolerance": tolerance,
+            "strokes": plan.num_strokes,
+            "events": est["events"],
+            "ink_px": round(est["ink_px"], 1),
+            "duration_s": round(est["duration_s"], 2) if _worker["seconds_per_event"] else None,
+            "fidelity": round(fidelity(_worker["reference"], drawn), 4),
+        })
+    return results
+
+
+def _pareto(candidates):
+    """Candidates no other candidate beats on both events and fidelity."""
+    front = []
+    best = -1.0
+    for c in sorted(candidates, key=lambda c: (c["events"], -c["fidelity"])):
+        if c["fidelity"] > best:
+            front.append(c)
+            best = c["fidelity"]
+    return front
+
+
+# =======================
+# SEARCH
+# =======================
+
+def autotune(img,
+             threshold: int = 200,
+             max_events: int = None,
+             max_seconds: float = None,
+             seconds_per_event: float = None,
+             rate: float = 0,
+             modes=DEFAULT_MODES,
+             steps=DEFAULT_STEPS,
+             thresholds=None,
+             tolerances=DEFAULT_TOLERANCES,
+             view: int = DEFAULT_VIEW,
+             workers: int = None) -> dict:
+    """
+    Find the settings that best reproduce `img` within a budget.
+
+    Every candidate is planned headlessly, replayed with a vectorized
+    rasterizer and scored by fidelity(): coverage of view x view blocks
+    against the source thresholded at `threshold`. Event counts and
+    durations come from core.estimate_job; max_seconds needs the backend's
+    seconds_per_event (backends.calibrate). Planning is shared across
+    tolerances, and the image sits in shared memory for the process pool.
+
+    Returns {"best", "candidates", "pareto", "elapsed_s"}; best is None
+    when nothing fits.
+    """
+    if max_seconds is not None and not seconds_per_event:
+        raise ValueError("max_seconds needs the backend's seconds_per_event.")
+    for mode in modes:
+        if mode not in PLANNER_MODES:
+            raise ValueError(f"Unknown planner mode: {mode!r}")
+    if thresholds is None:
+        thresholds = sorted({max(1, threshold - d) for d in DEFAULT_THRESHOLD_DROPS})
+
+    t0 = time.perf_counter()
+    arr = np.ascontiguousarray(np.asarray(img, dtype=np.uint8))
+    # Most expensive first, so the pool isn't left waiting on a straggler
+    tasks = sorted(
+        ((mode, step, thr, tuple(tolerances))
+         for mode, step, thr in itertools.product(modes, steps, thresholds)),
+        key=lambda t: (t[0] == "rows", t[1]),
+    )
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+
+    init = (threshold, view, seconds_per_event, rate)
+    if workers < 2:
+        _init_worker(None, arr, *init)
+        try:
+            parts = [_evaluate(task) for task in tasks]
+        finally:
+            _worker.clear()
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        try:
+            np.ndarray(arr.shape, dtype=np.uint8, buffer=shm.buf)[:] = arr
+            with process_pool(workers, initializer=_init_worker,
+                              initargs=(shm.name, arr.shape) + init) as pool:
+                parts = list(pool.map(_evaluate, tasks))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    candidates = [c for part in parts for c in part]
+    for c in candidates:
+        c["fits"] = (
+            (max_events is None or c["events"] <= max_events)
+            and (max_seconds is None or c["duration_s"] <= max_seconds)
+        )
+    fitting = [c for c in candidates if c["fits"]]
+    best = max(fitting, key=lambda c: (c["fidelity"], -c["events"]), default=None)
+
+    return {
+        "best": best,
+        "candidates": candidates,
+        "pareto": _pareto(candidates),
+        "elapsed_s": round(time.perf_counter() - t0, 3),
+    }
+
+
+def describe(candidate) -> str:
+    """One line for logs and dialogs."""
+    c = candidate
+    line = (f"{c['mode']:<8} step={c['step']:<2} thr={c['threshold']:<3} "
+            f"tol={c['tolerance']:<3g} events={c['events']:>9,} "
+            f"fidelity={c['fidelity']:.3f}")
+    if c.get("duration_s") is not None:
+        line += f"  ~{format_duration(c['duration_s'])}"
+    return line
+
+
+# =======================
+# CLI
+# =======================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("image")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--threshold", type=int, default=200,
+                        help="reference threshold the fidelity is measured against")
+    parser.add_argument("--max-events", type=int)
+    parser.add_argument("--max-minutes", type=float)
+    parser.add_argument("--backend", default="pyautogui",
+                        help="backend calibrated for --max-minutes (moves the cursor)")
+    parser.add_argument("--rate", type=float, default=0, help="draw rate in px/s (0 = unlimited)")
+    parser.add_argument("--modes", nargs="+", default=list(DEFAULT_MODES))
+    parser.add_argument("--steps", type=int, nargs="+", default=list(DEFAULT_STEPS))
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args(argv)
+
+    seconds_per_event = None
+    if args.max_minutes is not None:
+        from backends import calibrate
+        seconds_per_event = calibrate(args.backend)
+
+    img = load_and_prepare_image(args.image, args.scale)
+    result = autotune(
+        img,
+        threshold=args.threshold,
+        max_events=args.max_events,
+        max_seconds=args.max_minutes * 60 if args.max_minutes is not None else None,
+        seconds_per_event=seconds_per_event,
+        rate=args.rate,
+        modes=args.modes,
+        steps=args.steps,
+        workers=args.workers,
+    )
+
+    print(f"Searched {len(result['candidates'])} candidates in {result['elapsed_s']:.2f}s.")
+    print("Tradeoff curve (fewest events first):")
+    for c in result["pareto"]:
+        print(("  * " if c is result["best"] else "    ") + describe(c))
+    if result["best"] is None:
+        print("Nothing fits the budget.")
+        return 1
+    print("Best within budget:", describe(result["best"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
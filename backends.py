@@ -0,0 +1,388 @@
+# backends.py
+import random
+import time
+
+# =======================
+# OUTPUT BACKENDS
+# =======================
+
+
+class DrawingAborted(Exception):
+    """Raised by a backend when the user triggers the abort failsafe."""
+
+
+class OutputBackend:
+    """
+    Where the executor sends mouse events. Coordinates are absolute
+    screen pixels; begin()/end() bracket one drawing job.
+    """
+
+    name = "base"
+
+    def begin(self) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+    def move_to(self, x: int, y: int) -> None:
+        raise NotImplementedError
+
+    def mouse_down(self) -> None:
+        raise NotImplementedError
+
+    def mouse_up(self) -> None:
+        raise NotImplementedError
+
+    def capture(self, left: int, top: int, width: int, height: int):
+        """Gray (height, width) uint8 pixels of a screen rectangle (see verify.py)."""
+        raise NotImplementedError(f"The {self.name} backend can't capture the screen.")
+
+    def pause_requested(self) -> bool:
+        """
+        True while the user holds the pointer in the top-right corner of the
+        screen, the pause counterpart of the top-left abort corner. Works
+        whichever window has focus; backends without a real pointer never pause.
+        The executor asks before every move, so this should be cheap.
+        """
+        return False
+
+
+class PyAutoGUIBackend(OutputBackend):
+    """Real cursor output through pyautogui (the default)."""
+
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+        self._pyautogui = pyautogui
+        self._width = None
+
+    def begin(self) -> None:
+        # Safety: allow moving mouse to top-left corner to abort
+        self._pyautogui.FAILSAFE = True
+        # Extra speed: remove global pause between actions
+        self._pyautogui.PAUSE = 0
+        self._width = self._pyautogui.size()[0]
+
+    def move_to(self, x, y):
+        try:
+            self._pyautogui.moveTo(x, y)
+        except self._pyautogui.FailSafeException as e:
+            raise DrawingAborted(str(e)) from e
+
+    def mouse_down(self):
+        try:
+            self._pyautogui.mouseDown()
+        except self._pyautogui.FailSafeException as e:
+            raise DrawingAborted(str(e)) from e
+
+    def mouse_up(self):
+        try:
+            self._pyautogui.mouseUp()
+        except self._pyautogui.FailSafeException as e:
+            raise DrawingAborted(str(e)) from e
+
+    def capture(self, left, top, width, height):
+        import numpy as np
+        shot = self._pyautogui.screenshot(region=(left, top, width, height))
+        return np.asarray(shot.convert("L"))
+
+    def pause_requested(self):
+        x, y = self._pyautogui.position()
+        return y == 0 and x >= (self._width or self._pyautogui.size()[0]) - 1
+
+
+class XTestBackend(OutputBackend):
+    """
+    Linux-only output that sends motion and button events straight to the
+    X server through the XTEST extension (python-xlib), skipping pyautogui's
+    per-call Python layers.
+
+    Requests are buffered and flushed every `flush_every` events and at
+    every mouse_up. On each flush the pointer is queried, and if it sits in
+    the top-left corner we raise DrawingAborted, like pyautogui's failsafe;
+    the same query answers pause_requested until the next flush.
+    Works against any X server, including a local Xvfb (set DISPLAY).
+    """
+
+    name = "xtest"
+
+    def __init__(self, display_name: str = None, flush_every: int = 64):
+        try:
+            from Xlib import X, display
+            from Xlib.ext import xtest
+        except ImportError as e:
+            raise RuntimeError(
+                "The xtest backend needs python-xlib (pip install python-xlib)."
+            ) from e
+
+        self._X = X
+        self._fake_input = xtest.fake_input
+        self._display = display.Display(display_name)
+        if not self._display.has_extension("XTEST"):
+            raise RuntimeError("The X server does not support the XTEST extension.")
+        self._root = self._display.screen().root
+        self.flush_every = max(1, flush_every)
+        self._pending = 0
+        self._down = False
+        self._width = self._display.screen().width_in_pixels
+        self._in_pause_corner = False
+
+    def _check_failsafe(self):
+        pointer = self._root.query_pointer()
+        if pointer.root_x == 0 and pointer.root_y == 0:
+            raise DrawingAborted("Mouse moved to the top-left corner.")
+        self._in_pause_corner = pointer.root_y == 0 and pointer.root_x >= self._width - 1
+
+    def pause_requested(self):
+        # A pointer query per move would defeat the buffering; each query
+        # answers once, so a resume doesn't pause again on a stale reading
+        requested, self._in_pause_corner = self._in_pause_corner, False
+        return requested
+
+    def _queued(self):
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self._display.flush()
+        self._pending = 0
+        self._check_failsafe()
+
+    def begin(self):
+        self._check_failsafe()
+
+    def end(self):
+        # Never leave the button held, e.g. after an abort mid-stroke
+        if self._down:
+            self._fake_input(self._display, self._X.ButtonRelease, 1)
+            self._down = False
+        self._display.sync()
+
+    def move_to(self, x, y):
+        self._fake_input(self._display, self._X.MotionNotify, x=int(x), y=int(y))
+        self._queued()
+
+    def mouse_down(self):
+        self._fake_input(self._display, self._X.ButtonPress, 1)
+        self._down = True
+        self._queued()
+
+    def mouse_up(self):
+        self._fake_input(self._display, self._X.ButtonRelease, 1)
+        self._down = False
+        self.flush()
+
+    def capture(self, left, top, width, height):
+        import numpy as np
+        from PIL import Image
+
+        self._display.sync()
+        raw = self._root.get_image(left, top, width, height, self._X.ZPixmap, 0xFFFFFFFF)
+        # 24/32-bit TrueColor visuals deliver BGRX pixels
+        shot = Image.frombytes("RGB", (width, height), raw.data, "raw", "BGRX")
+        return np.asarray(shot.convert("L"))
+
+
+class SimulatedCanvasBackend(OutputBackend):
+    """
+    Headless output: rasterizes drags into an in-memory canvas.
+
+    The canvas covers the screen rectangle starting at (origin_x, origin_y);
+    pen-down segments are drawn as 1px lines in black on white, anything
+    outside the canvas is clipped.
+
+    drop_rate loses that fraction of moves and button presses, like a busy
+    target application dropping or coalescing synthetic input; a dropped
+    move leaves the pointer where it was. `dropped` counts them.
+    """
+
+    name = "simulated"
+
+    def __init__(self, width: int, height: int, origin_x: int = 0, origin_y: int = 0,
+                 drop_rate: float = 0.0, seed: int = None):
+        import numpy as np
+        self._np = np
+        self.canvas = np.full((height, width), 255, dtype=np.uint8)
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        self.x = 0
+        self.y = 0
+        self.down = False
+        self.drop_rate = drop_rate
+        self.dropped = 0
+        self._random = random.Random(seed)
+
+    def _drop(self) -> bool:
+        if self.drop_rate and self._random.random() < self.drop_rate:
+            self.dropped += 1
+            return True
+        return False
+
+    def _plot(self, xs, ys):
+        h, w = self.canvas.shape
+        xs = xs - self.origin_x
+        ys = ys - self.origin_y
+        inside = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+        self.canvas[ys[inside], xs[inside]] = 0
+
+    def move_to(self, x, y):
+        if self._drop():
+            return
+        if self.down:
+            np = self._np
+            n = max(abs(x - self.x), abs(y - self.y)) + 1
+            xs = np.rint(np.linspace(self.x, x, n)).astype(np.int64)
+            ys = np.rint(np.linspace(self.y, y, n)).astype(np.int64)
+            self._plot(xs, ys)
+        self.x, self.y = x, y
+
+    def mouse_down(self):
+        if self._drop():
+            return
+        self.down = True
+        self._plot(self._np.array([self.x]), self._np.array([self.y]))
+
+    def mouse_up(self):
+        self.down = False
+
+    def mask(self):
+        """Boolean array of the pixels that have been drawn."""
+        return self.canvas == 0
+
+    def image(self):
+        from PIL import Image
+        return Image.fromarray(self.canvas, mode="L")
+
+    def capture(self, left, top, width, height):
+        """The canvas under a screen rectangle; anything off the canvas is paper."""
+        out = self._np.full((height, width), 255, dtype=self._np.uint8)
+        h, w = self.canvas.shape
+        x0, y0 = left - self.origin_x, top - self.origin_y
+        cx0, cy0 = max(0, x0), max(0, y0)
+        cx1, cy1 = min(w, x0 + width), min(h, y0 + height)
+        if cx0 < cx1 and cy0 < cy1:
+            out[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0] = self.canvas[cy0:cy1, cx0:cx1]
+        return out
+
+
+class RecordingBackend(OutputBackend):
+    """
+    Captures the event stream as (timestamp, kind, x, y) tuples, with
+    perf_counter timestamps. Optionally forwards every event to `inner`.
+    """
+
+    name = "recording"
+
+    def __init__(self, inner: OutputBackend = None):
+        self.inner = inner
+        self.events = []
+        self.x = 0
+        self.y = 0
+
+    def begin(self):
+        if self.inner is not None:
+            self.inner.begin()
+
+    def end(self):
+        if self.inner is not None:
+            self.inner.end()
+
+    def move_to(self, x, y):
+        self.x, self.y = x, y
+        self.events.append((time.perf_counter(), "move", x, y))
+        if self.inner is not None:
+            self.inner.move_to(x, y)
+
+    def mouse_down(self):
+        self.events.append((time.perf_counter(), "down", self.x, self.y))
+        if self.inner is not None:
+            self.inner.mouse_down()
+
+    def mouse_up(self):
+        self.events.append((time.perf_counter(), "up", self.x, self.y))
+        if self.inner is not None:
+            self.inner.mouse_up()
+
+    def capture(self, left, top, width, height):
+        if self.inner is None:
+            return super().capture(left, top, width, height)
+        return self.inner.capture(left, top, width, height)
+
+    def pause_requested(self):
+        return self.inner is not None and self.inner.pause_requested()
+
+    def counts(self) -> dict:
+        """Number of recorded events per kind."""
+        result = {"move": 0, "down": 0, "up": 0}
+        for _, kind, _, _ in self.events:
+            result[kind] += 1
+        return result
+
+
+BACKENDS = {
+    PyAutoGUIBackend.name: PyAutoGUIBackend,
+    XTestBackend.name: XTestBackend,
+    SimulatedCanvasBackend.name: SimulatedCanvasBackend,
+    RecordingBackend.name: RecordingBackend,
+}
+
+
+# Backends that drive the real screen and can be picked in the UI
+SCREEN_BACKENDS = (PyAutoGUIBackend.name, XTestBackend.name)
+
+
+def get_backend(name: str, **kwargs) -> OutputBackend:
+    """Instantiate an output backend by name."""
+    try:
+        cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown output backend: {name!r}") from None
+    return cls(**kwargs)
+
+
+def measure_events_per_sec(backend: OutputBackend, events: int = 2000,
+                           x: int = 100, y: int = 100) -> float:
+    """
+    Time `events` pen-up moves around a small square near (x, y) and return
+    the sustained events per second for this backend.
+    """
+    square = ((x, y), (x + 10, y), (x + 10, y + 10), (x, y + 10))
+    backend.begin()
+    try:
+        t0 = time.perf_counter()
+        for i in range(events):
+            backend.move_to(*square[i % 4])
+        if hasattr(backend, "flush"):
+            backend.flush()
+        elapsed = time.perf_counter() - t0
+    finally:
+        backend.end()
+    return events / elapsed if elapsed > 0 else float("inf")
+
+
+# Seconds per event measured by calibrate(), per backend name
+_calibrations = {}
+
+CALIBRATION_EVENTS = 300
+
+
+def is_calibrated(name: str) -> bool:
+    """Whether calibrate(name) already has a figure and won't move the cursor."""
+    return name in _calibrations
+
+
+def calibrate(name: str, events: int = CALIBRATION_EVENTS, x: int = 100, y: int = 100,
+              refresh: bool = False, **kwargs) -> float:
+    """
+    Measured seconds per mouse event for backend `name` on this machine.
+
+    The first call per backend replays `events` pen-up moves around (x, y);
+    later calls reuse that figure unless refresh is set.
+    """
+    if refresh or name not in _calibrations:
+        rate = measure_events_per_sec(get_backend(name, **kwargs), events, x, y)
+        _calibrations[name] = 1.0 / rate if rate > 0 else 0.0
+    return _calibrations[name]
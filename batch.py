@@ -0,0 +1,235 @@
+# batch.py
+"""
+Headless batch compiler: images in, stroke plans (.gbplan) out.
+
+    python batch.py photos/ --out plans/ --scale 0.5 --step 2
+    python batch.py "scans/*.png" --out plans/ --mode outline --tolerance 1 --workers 8
+    python batch.py photos/ --out plans/ --ms-per-event 0.4 --cache-dir ~/.ghostbrush/plans
+
+Nothing here imports tkinter or pyautogui, so it runs on a server without a
+display. With --cache-dir the plans are also stored under their plan cache
+keys; copy that directory to a kiosk's ~/.ghostbrush/plans and the app
+picks them up without planning.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from bitmask import build_mask, compile_mask_plan, needs_tiling
+from core import estimate_job, format_duration, load_and_prepare_image
+from parallel import iter_plan_bands_parallel
+from plan_cache import PlanCache
+from palette import compile_palette_plan
+from planner import PLANNER_MODES, compile_plan
+from stroke_plan import StrokePlan
+
+# Same formats the ConfigPage file dialog offers
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".tif", ".tiff", ".ppm", ".pgm", ".pbm")
+
+# Images this big are planned band by band, the way ConfigPage streams them
+# (its STREAM_MIN_PIXELS), so cached plans match what the app would draw
+BAND_MIN_PIXELS = 4_000_000
+
+
+# =======================
+# INPUTS
+# =======================
+
+def find_images(patterns):
+    """Expand files, directories (non-recursive) and glob patterns, in order."""
+    found = []
+    for pattern in patterns:
+        pattern = os.path.expanduser(pattern)
+        if os.path.isdir(pattern):
+            names = sorted(os.listdir(pattern))
+            paths = [os.path.join(pattern, n) for n in names]
+        else:
+            paths = sorted(glob.glob(pattern)) or [pattern]
+        for path in paths:
+            if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS):
+                found.append(path)
+    # The same file named twice is compiled once
+    return list(dict.fromkeys(os.path.abspath(p) for p in found))
+
+
+def output_names(paths):
+    """One <stem>.gbplan per image; clashing stems get a -2, -3, ... suffix."""
+    names, used = [], set()
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name, n = stem, 1
+        while name in used:
+            n += 1
+            name = f"{stem}-{n}"
+        used.add(name)
+        names.append(name + ".gbplan")
+    return names
+
+
+# =======================
+# COMPILATION
+# =======================
+
+def compile_one(task, workers: int = 1) -> dict:
+    """
+    Worker: load, plan and save one image; returns its stats. With more
+    than one worker, the bands of a big image are planned in parallel.
+    """
+    path, out_path, params, seconds_per_event, cache_dir = task
+    t0 = time.perf_counter()
+    if params["colors"]:
+        img = load_and_prepare_image(path, params["scale"], mode="RGB", report=None)
+        load_s = time.perf_counter() - t0
+        plan = compile_palette_plan(img, params["colors"], params["step"],
+                                    params["threshold"], params["mode"],
+                                    params["tolerance"])
+    elif needs_tiling(path, params["scale"]):
+        # Thresholded tile by tile, so a gigapixel scan stays under the ceiling
+        with build_mask(path, params["scale"], params["step"], params["threshold"],
+                        report=None) as mask:
+            load_s = time.perf_counter() - t0
+            plan = compile_mask_plan(mask, params["mode"], params["tolerance"])
+    else:
+        img = load_and_prepare_image(path, params["scale"], report=None)
+        load_s = time.perf_counter() - t0
+        settings = (params["step"], params["threshold"], params["mode"], params["tolerance"])
+        if img.width * img.height >= BAND_MIN_PIXELS:
+            bands = list(iter_plan_bands_parallel(img, *settings, workers=workers))
+            meta = {k: v for k, v in bands[0].meta.items() if k != "band"}
+            plan = StrokePlan.concatenate(bands, width=img.width, height=img.height,
+                                          meta=meta)
+        else:
+            plan = compile_plan(img, *settings)
+    plan_s = time.perf_counter() - t0 - load_s
+    plan.save(out_path)
+    if cache_dir:
+        cache = PlanCache(cache_dir)
+        cache.put(cache.key(path, params), plan)
+
+    est = estimate_job(plan, seconds_per_event or 0.0, params["rate"])
+    timed = bool(seconds_per_event) or params["rate"] > 0
+    return {
+        "image": path,
+        "plan": out_path,
+        "width": plan.width,
+        "height": plan.height,
+        "strokes": plan.num_strokes,
+        "events": est["events"],
+        "color_switches": est["color_switches"],
+        "estimated_s": round(est["duration_s"], 1) if timed else None,
+        "load_s": round(load_s, 3),
+        "plan_s": round(plan_s, 3),
+    }
+
+
+def compile_all(paths, out_dir, params, seconds_per_event=None, cache_dir=None,
+                workers=None, report=print):
+    """
+    Compile every image in a process pool (one image per task) and return
+    the per-image stats in input order. Failures are reported and skipped.
+    A single image is compiled here instead, its bands spread over the pool.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = [
+        (path, os.path.join(out_dir, name), params, seconds_per_event, cache_dir)
+        for path, name in zip(paths, output_names(paths))
+    ]
+    workers = max(1, workers or os.cpu_count() or 1)
+
+    results = {}
+    if len(tasks) == 1:
+        path = tasks[0][0]
+        try:
+            results[path] = compile_one(tasks[0], workers)
+            report(format_stats(results[path]))
+        except Exception as e:
+            report(f"{os.path.basename(path)}: FAILED ({e})")
+        return list(results.values())
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        futures = {pool.submit(compile_one, task): task[0] for task in tasks}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                stats = future.result()
+            except Exception as e:
+                report(f"{os.path.basename(path)}: FAILED ({e})")
+                continue
+            results[path] = stats
+            report(format_stats(stats))
+    return [results[p] for p in paths if p in results]
+
+
+def format_stats(stats) -> str:
+    eta = format_duration(stats["estimated_s"]) if stats["estimated_s"] is not None else "n/a"
+    return (f"{os.path.basename(stats['image'])}: {stats['width']}x{stats['height']}, "
+            f"{stats['strokes']:,} strokes, {stats['events']:,} events, est. {eta}, "
+            f"planned in {stats['plan_s']:.2f}s")
+
+
+# =======================
+# CLI
+# =======================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="image files, directories or glob patterns")
+    parser.add_argument("--out", required=True, help="directory for the .gbplan files")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--step", type=int, default=1)
+    parser.add_argument("--threshold", type=int, default=200)
+    parser.add_argument("--mode", choices=PLANNER_MODES, default=PLANNER_MODES[0])
+    parser.add_argument("--tolerance", type=float, default=1.0)
+    parser.add_argument("--colors", type=int, default=0,
+                        help="palette size for colour plans (0 = black ink only)")
+    parser.add_argument("--rate", type=float, default=0, help="draw rate in px/s (0 = unlimited)")
+    parser.add_argument("--ms-per-event", type=float,
+                        help="backend latency measured on the drawing machine, for time estimates")
+    parser.add_argument("--cache-dir", help="also store plans in this plan cache directory")
+    parser.add_argument("--workers", type=int, help="processes (default: one per core)")
+    args = parser.parse_args(argv)
+
+    paths = find_images(args.inputs)
+    if not paths:
+        print("No images found.")
+        return 1
+
+    # Same keys as ConfigPage, so --cache-dir entries are hits in the app
+    params = {
+        "scale": args.scale,
+        "step": args.step,
+        "threshold": args.threshold,
+        "rate": args.rate,
+        "tolerance": args.tolerance,
+        "colors": args.colors,
+        "mode": args.mode,
+    }
+    seconds_per_event = args.ms_per_event / 1000 if args.ms_per_event else None
+
+    t0 = time.perf_counter()
+    print(f"Compiling {len(paths)} image(s) into {args.out} ...")
+    results = compile_all(paths, args.out, params, seconds_per_event,
+                          args.cache_dir and os.path.expanduser(args.cache_dir),
+                          args.workers)
+    elapsed = time.perf_counter() - t0
+
+    manifest = os.path.join(args.out, "manifest.json")
+    with open(manifest, "w", encoding="utf-8") as f:
+        json.dump({"params": params, "results": results}, f, indent=2)
+
+    total_events = sum(r["events"] for r in results)
+    estimates = [r["estimated_s"] for r in results if r["estimated_s"] is not None]
+    print(f"Done: {len(results)} of {len(paths)} plans in {elapsed:.1f}s, "
+          f"{total_events:,} events"
+          + (f", est. {format_duration(sum(estimates))} of drawing" if estimates else "")
+          + f". Manifest: {manifest}")
+    return 0 if len(results) == len(paths) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
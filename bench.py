@@ -0,0 +1,278 @@
+# bench.py
+"""
+Headless benchmark for planning and simulated drawing.
+
+    python bench.py --out results.json
+    python bench.py --quick --out new.json
+    python bench.py --compare old.json new.json
+    python bench.py --backends pyautogui xtest      (needs DISPLAY, e.g. Xvfb)
+    python bench.py --calibrate xtest --out results.json
+    python bench.py --seconds-per-event 0.0004 --rate 800
+
+draw_s is the drawing time core.estimate_job predicts from the backend's
+seconds per event (measured with --calibrate, or given) and the pacing
+rate. simulator_s is only what replaying the plan onto the in-memory
+SimulatedCanvasBackend costs, i.e. executor plus rasterizer overhead.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from core import estimate_job, execute_plan, load_and_prepare_image
+from backends import SimulatedCanvasBackend, calibrate, get_backend, measure_events_per_sec
+from ordering import travel_distance
+from parallel import compile_plan_parallel
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Metrics where a larger value in the new run is a regression
+COMPARED_METRICS = ("plan_s", "peak_mem_mb", "events", "travel_px", "draw_s", "simulator_s")
+# Absolute changes below these are treated as timer/allocator noise
+NOISE_FLOOR = {"plan_s": 0.005, "simulator_s": 0.005, "peak_mem_mb": 0.1, "draw_s": 0.005}
+# Older result files called the simulator cost simulate_s
+RENAMED_METRICS = {"simulate_s": "simulator_s"}
+
+
+# =======================
+# INPUTS
+# =======================
+
+def synthetic_image(size: int, seed: int = 0) -> Image.Image:
+    """Line-art test card: random strokes, circles and a few filled blobs."""
+    rng = np.random.default_rng(seed)
+    img = Image.new("L", (size, size), 255)
+    draw = ImageDraw.Draw(img)
+    for _ in range(size // 8):
+        x0, y0, x1, y1 = rng.integers(0, size, 4).tolist()
+        draw.line((x0, y0, x1, y1), fill=0, width=int(rng.integers(1, 4)))
+    for _ in range(size // 32):
+        cx, cy = rng.integers(0, size, 2).tolist()
+        r = int(rng.integers(4, max(5, size // 10)))
+        draw.ellipse((cx - r, cy - r, cx + r, cy + r), outline=0, width=2)
+    for _ in range(4):
+        cx, cy = rng.integers(0, size, 2).tolist()
+        r = int(rng.integers(2, max(3, size // 40)))
+        draw.ellipse((cx - r, cy - r, cx + r, cy + r), fill=0)
+    return img
+
+
+def bench_inputs(sizes):
+    """Yield (name, source) pairs; source is a path or an in-memory image."""
+    input_path = os.path.join(BASE_DIR, "input.png")
+    if os.path.exists(input_path):
+        yield "input.png", input_path
+    for size in sizes:
+        yield f"synthetic-{size}", synthetic_image(size)
+
+
+def prepare(source, scale: float) -> Image.Image:
+    if isinstance(source, str):
+        return load_and_prepare_image(source, scale, report=None)
+    w, h = source.size
+    return source.resize((max(1, int(w * scale)), max(1, int(h * scale))))
+
+
+# =======================
+# MEASUREMENT
+# =======================
+
+def best_of(repeat, fn, *args):
+    """Run fn `repeat` times; return (last result, fastest wall time)."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return result, best
+
+
+def run_case(source, scale, step, threshold, mode, tolerance, repeat=3, workers=1,
+             seconds_per_event=None, rate=0) -> dict:
+    img, load_s = best_of(1, prepare, source, scale)
+    args = (img, step, threshold, mode, tolerance, workers)
+    plan, plan_s = best_of(repeat, compile_plan_parallel, *args)
+
+    # Separate run for memory: tracemalloc slows the timed path down
+    tracemalloc.start()
+    compile_plan_parallel(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    def simulate():
+        canvas = SimulatedCanvasBackend(plan.width, plan.height)
+        execute_plan(plan, 0, 0, backend=canvas, report=None)
+
+    _, simulator_s = best_of(repeat, simulate)
+
+    draw_s = None
+    if seconds_per_event is not None:
+        draw_s = round(estimate_job(plan, seconds_per_event, rate)["duration_s"], 3)
+    return {
+        "width": plan.width,
+        "height": plan.height,
+        "load_s": round(load_s, 4),
+        "plan_s": round(plan_s, 4),
+        "peak_mem_mb": round(peak / 2**20, 2),
+        "strokes": plan.num_strokes,
+        "events": plan.event_count(),
+        "travel_px": round(travel_distance(plan), 1),
+        "draw_s": draw_s,
+        "simulator_s": round(simulator_s, 4),
+    }
+
+
+def git_revision() -> str:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True,
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_suite(sizes, scales, steps, thresholds, modes, tolerance, repeat=3,
+              workers=1, seconds_per_event=None, rate=0) -> dict:
+    results = []
+    for name, source in bench_inputs(sizes):
+        for scale, step, threshold, mode in itertools.product(scales, steps, thresholds, modes):
+            case = {"image": name, "scale": scale, "step": step,
+                    "threshold": threshold, "mode": mode, "tolerance": tolerance}
+            case.update(run_case(source, scale, step, threshold, mode, tolerance,
+                                 repeat, workers, seconds_per_event, rate))
+            results.append(case)
+            draw = f"draw={case['draw_s']:.1f}s " if case["draw_s"] is not None else ""
+            print(f"{name:>16} scale={scale:<5} step={step:<2} thr={threshold:<3} "
+                  f"{mode:<8} plan={case['plan_s']:.3f}s mem={case['peak_mem_mb']:.1f}MB "
+                  f"events={case['events']} travel={case['travel_px']:.0f}px "
+                  f"{draw}simulator={case['simulator_s']:.3f}s")
+    return {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "seconds_per_event": seconds_per_event,
+        "rate": rate,
+        "results": results,
+    }
+
+
+# =======================
+# COMPARISON
+# =======================
+
+def _case_key(case):
+    return (case["image"], case["scale"], case["step"], case["threshold"],
+            case["mode"], case.get("tolerance"))
+
+
+def compare(old_path, new_path, tolerance: float = 0.10) -> int:
+    """Print per-case ratios new/old; return the number of regressions."""
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+
+    for c in old["results"]:
+        for before, after in RENAMED_METRICS.items():
+            if before in c:
+                c.setdefault(after, c.pop(before))
+    old_cases = {_case_key(c): c for c in old["results"]}
+    regressions = 0
+    print(f"Comparing {old.get('revision')} -> {new.get('revision')}")
+    for case in new["results"]:
+        base = old_cases.get(_case_key(case))
+        if base is None:
+            continue
+        parts = []
+        for metric in COMPARED_METRICS:
+            before, after = base.get(metric), case.get(metric)
+            if not before or after is None:
+                continue
+            ratio = after / before
+            flag = ""
+            if ratio > 1 + tolerance and after - before > NOISE_FLOOR.get(metric, 0):
+                flag = " !"
+                regressions += 1
+            parts.append(f"{metric}={ratio:.2f}x{flag}")
+        print(f"{case['image']:>16} scale={case['scale']} step={case['step']} "
+              f"thr={case['threshold']} {case['mode']}: " + " ".join(parts))
+
+    print(f"{regressions} regression(s) above {tolerance:.0%}.")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GhostBrush planning benchmark")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--quick", action="store_true", help="small grid for a fast check")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[512, 1024, 2048])
+    parser.add_argument("--scales", type=float, nargs="+", default=[0.25, 0.5, 1.0])
+    parser.add_argument("--steps", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--thresholds", type=int, nargs="+", default=[128, 200])
+    parser.add_argument("--modes", nargs="+", default=["rows", "outline", "skeleton"])
+    parser.add_argument("--tolerance", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case (best is kept)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="compare two result files instead of running")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="plan in a process pool with this many workers")
+    parser.add_argument("--backends", nargs="+", metavar="NAME",
+                        help="measure output events/sec for these backends instead "
+                             "(needs a display; Xvfb works)")
+    parser.add_argument("--calibrate", metavar="NAME",
+                        help="measure seconds per event on this backend for draw_s "
+                             "(moves the pointer; needs a display)")
+    parser.add_argument("--seconds-per-event", type=float,
+                        help="seconds per event for draw_s instead of --calibrate")
+    parser.add_argument("--rate", type=float, default=0,
+                        help="pacing rate in px/s for draw_s (default 0, unpaced)")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="relative slowdown flagged by --compare (default 0.10)")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return 1 if compare(*args.compare, tolerance=args.max_regression) else 0
+
+    if args.backends:
+        for name in args.backends:
+            rate = measure_events_per_sec(get_backend(name))
+            print(f"{name:>10}: {rate:,.0f} events/s")
+        return 0
+
+    if args.quick:
+        args.sizes, args.scales, args.steps, args.thresholds = [512], [0.25], [1, 2], [200]
+
+    seconds_per_event = args.seconds_per_event
+    if seconds_per_event is None and args.calibrate:
+        seconds_per_event = calibrate(args.calibrate)
+    if seconds_per_event is None:
+        print("No seconds per event: draw_s is left out "
+              "(pass --calibrate NAME or --seconds-per-event).")
+    else:
+        print(f"draw_s at {seconds_per_event * 1000:.3f} ms/event"
+              + (f", {args.rate:g} px/s." if args.rate else ", unpaced."))
+
+    report = run_suite(args.sizes, args.scales, args.steps, args.thresholds,
+                       args.modes, args.tolerance, args.repeat, args.workers,
+                       seconds_per_event, args.rate)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {len(report['results'])} results to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,436 @@
+# bitmask.py
+"""
+Tile-by-tile loading into bit-packed masks, for inputs too big to decode whole.
+
+    python bitmask.py scan.tif --step 2 --out scan.gbplan
+    GHOSTBRUSH_MAX_LOAD_MB=256 python bitmask.py huge.ppm --scale 0.5 --mode outline
+
+Uncompressed files (PGM/PPM, BMP, uncompressed TIFF strips or tiles) are
+read straight from the file one band of rows at a time. JPEGs are decoded in
+draft mode at the smallest size that still covers the output. Anything else
+is decoded whole, but only if that fits under the ceiling. Each band is
+converted to gray, resized to the output scale and thresholded straight into
+a PackedMask (1 bit per sampled pixel), which is memory-mapped when large.
+The ceiling is core.MAX_LOAD_MB (GHOSTBRUSH_MAX_LOAD_MB).
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+import tracing
+from core import MAX_LOAD_MB, GrayResizer, _peak_rss_bytes, decode_image, plan_load
+from ordering import optimize_order
+from planner import PLANNER_MODES, describe_plan, mask_row_runs, plan_mask
+from simplify import simplify_plan
+from stroke_plan import StrokePlan
+
+# Packed masks bigger than this live in a memory-mapped temporary file
+MEMMAP_MASK_MB = float(os.environ.get("GHOSTBRUSH_MEMMAP_MASK_MB", "64"))
+
+# Working bytes per source pixel of a band: raw bytes (up to 4), the uint32
+# luma sum and the gray row
+_BAND_BYTES_PER_PIXEL = 4 + 4 + 1
+
+# Pixel layout of the raw rawmodes we can read straight from the file:
+# bits per pixel, and the R, G, B byte positions (None for gray)
+_RAW_MODES = {
+    "1": (1, None),
+    "1;I": (1, None),
+    "L": (8, None),
+    "L;I": (8, None),
+    "RGB": (24, (0, 1, 2)),
+    "BGR": (24, (2, 1, 0)),
+    "RGBX": (32, (0, 1, 2)),
+    "RGBA": (32, (0, 1, 2)),
+    "BGRX": (32, (2, 1, 0)),
+    "BGRA": (32, (2, 1, 0)),
+}
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+# =======================
+# PACKED MASK
+# =======================
+
+class PackedMask:
+    """
+    A (rows, cols) boolean mask stored 1 bit per sample (np.packbits rows).
+
+    Sample (r, c) is image pixel (c * step, r * step) of a width x height
+    image. Masks over MEMMAP_MASK_MB are backed by an unlinked temporary
+    file, so they cost address space rather than RAM.
+    """
+
+    def __init__(self, width, height, step, threshold=None, directory=None):
+        self.width = width
+        self.height = height
+        self.step = step
+        self.threshold = threshold
+        self.shape = (-(-height // step), -(-width // step))
+        rows, cols = self.shape
+        row_bytes = (cols + 7) // 8
+        self.path = None
+        if rows * row_bytes > MEMMAP_MASK_MB * 2**20:
+            fd, self.path = tempfile.mkstemp(suffix=".mask", dir=directory)
+            os.close(fd)
+            self.bits = np.memmap(self.path, dtype=np.uint8, mode="w+", shape=(rows, row_bytes))
+            try:
+                # The mapping keeps the data; nothing is left behind on exit
+                os.unlink(self.path)
+                self.path = None
+            except OSError:
+                pass  # Windows: removed in close()
+            self.memmapped = True
+        else:
+            self.bits = np.zeros((rows, row_bytes), dtype=np.uint8)
+            self.memmapped = False
+
+    @property
+    def nbytes(self) -> int:
+        return self.bits.nbytes
+
+    def write_rows(self, r0: int, mask: np.ndarray) -> None:
+        self.bits[r0:r0 + len(mask)] = np.packbits(mask, axis=1)
+
+    def read_rows(self, r0: int, r1: int) -> np.ndarray:
+        """Unpacked bool rows [r0, r1)."""
+        return np.unpackbits(self.bits[r0:r1], axis=1, count=self.shape[1]).view(bool)
+
+    def count(self, chunk_rows: int = 4096) -> int:
+        """Set samples, counted without unpacking."""
+        return sum(int(_POPCOUNT[self.bits[r:r + chunk_rows]].sum(dtype=np.int64))
+                   for r in range(0, self.shape[0], chunk_rows))
+
+    def close(self) -> None:
+        bits, self.bits = self.bits, None
+        if isinstance(bits, np.memmap):
+            bits._mmap.close()
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        where = "memory-mapped" if self.memmapped else "in memory"
+        return (f"PackedMask({self.shape[1]}x{self.shape[0]} samples, step {self.step}, "
+                f"{self.nbytes / 2**20:.1f} MB {where})")
+
+
+# =======================
+# TILED SOURCE
+# =======================
+
+def _raw_layout(img):
+    """The raw tiles of an opened image as (extents, offset, rawmode, stride, orientation)."""
+    tiles = []
+    for name, extents, offset, args in img.tile:
+        if name != "raw":
+            return None
+        if isinstance(args, str):
+            args = (args,)
+        rawmode = args[0]
+        stride = args[1] if len(args) > 1 else 0
+        orientation = args[2] if len(args) > 2 else 1
+        if rawmode not in _RAW_MODES:
+            return None
+        x0, y0, x1, y1 = extents
+        row_bytes = ((x1 - x0) * _RAW_MODES[rawmode][0] + 7) // 8
+        if stride <= 0:
+            stride = row_bytes
+        if stride < row_bytes:
+            return None
+        tiles.append(((x0, y0, x1, y1), offset, rawmode, stride, orientation))
+    return tiles or None
+
+
+def _raw_to_gray(raw: np.ndarray, rawmode: str, width: int) -> np.ndarray:
+    """(rows, stride) raw bytes -> (rows, width) uint8 gray, as convert("L") would."""
+    bits, channels = _RAW_MODES[rawmode]
+    if bits == 1:
+        gray = np.unpackbits(raw, axis=1, count=width).astype(np.uint8) * np.uint8(255)
+    elif bits == 8:
+        gray = raw[:, :width].copy()
+    else:
+        px = raw[:, :width * bits // 8].reshape(len(raw), width, bits // 8)
+        r, g, b = (px[:, :, c].astype(np.uint32) for c in channels)
+        # Pillow's ITU-R 601-2 luma with its rounding
+        gray = ((r * 19595 + g * 38470 + b * 7471 + 0x8000) >> 16).astype(np.uint8)
+    if rawmode.endswith(";I"):
+        gray = 255 - gray
+    return gray
+
+
+class TiledSource:
+    """
+    Gray rows of an image at an output scale, read one band at a time.
+
+    `path_kind` tells how: "raw" (tiles read from the file), "draft" (JPEG decoded
+    at a reduced size) or "decode" (decoded whole). Only "raw" never holds
+    the decoded image.
+    """
+
+    def __init__(self, path, scale: float = 1.0, ceiling_mb: float = None):
+        self.path = path
+        self.ceiling = int((MAX_LOAD_MB if ceiling_mb is None else ceiling_mb) * 2**20)
+        with Image.open(path) as img:
+            w, h = img.size
+            fmt = img.format
+            layout = _raw_layout(img) if img.mode in ("1", "L", "RGB", "RGBA", "RGBX") else None
+        self.size = (w, h)
+        self.new_size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        self._image = None
+        self._resizer = None
+        self.held = 0  # bytes of decoded image kept for the whole load
+
+        if layout is not None and self._fits_file(layout):
+            self.path_kind = "raw"
+            self._tiles = layout
+            self._file = open(path, "rb")
+            self.src_size = self.size
+            return
+
+        self.path_kind = "draft" if fmt == "JPEG" and scale < 1 else "decode"
+        estimate = plan_load(path, scale)["estimate"]
+        if estimate > self.ceiling:
+            raise MemoryError(
+                f"{fmt or 'This'} files can't be read in tiles and decoding this "
+                f"{w}x{h} image needs about {estimate / 2**20:.0f} MB "
+                f"(ceiling {self.ceiling / 2**20:g} MB); convert it to an uncompressed "
+                "TIFF, PPM or BMP, or use a smaller scale."
+            )
+        min_size = self.new_size if self.path_kind == "draft" else None
+        self._image = np.asarray(decode_image(path, min_size, mode="L").convert("L"))
+        self.src_size = (self._image.shape[1], self._image.shape[0])
+        self.held = self._image.nbytes
+
+    def _fits_file(self, layout) -> bool:
+        file_size = os.path.getsize(self.path)
+        return all(offset + (y1 - y0) * stride <= file_size
+                   for (_, y0, _, y1), offset, _, stride, _ in layout)
+
+    def source_rows(self, y0: int, y1: int) -> np.ndarray:
+        """Gray source rows [y0, y1) at the source's own resolution."""
+        if self._image is not None:
+            return self._image[y0:y1]
+
+        out = np.empty((y1 - y0, self.src_size[0]), dtype=np.uint8)
+        for (tx0, ty0, tx1, ty1), offset, rawmode, stride, orientation in self._tiles:
+            lo, hi = max(y0, ty0), min(y1, ty1)
+            if lo >= hi:
+                continue
+            # Bottom-up tiles (BMP) store their last row first
+            first = (ty1 - hi) if orientation < 0 else (lo - ty0)
+            self._file.seek(offset + first * stride)
+            raw = np.fromfile(self._file, dtype=np.uint8, count=(hi - lo) * stride)
+            raw = raw.reshape(hi - lo, stride)
+            if orientation < 0:
+                raw = raw[::-1]
+            out[lo - y0:hi - y0, tx0:tx1] = _raw_to_gray(raw, rawmode, tx1 - tx0)
+        return out
+
+    def bytes_per_output_row(self) -> int:
+        """Working memory one output row of a band needs."""
+        src_w, src_h = self.src_size
+        f = src_h / self.new_size[1]
+        # Plus the resize's int32 accumulator and its output row
+        return int(math.ceil(max(f, 1.0) * src_w * _BAND_BYTES_PER_PIXEL)) + 5 * self.new_size[0]
+
+    def band_rows(self, budget: int, multiple: int = 1) -> int:
+        """Output rows per band that fit in `budget` bytes, rounded down to `multiple`."""
+        rows = budget // self.bytes_per_output_row()
+        rows = min(rows, self.new_size[1] + multiple - 1) // multiple * multiple
+        if rows < multiple:
+            raise MemoryError(
+                f"Even one band of {multiple} row(s) of this {self.size[0]}x{self.size[1]} "
+                f"image needs more than the {self.ceiling / 2**20:g} MB ceiling."
+            )
+        return rows
+
+    def rows(self, y0: int, y1: int) -> np.ndarray:
+        """
+        Gray output rows [y0, y1), exactly as core.load_and_prepare_image
+        resizes the whole image (both go through core.GrayResizer).
+        """
+        if self.src_size == self.new_size:
+            return self.source_rows(y0, y1)
+        if self._resizer is None:
+            self._resizer = GrayResizer(self.src_size, self.new_size)
+        s0, s1 = self._resizer.source_span(y0, y1)
+        return self._resizer.rows(self.source_rows(s0, s1), s0, y0, y1)
+
+    def close(self) -> None:
+        self._image = None
+        if getattr(self, "_file", None) is not None:
+            self._file.close()
+            self._file = None
+
+
+# =======================
+# TILED LOADING
+# =======================
+
+def needs_tiling(path, scale: float) -> bool:
+    """True when a whole-image load would go over the ceiling (core.MAX_LOAD_MB)."""
+    return plan_load(path, scale)["estimate"] > MAX_LOAD_MB * 2**20
+
+
+def _report(report, what, source, bands, band, peak, extra=""):
+    if not report:
+        return
+    rss = _peak_rss_bytes()
+    band = min(band, source.new_size[1])
+    report(f"Tiled load ({source.path_kind}): {source.size[0]}x{source.size[1]} -> "
+           f"{source.new_size[0]}x{source.new_size[1]} {what} in {bands} band(s) of {band} rows{extra}")
+    report(f"Peak working memory {peak / 2**20:.1f} MB, ceiling {source.ceiling / 2**20:g} MB"
+           + (f", process peak RSS {rss / 2**20:.0f} MB" if rss else ""))
+
+
+def build_mask(path, scale: float, step: int, threshold: int,
+               ceiling_mb: float = None, report=print) -> PackedMask:
+    """
+    Threshold `path` at `scale` into a PackedMask, band by band. Only the
+    sampled rows of each band are kept, so peak memory is the band plus the
+    packed mask (when it isn't memory-mapped), whatever the input size.
+    Band and memory figures go to `report` (None to stay quiet).
+    """
+    with tracing.span("load", path=str(path), tiled=True):
+        source = TiledSource(path, scale, ceiling_mb)
+        try:
+            new_w, new_h = source.new_size
+            mask = PackedMask(new_w, new_h, step, threshold)
+            held = source.held + (0 if mask.memmapped else mask.nbytes)
+            band = source.band_rows(source.ceiling - held, multiple=step)
+            peak = held
+            for y0 in range(0, new_h, band):
+                y1 = min(y0 + band, new_h)
+                gray = source.rows(y0, y1)
+                mask.write_rows(y0 // step, gray[::step, ::step] < threshold)
+                peak = max(peak, held + (y1 - y0) * source.bytes_per_output_row())
+        finally:
+            source.close()
+
+    tracing.count("load_peak_bytes", peak)
+    _report(report, "mask", source, -(-new_h // band), band, peak, extra=f", {mask!r}")
+    return mask
+
+
+def load_gray(path, scale: float, ceiling_mb: float = None, report=print) -> Image.Image:
+    """
+    The grayscale image at `scale`, assembled band by band: for inputs too
+    big to decode whole whose output still fits under the ceiling.
+    """
+    with tracing.span("load", path=str(path), tiled=True):
+        source = TiledSource(path, scale, ceiling_mb)
+        try:
+            new_w, new_h = source.new_size
+            out = np.empty((new_h, new_w), dtype=np.uint8)
+            held = source.held + out.nbytes
+            band = source.band_rows(source.ceiling - held)
+            peak = held
+            for y0 in range(0, new_h, band):
+                y1 = min(y0 + band, new_h)
+                out[y0:y1] = source.rows(y0, y1)
+                peak = max(peak, held + (y1 - y0) * source.bytes_per_output_row())
+        finally:
+            source.close()
+
+    tracing.count("load_peak_bytes", peak)
+    _report(report, "image", source, -(-new_h // band), band, peak)
+    return Image.fromarray(out, mode="L")
+
+
+# =======================
+# PLANNING FROM A MASK
+# =======================
+
+def iter_mask_bands(mask: PackedMask, mode: str = "rows", tolerance: float = 0,
+                    band_rows: int = 256):
+    """
+    planner.iter_plan_bands over a PackedMask: one band is unpacked at a
+    time and yielded as a StrokePlan in full-image coordinates.
+    """
+    step = mask.step
+    band = max(1, band_rows // step)
+    meta = {"mode": mode, "step": step, "threshold": mask.threshold}
+    for r0 in range(0, mask.shape[0], band):
+        r1 = min(r0 + band, mask.shape[0])
+        top, bottom = r0 * step, min(r1 * step, mask.height)
+        plan = plan_mask(mask.read_rows(r0, r1), step, mask.width, bottom - top, mode, dict(meta))
+        plan = optimize_order(simplify_plan(plan, tolerance))
+        plan.points[:, 1] += top
+        plan.height = mask.height
+        plan.meta = dict(plan.meta, band=[top, bottom])
+        yield plan
+
+
+def compile_mask_plan(mask: PackedMask, mode: str = "rows", tolerance: float = 0) -> StrokePlan:
+    """All bands of iter_mask_bands joined into one plan."""
+    bands = list(iter_mask_bands(mask, mode, tolerance))
+    meta = {k: v for k, v in bands[0].meta.items() if k != "band"} if bands else {}
+    return StrokePlan.concatenate(bands, width=mask.width, height=mask.height, meta=meta)
+
+
+def estimate_mask(mask: PackedMask, seconds_per_event: float, rate: float = 0,
+                  chunk_rows: int = 4096) -> dict:
+    """
+    Rough core.estimate_job figures for a row plan of the mask, summed over
+    chunks of rows so the whole plan never exists (travel between chunks
+    is left out).
+    """
+    from core import estimate_job
+
+    total = {"events": 0, "ink_px": 0.0, "travel_px": 0.0, "color_switches": 0,
+             "seconds_per_event": seconds_per_event, "duration_s": 0.0}
+    for r0 in range(0, mask.shape[0], chunk_rows):
+        rows = mask.read_rows(r0, min(r0 + chunk_rows, mask.shape[0]))
+        ys, x_starts, x_ends = mask_row_runs(rows, mask.step)
+        plan = StrokePlan.from_row_runs(ys + r0 * mask.step, x_starts, x_ends,
+                                        width=mask.width, height=mask.height)
+        est = estimate_job(plan, seconds_per_event, rate)
+        for key in ("events", "ink_px", "travel_px", "duration_s"):
+            total[key] += est[key]
+    return total
+
+
+# =======================
+# CLI
+# =======================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("image")
+    parser.add_argument("--out", required=True, help=".gbplan file to write")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--step", type=int, default=1)
+    parser.add_argument("--threshold", type=int, default=200)
+    parser.add_argument("--mode", choices=PLANNER_MODES, default=PLANNER_MODES[0])
+    parser.add_argument("--tolerance", type=float, default=1.0)
+    parser.add_argument("--max-mb", type=float, help=f"memory ceiling (default {MAX_LOAD_MB:g})")
+    args = parser.parse_args(argv)
+
+    with build_mask(args.image, args.scale, args.step, args.threshold, args.max_mb) as mask:
+        print(f"{mask.count():,} dark samples.")
+        plan = compile_mask_plan(mask, args.mode, args.tolerance)
+    print(describe_plan(plan))
+    plan.save(args.out)
+    print(f"{plan.num_strokes:,} strokes, {plan.event_count():,} events -> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
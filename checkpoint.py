@@ -0,0 +1,153 @@
+# checkpoint.py
+import json
+import os
+import threading
+import time
+
+from backends import DrawingAborted
+
+# =======================
+# DRAWING JOB PROGRESS
+# =======================
+
+DEFAULT_CHECKPOINT = os.environ.get(
+    "GHOSTBRUSH_CHECKPOINT",
+    os.path.join(os.path.expanduser("~"), ".ghostbrush", "checkpoint.json"),
+)
+
+
+class DrawingJob:
+    """
+    Stroke-granular progress of one drawing job.
+
+    `done` counts strokes completed across the whole stream (plans or bands,
+    in order); execute_stream skips that many when the job is replayed, so a
+    job resumes after the last completed stroke. A stroke cut short by an
+    abort is drawn again from its start.
+
+    pause() makes the executor wait at the next stroke boundary, with the
+    button released, until resume() or cancel(). With a path, progress is
+    written there at most every SAVE_EVERY seconds and whenever the job
+    stops, so it survives an app restart; `key` (the plan cache key) tells
+    whether a checkpoint belongs to the current image and parameters.
+    """
+
+    SAVE_EVERY = 1.0
+
+    def __init__(self, key=None, image_path=None, params=None, start=(0, 0),
+                 path=None, done=0, total=None):
+        self.key = key
+        self.image_path = image_path
+        self.params = dict(params or {})
+        self.start = (int(start[0]), int(start[1]))
+        self.path = path
+        self.done = int(done)
+        self.total = total
+        self.finished = False
+        self.pacer = None  # set by the executor so pauses don't cause a burst
+        self._running = threading.Event()
+        self._running.set()
+        self._cancelled = False
+        self._saved_at = time.perf_counter()
+
+    # -------------------------
+    # PAUSE / RESUME
+    # -------------------------
+    @property
+    def paused(self) -> bool:
+        return not self._running.is_set()
+
+    def pause(self) -> None:
+        self._running.clear()
+
+    def resume(self) -> None:
+        self._running.set()
+
+    def cancel(self) -> None:
+        """Stop at the next stroke boundary, even while paused."""
+        self._cancelled = True
+        self._running.set()
+
+    def wait_if_paused(self) -> None:
+        """Called by the executor between strokes."""
+        if not self._running.is_set():
+            self.save()
+            self._running.wait()
+            if self.pacer is not None:
+                self.pacer.start()
+        if self._cancelled:
+            self._cancelled = False
+            raise DrawingAborted("Drawing cancelled.")
+
+    # -------------------------
+    # PROGRESS
+    # -------------------------
+    @property
+    def resumable(self) -> bool:
+        return self.done > 0 and not self.finished
+
+    def stroke_done(self) -> None:
+        self.done += 1
+        if self.path is not None:
+            now = time.perf_counter()
+            if now - self._saved_at >= self.SAVE_EVERY:
+                self.save()
+
+    def complete(self) -> None:
+        self.finished = True
+        self.clear()
+
+    # -------------------------
+    # ON-DISK CHECKPOINT
+    # -------------------------
+    def to_dict(self) -> dict:
+        return {
+            "key": self.key,
+            "image_path": self.image_path,
+            "params": self.params,
+            "start": list(self.start),
+            "done": self.done,
+            "total": self.total,
+        }
+
+    def save(self) -> None:
+        self._saved_at = time.perf_counter()
+        if self.path is None or self.finished:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        if self.path is None:
+            return
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_CHECKPOINT):
+        """The job saved at path, or None if there is no usable checkpoint."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(
+                key=data["key"],
+                image_path=data.get("image_path"),
+                params=data.get("params"),
+                start=data["start"],
+                path=path,
+                done=data["done"],
+                total=data.get("total"),
+            )
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def __repr__(self):
+        total = "?" if self.total is None else self.total
+        return f"DrawingJob({self.done}/{total} strokes, start={self.start})"
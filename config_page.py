@@ -1,10 +1,14 @@
 # config_page.py
 import os
+import threading
 import tkinter as tk
-from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk
+from collections import OrderedDict
+from tkinter import filedialog, messagebox, simpledialog
+import numpy as np
 
-from core import (
+# PIL, the decode/load helpers and the auto-tuner are imported where they are
+# used, so building this page stays cheap
+from theme import (
     APP_BG,
     CARD_BG,
     TEXT_FG,
@@ -13,8 +17,10 @@ from core import (
     FONT_LABEL,
     FONT_ENTRY,
     FONT_BUTTON,
-    load_and_prepare_image,
 )
+from backends import SCREEN_BACKENDS, calibrate, is_calibrated
+from plan_cache import default_cache
+from planner import PLANNER_MODES, compile_plan, preview_mask
 
 
 class ConfigPage(tk.Frame):
@@ -24,7 +30,15 @@ class ConfigPage(tk.Frame):
         self.configure(bg=APP_BG)
 
         self.preview_img = None
-        self.original_img = None
+        self.preview_loading = False
+        self.preview_cache = OrderedDict()  # (path, mtime, w, h) -> (preview, gray, size)
+        self.preview_gray = None  # downsampled grayscale array the live result is built from
+        self.preview_source_size = None  # full-resolution (w, h) of the chosen image
+        self.preview_info = ""
+        self._preview_request = 0  # bumps on every request; stale results are dropped
+        self._result_request = 0  # same for traced result previews built off the Tk thread
+        self._resize_job = None
+        self._result_job = None
         self.is_hover = False
 
         # --- Appearance constants ---
@@ -34,6 +48,10 @@ class ConfigPage(tk.Frame):
         self.DROP_BOX_HEIGHT = 540   # drop area height
         self.PARAM_WIDTH = 800       # target width of "Drawing parameters" section
         self.PARAM_HEIGHT = 10       # target height of the params box
+        self.PREVIEW_CACHE_ENTRIES = 8  # recent previews kept in memory
+        self.RESULT_DEBOUNCE_MS = 80    # wait this long after a keystroke before re-thresholding
+        self.STREAM_MIN_PIXELS = 4_000_000  # plan while drawing above this size
+        self.MAX_COLORS = 32                # palette size limit (0 = black ink only)
 
         # =========================
         # MAIN CONTAINER
@@ -70,7 +88,7 @@ class ConfigPage(tk.Frame):
         main.columnconfigure(0, weight=1)
 
         # Hover & resize bindings
-        self.image_canvas.bind("<Configure>", lambda e: self.redraw_canvas())
+        self.image_canvas.bind("<Configure>", self.on_canvas_configure)
         self.image_canvas.bind("<Button-1>", lambda e: self.choose_image())
         self.image_canvas.bind("<Enter>", self.on_hover_enter)
         self.image_canvas.bind("<Leave>", self.on_hover_leave)
@@ -95,11 +113,11 @@ class ConfigPage(tk.Frame):
         params_frame.grid(row=0, column=0, padx=(0, 20))
 
         row = tk.Frame(params_frame, bg=CARD_BG)
-        row.pack(fill="x", expand=True, padx=40, pady=15)
+        row.pack(fill="x", expand=True, padx=40, pady=(15, 5))
+        row2 = tk.Frame(params_frame, bg=CARD_BG)
+        row2.pack(fill="x", expand=True, padx=40, pady=(5, 15))
 
-        def add_param(label_text, var, width=10):
-            frame = tk.Frame(row, bg=CARD_BG)
-            frame.pack(side="left", expand=True)
+        def add_label(frame, label_text):
             tk.Label(
                 frame,
                 text=label_text,
@@ -107,6 +125,11 @@ class ConfigPage(tk.Frame):
                 bg=CARD_BG,
                 fg=TEXT_FG,
             ).pack(anchor="center", pady=(0, 3))
+
+        def add_param(label_text, var, width=10, parent=row):
+            frame = tk.Frame(parent, bg=CARD_BG)
+            frame.pack(side="left", expand=True)
+            add_label(frame, label_text)
             tk.Entry(
                 frame,
                 textvariable=var,
@@ -115,16 +138,38 @@ class ConfigPage(tk.Frame):
                 justify="center",
             ).pack(anchor="center")
 
+        def add_choice(label_text, var, options, parent=row2):
+            frame = tk.Frame(parent, bg=CARD_BG)
+            frame.pack(side="left", expand=True)
+            add_label(frame, label_text)
+            menu = tk.OptionMenu(frame, var, *options)
+            menu.config(font=FONT_ENTRY, width=10)
+            menu.pack(anchor="center")
+
         # Variables
         self.scale_var = tk.StringVar(value="1")
         self.step_var = tk.StringVar(value="1")
         self.threshold_var = tk.StringVar(value="200")
-        self.delay_var = tk.StringVar(value="0")
+        self.rate_var = tk.StringVar(value="0")
+        self.tolerance_var = tk.StringVar(value="1")
+        self.colors_var = tk.StringVar(value="0")
+        self.mode_var = tk.StringVar(value=PLANNER_MODES[0])
+        self.backend_var = tk.StringVar(
+            value=os.environ.get("GHOSTBRUSH_BACKEND", SCREEN_BACKENDS[0])
+        )
 
         add_param("Scale:", self.scale_var)
         add_param("Step:", self.step_var)
         add_param("Threshold:", self.threshold_var)
-        add_param("Draw delay (s):", self.delay_var)
+        add_param("Tolerance (px):", self.tolerance_var)
+        add_param("Draw rate (px/s):", self.rate_var, parent=row2)
+        add_param("Colors (0 = black):", self.colors_var, parent=row2)
+        add_choice("Mode:", self.mode_var, PLANNER_MODES)
+        add_choice("Backend:", self.backend_var, SCREEN_BACKENDS)
+
+        # Live result preview follows the parameters that change what is drawn
+        for var in (self.scale_var, self.step_var, self.threshold_var, self.mode_var):
+            var.trace_add("write", lambda *_: self._schedule_result_preview())
 
         # Freeze params_frame width/height
         params_frame.update_idletasks()
@@ -134,7 +179,7 @@ class ConfigPage(tk.Frame):
         params_frame.pack_propagate(False)
 
         # --- NEXT BUTTON on the right side of params ---
-        btn_next = tk.Button(
+        self.btn_next = tk.Button(
             params_row,
             text="Next",
             command=self.on_next,
@@ -142,7 +187,17 @@ class ConfigPage(tk.Frame):
             padx=20,
             pady=8,
         )
-        btn_next.grid(row=0, column=1, padx=(20, 0))
+        self.btn_next.grid(row=0, column=1, padx=(20, 0))
+
+        self.btn_autotune = tk.Button(
+            params_row,
+            text="Auto-tune…",
+            command=self.on_autotune,
+            font=FONT_BUTTON,
+            padx=20,
+            pady=8,
+        )
+        self.btn_autotune.grid(row=0, column=2, padx=(20, 0))
 
     # ===============================================================
     # HOVER BEHAVIOR
@@ -155,6 +210,11 @@ class ConfigPage(tk.Frame):
         self.is_hover = False
         self.redraw_canvas()
 
+    def on_canvas_configure(self, event):
+        self.redraw_canvas()
+        if self.controller.image_path:
+            self._schedule_preview_refresh()
+
     # ===============================================================
     # CANVAS DRAWING
     # ===============================================================
@@ -185,16 +245,24 @@ class ConfigPage(tk.Frame):
         )
 
         # Content
-        if not self.preview_img:
+        if self.preview_loading or not self.preview_img:
             canvas.create_text(
                 w / 2,
                 h / 2,
-                text="Browse image…",
+                text="Loading preview…" if self.preview_loading else "Browse image…",
                 fill=TEXT_FG,
                 font=FONT_LABEL,
             )
         else:
             canvas.create_image(w / 2, h / 2, image=self.preview_img)
+            if self.preview_info:
+                canvas.create_text(
+                    w / 2,
+                    h - 16,
+                    text=self.preview_info,
+                    fill=SUBTLE_FG,
+                    font=FONT_ENTRY,
+                )
 
     # ===============================================================
     # IMAGE SELECTION & PREVIEW
@@ -209,7 +277,7 @@ class ConfigPage(tk.Frame):
             initialdir=initial_dir,
             title="Select image",
             filetypes=[
-                ("Image files", "*.png;*.jpg;*.jpeg;*.bmp;*.gif"),
+                ("Image files", "*.png;*.jpg;*.jpeg;*.bmp;*.gif;*.tif;*.tiff;*.ppm;*.pgm;*.pbm"),
                 ("All files", "*.*"),
             ],
         )
@@ -217,36 +285,289 @@ class ConfigPage(tk.Frame):
             return
 
         self.controller.image_path = path
+        self.request_preview()
 
-        # Load the original image once
-        self.original_img = Image.open(path)
-
+    def _preview_box(self):
+        """Inner size of the drop area that the preview has to fit into."""
         # Use current canvas size (or fallback if not yet realized)
         w = self.image_canvas.winfo_width()
         h = self.image_canvas.winfo_height()
-        if w <= 0 or h <= 0:
+        if w <= 10 or h <= 10:
             w, h = self.DROP_BOX_WIDTH or 800, self.DROP_BOX_HEIGHT
 
         margin = 1
-        inner_w = w - 2 * margin - 4
-        inner_h = h - 2 * margin - 4
+        # Leave room under the preview for the stroke count line
+        return w - 2 * margin - 4, h - 2 * margin - 36
 
-        # Resize image to fit inside inner box (allow upscaling)
-        img = self.original_img.copy()
-        iw, ih = img.size
-        if iw == 0 or ih == 0:
+    def request_preview(self):
+        """Show the preview for the current image, building it off the Tk thread."""
+        path = self.controller.image_path
+        if not path:
+            return
+        inner_w, inner_h = self._preview_box()
+        try:
+            key = (path, os.stat(path).st_mtime_ns, inner_w, inner_h)
+        except OSError:
+            return
+
+        cached = self.preview_cache.get(key)
+        if cached is not None:
+            self.preview_cache.move_to_end(key)
+            self._show_preview(cached)
             return
 
+        try:
+            draw_scale = float(self.scale_var.get())
+        except ValueError:
+            draw_scale = None
+
+        self._preview_request += 1
+        token = self._preview_request
+        self.preview_loading = True
+        self.redraw_canvas()
+
+        def worker():
+            try:
+                img = self._render_preview(path, inner_w, inner_h, draw_scale)
+            except Exception as e:
+                print("Could not build preview:", e)
+                img = None
+            self.after(0, lambda: self._on_preview_ready(token, key, img))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    @staticmethod
+    def _render_preview(path, inner_w, inner_h, draw_scale):
+        """
+        Runs in a worker thread: decode (shared with drawing), fit the box and
+        keep a grayscale copy for the live result preview.
+        """
+        from PIL import Image
+
+        from bitmask import load_gray, needs_tiling
+        from core import decode_image, image_size
+
+        iw, ih = image_size(path)
+        if iw == 0 or ih == 0:
+            return None
+
+        # Resize image to fit inside inner box (allow upscaling)
         scale = min(inner_w / iw, inner_h / ih)
         if scale <= 0:
             scale = 1.0
+        new_size = (max(1, int(iw * scale)), max(1, int(ih * scale)))
 
-        new_size = (int(iw * scale), int(ih * scale))
-        img = img.resize(new_size, Image.LANCZOS)
+        if needs_tiling(path, scale):
+            # Too big to decode whole: a gray thumbnail assembled band by band
+            preview = load_gray(path, scale)
+            return preview, np.asarray(preview), (iw, ih)
 
+        # Decode once at a size that also serves load_and_prepare_image
+        if draw_scale is None or draw_scale >= 1 or scale >= 1:
+            source = decode_image(path)
+        else:
+            source = decode_image(path, (max(new_size[0], int(iw * draw_scale)),
+                                         max(new_size[1], int(ih * draw_scale))))
+        preview = source.resize(new_size, Image.LANCZOS, reducing_gap=3.0)
+        return preview, np.asarray(preview.convert("L")), (iw, ih)
+
+    def _on_preview_ready(self, token, key, entry):
+        if entry is None:
+            if token == self._preview_request:
+                self.preview_loading = False
+                self.redraw_canvas()
+            return
+
+        self.preview_cache[key] = entry
+        while len(self.preview_cache) > self.PREVIEW_CACHE_ENTRIES:
+            self.preview_cache.popitem(last=False)
+
+        # A newer request (other image or size) supersedes this one
+        if token == self._preview_request:
+            self._show_preview(entry)
+
+    def _show_preview(self, entry):
+        from PIL import ImageTk
+
+        img, self.preview_gray, self.preview_source_size = entry
+        self.preview_loading = False
+        # The photo stays up until (or unless) a result preview replaces it
+        self.preview_info = ""
         self.preview_img = ImageTk.PhotoImage(img)
+        if not self.update_result_preview():
+            self.redraw_canvas()
+
+    def _schedule_preview_refresh(self):
+        """Debounced preview rebuild after the drop area is resized."""
+        if self._resize_job is not None:
+            self.after_cancel(self._resize_job)
+        self._resize_job = self.after(200, self._refresh_after_resize)
+
+    def _refresh_after_resize(self):
+        self._resize_job = None
+        self.request_preview()
+
+    # ===============================================================
+    # LIVE RESULT PREVIEW
+    # ===============================================================
+    def _schedule_result_preview(self):
+        """Debounced re-threshold while parameters are being typed."""
+        if self._result_job is not None:
+            self.after_cancel(self._result_job)
+        self._result_job = self.after(self.RESULT_DEBOUNCE_MS, self._run_result_preview)
+
+    def _run_result_preview(self):
+        self._result_job = None
+        self.update_result_preview()
+
+    def update_result_preview(self) -> bool:
+        """
+        Show the thresholded, step-sampled result instead of the photo.
+
+        Works on the cached preview array only. Rows take a few milliseconds
+        and are shown right away; outline/skeleton tracing takes tens, so it
+        runs in a worker thread and only the newest result is shown. Returns
+        False (leaving the canvas alone) while the parameters don't parse.
+        """
+        # Any result still being traced is out of date now
+        self._result_request += 1
+        if self.preview_gray is None:
+            return False
+        try:
+            scale = float(self.scale_var.get())
+            step = int(self.step_var.get())
+            threshold = int(self.threshold_var.get())
+        except ValueError:
+            return False
+        if scale <= 0 or step <= 0:
+            return False
+
+        iw, ih = self.preview_source_size
+        draw_size = (int(iw * scale), int(ih * scale))
+        mode = self.mode_var.get()
+        args = (self.preview_gray, draw_size, step, threshold, mode)
+        token = self._result_request
+
+        if mode == "rows":
+            self._show_result(token, preview_mask(*args), draw_size, mode)
+            return True
+
+        self.redraw_canvas()
+
+        def worker():
+            try:
+                result = preview_mask(*args)
+            except Exception as e:
+                print("Could not build result preview:", e)
+                return
+            self.after(0, lambda: self._show_result(token, result, draw_size, mode))
+
+        threading.Thread(target=worker, daemon=True).start()
+        return True
+
+    def _show_result(self, token, result, draw_size, mode):
+        from PIL import Image, ImageTk
+
+        # Parameters changed again while this one was being traced
+        if token != self._result_request:
+            return
+        mask, strokes = result
+        # Black ink on white paper, as it will appear on the drawing canvas
+        pixels = np.where(mask, 0, 255).astype(np.uint8)
+        self.preview_img = ImageTk.PhotoImage(Image.fromarray(pixels, mode="L"))
+        count = "strokes counted when planned" if strokes is None else f"≈ {strokes:,} strokes"
+        self.preview_info = f"{count} · {draw_size[0]}×{draw_size[1]} px · {mode}"
         self.redraw_canvas()
 
+    # ===============================================================
+    # AUTO-TUNE
+    # ===============================================================
+    def on_autotune(self):
+        """Search step/threshold/tolerance/mode for the best fit to a time budget."""
+        if not self.controller.image_path:
+            messagebox.showwarning("No image", "Please choose an image first.")
+            return
+        try:
+            scale = float(self.scale_var.get())
+            threshold = int(self.threshold_var.get())
+            rate = float(self.rate_var.get())
+        except ValueError:
+            messagebox.showerror("Invalid input", "Please check your numeric parameters.")
+            return
+
+        minutes = simpledialog.askfloat(
+            "Auto-tune",
+            "Maximum drawing time (minutes):",
+            parent=self,
+            minvalue=0.1,
+        )
+        if minutes is None:
+            return
+
+        path = self.controller.image_path
+        backend = self.backend_var.get()
+        if not is_calibrated(backend) and not messagebox.askokcancel(
+            "Auto-tune",
+            f"Auto-tune first measures how fast the {backend} backend moves the mouse.\n"
+            "The pointer will move by itself near the top-left of the screen for\n"
+            "a moment; don't touch the mouse until it stops.\n\nContinue?",
+        ):
+            return
+        self.btn_autotune.config(state="disabled")
+        self.controller.global_status_var.set("Auto-tuning…")
+
+        def worker():
+            from autotune import autotune
+            from core import load_and_prepare_image
+
+            try:
+                # Moves the cursor briefly the first time per backend (confirmed above)
+                seconds_per_event = calibrate(backend)
+                img = load_and_prepare_image(path, scale)
+                result = autotune(
+                    img,
+                    threshold=threshold,
+                    max_seconds=minutes * 60,
+                    seconds_per_event=seconds_per_event,
+                    rate=rate,
+                )
+                error = None
+            except Exception as e:
+                result, error = None, e
+            self.after(0, lambda: self._on_autotune_done(result, error))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_autotune_done(self, result, error):
+        from autotune import describe
+
+        self.btn_autotune.config(state="normal")
+        self.controller.global_status_var.set("")
+        if error is not None:
+            messagebox.showerror("Auto-tune failed", str(error))
+            return
+
+        print(f"Auto-tune: {len(result['candidates'])} candidates in {result['elapsed_s']:.2f}s")
+        curve = "\n".join(describe(c) for c in result["pareto"])
+        print(curve)
+
+        best = result["best"]
+        if best is None:
+            messagebox.showwarning(
+                "Auto-tune",
+                "No settings fit the time budget.\n\nTradeoff curve:\n" + curve,
+            )
+            return
+
+        self.step_var.set(str(best["step"]))
+        self.threshold_var.set(str(best["threshold"]))
+        self.tolerance_var.set(f"{best['tolerance']:g}")
+        self.mode_var.set(best["mode"])
+        messagebox.showinfo(
+            "Auto-tune",
+            f"Applied: {describe(best)}\n\nTradeoff curve (fewest events first):\n{curve}",
+        )
+
     # ===============================================================
     # NEXT BUTTON HANDLER
     # ===============================================================
@@ -259,7 +580,10 @@ class ConfigPage(tk.Frame):
             scale = float(self.scale_var.get())
             step = int(self.step_var.get())
             threshold = int(self.threshold_var.get())
-            delay = float(self.delay_var.get())
+            rate = float(self.rate_var.get())
+            tolerance = float(self.tolerance_var.get())
+            colors = int(self.colors_var.get())
+            mode = self.mode_var.get()
         except ValueError:
             messagebox.showerror("Invalid input", "Please check your numeric parameters.")
             return
@@ -275,24 +599,105 @@ class ConfigPage(tk.Frame):
                 "Invalid threshold", "Threshold must be between 0 and 255."
             )
             return
-        if delay < 0:
-            messagebox.showerror("Invalid delay", "Delay cannot be negative.")
+        if tolerance < 0:
+            messagebox.showerror("Invalid tolerance", "Tolerance cannot be negative.")
             return
-
-        try:
-            img = load_and_prepare_image(self.controller.image_path, scale)
-        except Exception as e:
-            messagebox.showerror("Error loading image", str(e))
+        if rate < 0:
+            messagebox.showerror("Invalid rate", "Draw rate cannot be negative (0 = unlimited).")
+            return
+        if not (0 <= colors <= self.MAX_COLORS):
+            messagebox.showerror(
+                "Invalid colors",
+                f"Colors must be between 0 (black only) and {self.MAX_COLORS}.",
+            )
             return
 
-        self.controller.img = img
-        self.controller.img_width, self.controller.img_height = img.size
-        self.controller.params = {
+        params = {
             "scale": scale,
             "step": step,
             "threshold": threshold,
-            "delay": delay,
+            "rate": rate,
+            "tolerance": tolerance,
+            "colors": colors,
+            "mode": mode,
+            "backend": self.backend_var.get(),
         }
+        path = self.controller.image_path
+        self.btn_next.config(state="disabled")
+        self.controller.global_status_var.set("Planning…")
+
+        def worker():
+            try:
+                result = self._prepare_job(path, params)
+                error = None
+            except Exception as e:
+                result, error = None, e
+            self.after(0, lambda: self._on_job_ready(params, result, error))
+
+        # Loading, planning and ordering can take seconds on big images
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _prepare_job(self, path, params):
+        """
+        Runs in a worker thread: the cached or freshly compiled plan, or the
+        image / packed mask the StartPointPage plans band by band. Plans of
+        masked images are never cached: they are too big to keep whole.
+        """
+        from bitmask import build_mask, needs_tiling
+        from core import load_and_prepare_image
+        from planner import describe_plan
+
+        scale, step, threshold = params["scale"], params["step"], params["threshold"]
+        mode, tolerance, colors = params["mode"], params["tolerance"], params["colors"]
+        cache = default_cache()
+        img = mask = None
+        key = cache.key(path, params)
+        # The key still names the job, so a checkpoint can be resumed
+        tiled = not colors and needs_tiling(path, scale)
+        plan = None if tiled else cache.get(key)
+        if plan is None and colors:
+            from palette import compile_palette_plan
+
+            # Colour layers are planned up front so each colour is picked once
+            img = load_and_prepare_image(path, scale, mode="RGB")
+            plan = compile_palette_plan(img, colors, step, threshold, mode, tolerance)
+            print(describe_plan(plan))
+            cache.put(key, plan)
+        elif tiled:
+            # Too big to load whole: threshold tile by tile into a packed
+            # mask, planned band by band while drawing
+            mask = build_mask(path, scale, step, threshold)
+        elif plan is None:
+            img = load_and_prepare_image(path, scale)
+            # Big images are planned band by band while drawing instead
+            if img.width * img.height < self.STREAM_MIN_PIXELS:
+                plan = compile_plan(img, step, threshold, mode, tolerance)
+                print(describe_plan(plan))
+                cache.put(key, plan)
+        print("Plan cache:", cache.stats())
+        return img, mask, plan, key
+
+    def _on_job_ready(self, params, result, error):
+        self.btn_next.config(state="normal")
+        self.controller.global_status_var.set("")
+        if error is not None:
+            messagebox.showerror("Error loading image", str(error))
+            return
+        img, mask, plan, key = result
+
+        if self.controller.mask is not None:
+            self.controller.mask.close()
+        self.controller.img = img
+        self.controller.mask = mask
+        self.controller.plan = plan
+        self.controller.plan_key = key
+        if plan is not None:
+            self.controller.img_width, self.controller.img_height = plan.width, plan.height
+        elif mask is not None:
+            self.controller.img_width, self.controller.img_height = mask.width, mask.height
+        else:
+            self.controller.img_width, self.controller.img_height = img.size
+        self.controller.params = params
 
         start_page = self.controller.frames["start"]
         start_page.update_info()
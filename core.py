@@ -1,98 +1,669 @@
 # core.py
+import os
+import sys
+import threading
 import time
+import warnings
+from collections import OrderedDict
+
+import numpy as np
 from PIL import Image
-import pyautogui
+
+import tracing
+from backends import OutputBackend, PyAutoGUIBackend, SimulatedCanvasBackend
+from pacing import Pacer
+from planner import describe_plan, plan_image
+from stroke_plan import StrokePlan, PEN_DOWN
 
 # =======================
-# STYLE CONSTANTS
+# CORE DRAWING LOGIC
 # =======================
 
-APP_BG = "#1e1e1e"
-CARD_BG = "#252526"
-TEXT_FG = "#ffffff"
-SUBTLE_FG = "#bbbbbb"
-ACCENT_FG = "#3fa9f5"
+# Recently decoded sources, shared by the ConfigPage preview and the drawing
+# pipeline so a file picked in the UI isn't decoded twice.
+DECODE_CACHE_ENTRIES = 2
+_decoded = OrderedDict()
+_decode_lock = threading.Lock()
+
+# Refuse loads whose estimated peak would exceed this (kiosks have little RAM)
+MAX_LOAD_MB = float(os.environ.get("GHOSTBRUSH_MAX_LOAD_MB", "1024"))
+
+# Oversized inputs are caught by the MAX_LOAD_MB estimate, made from the
+# header before anything is decoded; Pillow's own pixel cap would also refuse
+# the scans bitmask.py reads tile by tile
+Image.MAX_IMAGE_PIXELS = None
+
+# JPEG decoders can scale by 1/1, 1/2, 1/4 or 1/8 while decoding
+_DRAFT_SCALES = (8, 4, 2, 1)
+
+
+def decode_image(path, min_size=None, mode=None) -> Image.Image:
+    """
+    Decode `path` (first frame), reusing a recent decode when it is big enough.
+
+    With min_size=(w, h), JPEGs are decoded in draft mode at the smallest
+    DCT scale that still covers min_size; without it the full resolution is
+    returned. mode="L" lets the decoder emit grayscale directly where it
+    can; a cached colour decode is reused instead when one is available.
+    Callers must treat the result as read-only.
+    """
+    st = os.stat(path)
+    stamp = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    keys = [(stamp, None)] if mode is None else [(stamp, mode), (stamp, None)]
+
+    with _decode_lock:
+        for key in keys:
+            entry = _decoded.get(key)
+            if entry is None:
+                continue
+            img, full_size = entry
+            if img.size == full_size or (
+                min_size is not None
+                and img.width >= min_size[0]
+                and img.height >= min_size[1]
+            ):
+                _decoded.move_to_end(key)
+                return img
+
+    with tracing.span("decode"):
+        img = Image.open(path)
+        full_size = img.size
+        original_mode = img.mode
+        if min_size is not None or mode is not None:
+            # No-op for formats without draft support
+            size = full_size if min_size is None else min_size
+            img.draft(mode or img.mode, (max(1, int(size[0])), max(1, int(size[1]))))
+        img.load()
+
+    # Only grayscale drafts of colour files are useless to colour callers
+    key = (stamp, mode if mode and img.mode == mode != original_mode else None)
+    with _decode_lock:
+        _decoded[key] = (img, full_size)
+        _decoded.move_to_end(key)
+        while len(_decoded) > DECODE_CACHE_ENTRIES:
+            _decoded.popitem(last=False)
+    return img
+
+
+def image_size(path):
+    """Full-resolution (width, height) from the file header, without decoding."""
+    with Image.open(path) as img:
+        return img.size
+
+
+def _bytes_per_pixel(mode: str) -> int:
+    # Pillow keeps multi-band images at 4 bytes per pixel
+    if mode in ("1", "L", "P"):
+        return 1
+    if mode.startswith("I;16"):
+        return 2
+    return 4
+
+
+def _image_bytes(img: Image.Image) -> int:
+    return img.width * img.height * _bytes_per_pixel(img.mode)
 
-BLUE = "#0065a8"
 
 # =======================
-# GLOBAL FONT SETTINGS
+# RESAMPLING
 # =======================
 
-# Change this single line to swap fonts app-wide
-FONT_FAMILY = "Snowstorm"
+# Fixed-point precision of Pillow's 8-bit resampling (libImaging/Resample.c)
+_PRECISION_BITS = 32 - 8 - 2
+# Output rows resized per chunk, bounding the int32 accumulator
+_RESIZE_CHUNK_ROWS = 1024
+
+
+def _bicubic(x: np.ndarray) -> np.ndarray:
+    # Pillow's bicubic kernel, a = -0.5, with its operation order
+    a = -0.5
+    x = np.abs(x)
+    return np.where(x < 1.0, ((a + 2.0) * x - (a + 3.0)) * x * x + 1.0,
+                    np.where(x < 2.0, (((x - 5.0) * x + 8.0) * x - 4.0) * a, 0.0))
+
+
+class GrayResizer:
+    """
+    Pillow's bicubic resize of a grayscale image from src_size to new_size,
+    computed for any band of output rows on its own.
+
+    The horizontal pass is Pillow's; the vertical pass replays Pillow's
+    fixed-point filter weights, so bands join into exactly what
+    img.resize(new_size) gives for the whole image. Whole-image loads and
+    tiled loads (bitmask.TiledSource) both resize through this class, so
+    an image thresholds the same on either side of MAX_LOAD_MB.
+    """
 
-PG_NAME        = (FONT_FAMILY, 40, "bold")
-FONT_TITLE     = (FONT_FAMILY, 25, "bold")
-FONT_LABEL     = (FONT_FAMILY, 20)
-FONT_BUTTON    = (FONT_FAMILY, 16, "bold")
-FONT_ENTRY     = (FONT_FAMILY, 15)
-FONT_STATUS    = (FONT_FAMILY, 20)
-FONT_COUNTDOWN = (FONT_FAMILY, 100, "bold")
+    def __init__(self, src_size, new_size):
+        self.src_size = tuple(src_size)
+        self.new_size = tuple(new_size)
+        in_size, out_size = self.src_size[1], self.new_size[1]
+        scale = in_size / out_size
+        filterscale = max(scale, 1.0)
+        support = 2.0 * filterscale
+        taps = int(np.ceil(support)) * 2 + 1
+        center = (np.arange(out_size) + 0.5) * scale
+        first = np.maximum((center - support + 0.5).astype(np.int64), 0)
+        count = np.minimum((center + support + 0.5).astype(np.int64), in_size) - first
+        k = np.arange(taps)
+        weights = _bicubic(((k + first[:, None]) - center[:, None] + 0.5) / filterscale)
+        weights[k >= count[:, None]] = 0.0
+        total = weights.sum(axis=1, keepdims=True)
+        weights = np.divide(weights, total, out=weights, where=total != 0)
+        fixed = weights * (1 << _PRECISION_BITS)
+        self._first = first
+        self._last = first + count
+        self._weights = np.trunc(np.where(fixed < 0, fixed - 0.5, fixed + 0.5)).astype(np.int32)
+
+    def source_span(self, y0: int, y1: int):
+        """Source rows [s0, s1) that output rows [y0, y1) are made from."""
+        if self.src_size[1] == self.new_size[1]:
+            return y0, y1
+        return int(self._first[y0]), int(self._last[y0:y1].max())
+
+    def rows(self, src: np.ndarray, s0: int, y0: int, y1: int) -> np.ndarray:
+        """Output rows [y0, y1) from gray source rows `src` starting at row s0."""
+        src_w, src_h = self.src_size
+        new_w, new_h = self.new_size
+        if new_w != src_w:
+            band = Image.fromarray(np.ascontiguousarray(src), mode="L")
+            src = np.asarray(band.resize((new_w, len(src)), Image.BICUBIC,
+                                         box=(0, 0, src_w, len(src))))
+        if new_h == src_h:
+            return src[y0 - s0:y1 - s0]
+
+        first = self._first[y0:y1] - s0
+        acc = np.full((y1 - y0, new_w), 1 << (_PRECISION_BITS - 1), dtype=np.int32)
+        for k in range(self._weights.shape[1]):
+            # Taps past a row's window have zero weight; clip them into range
+            index = np.minimum(first + k, len(src) - 1)
+            acc += src[index] * self._weights[y0:y1, k, None]
+        return np.clip(acc >> _PRECISION_BITS, 0, 255).astype(np.uint8)
+
+
+def resize_gray(img: Image.Image, size) -> Image.Image:
+    """img.resize(size) for an "L" image, through GrayResizer."""
+    if img.size == tuple(size):
+        return img
+    resizer = GrayResizer(img.size, size)
+    src = np.asarray(img)
+    out = np.empty((size[1], size[0]), dtype=np.uint8)
+    for y0 in range(0, size[1], _RESIZE_CHUNK_ROWS):
+        y1 = min(y0 + _RESIZE_CHUNK_ROWS, size[1])
+        s0, s1 = resizer.source_span(y0, y1)
+        out[y0:y1] = resizer.rows(src[s0:s1], s0, y0, y1)
+    return Image.fromarray(out, mode="L")
 
 
 # =======================
-# CORE DRAWING LOGIC
+# LOADING
 # =======================
 
-def load_and_prepare_image(path, scale: float) -> Image.Image:
-    """Load an image, convert to grayscale and scale it."""
-    img = Image.open(path).convert("L")
+def plan_load(path, scale: float, target: str = "L") -> dict:
+    """
+    Choose the cheapest correct way to load `path` at `scale` into mode
+    `target`, from the header alone, and estimate its peak memory in bytes.
+
+    Paths:
+      full  - decode at native size, convert to the target mode, then resize
+      draft - JPEG decoded at 1/2, 1/4 or 1/8 size (in the target mode when
+              possible), then resized
+
+    Either way the resize is the same bicubic one (GrayResizer for "L"), so
+    only the decoded size changes the result, never the path.
+    """
+    with Image.open(path) as img:
+        w, h = img.size
+        fmt = img.format
+        mode = img.mode
+
+    new_w = max(1, int(w * scale))
+    new_h = max(1, int(h * scale))
+    out_bytes = new_w * new_h * _bytes_per_pixel(target)
+
+    if scale < 1 and fmt == "JPEG":
+        denom = next(d for d in _DRAFT_SCALES if w // d >= new_w and h // d >= new_h)
+        dw, dh = -(-w // denom), -(-h // denom)
+        bpp = 4 if mode == "CMYK" else _bytes_per_pixel(target)
+        if denom > 1 or mode != "CMYK":
+            converted = dw * dh * _bytes_per_pixel(target) if mode == "CMYK" else 0
+            # The horizontal resize pass keeps every source row at the new width
+            return {"path": "draft", "size": (w, h), "new_size": (new_w, new_h),
+                    "factor": denom,
+                    "estimate": dw * dh * bpp + converted + dh * new_w + out_bytes}
+
+    # JPEG decodes straight to the target mode; anything else converts first
+    direct = mode == target or (fmt == "JPEG" and mode != "CMYK")
+    decoded = w * h * _bytes_per_pixel(target if direct else mode)
+    converted = 0 if direct else w * h * _bytes_per_pixel(target)
+    passes = h * new_w * _bytes_per_pixel(target) if (new_w, new_h) != (w, h) else 0
+    return {"path": "full", "size": (w, h), "new_size": (new_w, new_h),
+            "estimate": decoded + converted + passes + out_bytes}
+
 
-    w, h = img.size
-    new_w = int(w * scale)
-    new_h = int(h * scale)
-    img = img.resize((new_w, new_h))
+def _peak_rss_bytes():
+    """Process high-water RSS, or None where the platform doesn't report it."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
 
-    print(f"Original size: {w}x{h}, resized to: {new_w}x{new_h}")
+
+def load_and_prepare_image(path, scale: float, mode: str = "L", report=print) -> Image.Image:
+    """
+    Load an image, convert to grayscale (or `mode`, e.g. "RGB" for palette
+    plans) and scale it with a bicubic resize.
+
+    Shrinking JPEG loads go through the decoder's draft mode, so peak memory
+    follows the output size rather than the source. The image is converted
+    before it is resized, as palette and 1-bit images can't be resampled in
+    their own modes. Grayscale loads estimated to need more than
+    GHOSTBRUSH_MAX_LOAD_MB are assembled band by band (bitmask.load_gray);
+    MemoryError is raised if that can't stay under the limit either.
+    The sizes and memory figures go to `report` (None to stay quiet).
+    """
+    load = plan_load(path, scale, mode)
+    (w, h), (new_w, new_h) = load["size"], load["new_size"]
+    if load["estimate"] > MAX_LOAD_MB * 2**20:
+        if mode == "L":
+            from bitmask import load_gray
+
+            # Too big to decode whole: read it band by band instead
+            return load_gray(path, scale, report=report)
+        raise MemoryError(
+            f"Loading {w}x{h} at scale {scale:g} needs about "
+            f"{load['estimate'] / 2**20:.0f} MB (limit {MAX_LOAD_MB:g} MB); "
+            "use a smaller scale or image."
+        )
+
+    with tracing.span("load", path=str(path)):
+        source = decode_image(path, (new_w, new_h) if scale < 1 else None, mode=mode)
+        held = _image_bytes(source)
+        peak = held
+        img = source
+
+        with tracing.span("resize", path=load["path"]):
+            if img.mode != mode:
+                img = img.convert(mode)
+                held += _image_bytes(img)
+            if img.size != (new_w, new_h):
+                # Same resampling as the tiled loader (bitmask.TiledSource)
+                passes = img.height * new_w * _bytes_per_pixel(mode)
+                img = (resize_gray(img, (new_w, new_h)) if mode == "L"
+                       else img.resize((new_w, new_h), Image.BICUBIC))
+                peak = max(peak, held + passes + _image_bytes(img))
+            elif img is source:
+                img = img.copy()  # the decode is shared (decode_image)
+
+    tracing.count("load_peak_bytes", peak)
+    if report:
+        rss = _peak_rss_bytes()
+        report(f"Original size: {w}x{h}, resized to: {new_w}x{new_h}")
+        report(f"Load path: {load['path']}, peak image memory "
+               f"{peak / 2**20:.1f} MB (estimated {load['estimate'] / 2**20:.1f} MB)"
+               + (f", process peak RSS {rss / 2**20:.0f} MB" if rss else ""))
     return img
 
 
+def _quiet(*args) -> None:
+    pass
+
+
+class _PauseCorner(OutputBackend):
+    """
+    Forwards to the output backend and pauses the job when the user pushes
+    the pointer into the screen's top-right corner (see
+    OutputBackend.pause_requested). The corner is checked before every
+    move, so the executor's next move can't pull the pointer back out of
+    it first. A pause mid-stroke releases the button while paused and
+    presses it again where the stroke left off. Unlike a key binding, this
+    works while the target application has focus.
+    """
+
+    def __init__(self, inner: OutputBackend, job):
+        self.inner = inner
+        self.name = inner.name
+        self.job = job
+        self.x = self.y = 0
+        self.down = False
+
+    def begin(self):
+        self.inner.begin()
+
+    def end(self):
+        self.inner.end()
+
+    def move_to(self, x, y):
+        if self.inner.pause_requested():
+            self._hold()
+        self.inner.move_to(x, y)
+        self.x, self.y = x, y
+
+    def mouse_down(self):
+        self.inner.mouse_down()
+        self.down = True
+
+    def mouse_up(self):
+        self.inner.mouse_up()
+        self.down = False
+
+    def capture(self, left, top, width, height):
+        return self.inner.capture(left, top, width, height)
+
+    def pause_requested(self):
+        return self.inner.pause_requested()
+
+    def _hold(self) -> None:
+        resume_down = self.down
+        if resume_down:
+            self.mouse_up()
+        self.job.pause()
+        self.job.wait_if_paused()
+        if resume_down:
+            self.inner.move_to(self.x, self.y)
+            self.mouse_down()
+
+
+class _Palette:
+    """Clicks the swatch of each stroke colour when it changes (see execute_stream)."""
+
+    def __init__(self, backend: OutputBackend, swatches):
+        self.backend = backend
+        self.swatches = [(int(x), int(y)) for x, y in swatches]
+        self.current = None
+        self.switches = 0
+
+    def select(self, color: int) -> None:
+        if color == self.current:
+            return
+        self.backend.move_to(*self.swatches[color])
+        self.backend.mouse_down()
+        self.backend.mouse_up()
+        self.current = color
+        self.switches += 1
+
+
+def _replay(plan: StrokePlan, origin, backend: OutputBackend, pace, job=None,
+            palette=None) -> None:
+    """Emit one plan's strokes; pace is Pacer.advance or None."""
+    screen_points = (plan.points + np.array(origin, dtype=np.int32)).tolist()
+    offsets = plan.offsets.tolist()
+    pens = plan.pen.tolist()
+    colors = plan.color.tolist() if palette is not None and plan.color is not None else None
+
+    if pace:
+        # Distance covered by the move to each vertex (travel for stroke starts)
+        dist = np.zeros(plan.num_points)
+        if plan.num_points > 1:
+            dist[1:] = np.hypot(*np.diff(plan.points, axis=0).T)
+        dist = dist.tolist()
+
+    move_to = backend.move_to
+    mouse_down = backend.mouse_down
+    mouse_up = backend.mouse_up
+
+    for i, pen in enumerate(pens):
+        lo, hi = offsets[i], offsets[i + 1]
+        if job is not None:
+            job.wait_if_paused()
+        if lo == hi:
+            if job is not None:
+                job.stroke_done()
+            continue
+        drawing = pen == PEN_DOWN
+        if drawing and colors is not None:
+            palette.select(colors[i])
+
+        move_to(*screen_points[lo])
+        if pace:
+            pace(dist[lo], drawing=False)
+        if drawing:
+            mouse_down()
+            if pace:
+                pace(1.0)  # a dot is one pixel of ink
+        for k in range(lo + 1, hi):
+            move_to(*screen_points[k])
+            if pace:
+                pace(dist[k], drawing=drawing)
+        if drawing:
+            mouse_up()
+        if job is not None:
+            job.stroke_done()
+
+
+def execute_stream(plans,
+                   start_x: int,
+                   start_y: int,
+                   rate: float = 0,
+                   backend: OutputBackend = None,
+                   pace_travel: bool = False,
+                   job=None,
+                   swatches=None,
+                   report=print) -> dict:
+    """
+    Replay a sequence of StrokePlans (e.g. bands still being planned by a
+    pipeline.prefetch worker) as one drawing job, offset to (start_x, start_y).
+
+    Each pen-down stroke is one drag through its vertices. rate is the target
+    drawing speed in pixels per second (0 = as fast as possible); pen-up
+    travel is not paced unless pace_travel is set. The default backend moves
+    the real cursor with pyautogui.
+
+    With a checkpoint.DrawingJob, strokes it has already completed are
+    skipped, progress is recorded after every stroke and the job can be
+    paused between strokes, or mid-stroke by pushing the pointer into the
+    top-right corner of the screen.
+
+    For multi-colour plans, swatches gives the screen (x, y) of each palette
+    colour; the swatch is clicked before the first stroke of each colour run.
+    Without swatches everything is drawn with the current colour.
+
+    Progress messages go to `report` (None to stay quiet, e.g. for repairs).
+    Returns stroke/event totals, colour switches and the time to the first stroke.
+    """
+    t0 = time.perf_counter()
+    if backend is None:
+        backend = PyAutoGUIBackend()
+    backend = tracing.traced_backend(backend)
+
+    pacer = Pacer(rate, pace_travel=pace_travel)
+    pace = pacer.advance if pacer.active else None
+    if job is not None:
+        backend = _PauseCorner(backend, job)
+    palette = _Palette(backend, swatches) if swatches else None
+    stats = {"strokes": 0, "events": 0, "color_switches": 0,
+             "time_to_first_stroke_s": None,
+             "resumed_from": job.done if job is not None else 0}
+    if job is not None and pace:
+        job.pacer = pacer
+    if not report:
+        report = _quiet
+    if stats["resumed_from"]:
+        report(f"Resuming after stroke {stats['resumed_from']}.")
+
+    report(f"Drawing with the {backend.name} backend.")
+    report("Starting drawing... Move mouse to TOP-LEFT corner of the screen to ABORT"
+           + (", TOP-RIGHT corner to pause." if job is not None else "."))
+
+    backend.begin()
+    try:
+        with tracing.span("draw"):
+            if pace:
+                pacer.start()
+            seen = 0  # strokes in earlier plans of the stream
+            warned = False
+            for plan in plans:
+                if job is not None:
+                    first = job.done - seen
+                    seen += plan.num_strokes
+                    if first >= plan.num_strokes:
+                        continue
+                    if first > 0:
+                        plan = plan.slice(first)
+                if plan.num_strokes and stats["time_to_first_stroke_s"] is None:
+                    stats["time_to_first_stroke_s"] = time.perf_counter() - t0
+                    tracing.count("first_stroke_us",
+                                  int(stats["time_to_first_stroke_s"] * 1e6))
+                if palette is None and plan.palette is not None and not warned:
+                    report("No palette swatches set: drawing every colour with the current one.")
+                    warned = True
+                _replay(plan, (start_x, start_y), backend, pace, job, palette)
+                stats["strokes"] += plan.num_strokes
+                stats["events"] += plan.event_count()
+                tracing.count("strokes", plan.num_strokes)
+                tracing.count("events", plan.event_count())
+    finally:
+        backend.end()
+
+    stats["elapsed_s"] = time.perf_counter() - t0
+    if palette:
+        stats["color_switches"] = palette.switches
+        stats["events"] += 3 * palette.switches
+        tracing.count("color_switches", palette.switches)
+    if pace and pacer.slept:
+        report(f"Pacing slept {pacer.slept:.1f}s to hold {rate:g} px/s.")
+    first = stats["time_to_first_stroke_s"]
+    report(f"Done! {stats['strokes']} strokes, {stats['events']} mouse events"
+           + (f", {stats['color_switches']} colour switches" if stats["color_switches"] else "")
+           + (f", first stroke after {first * 1000:.0f} ms." if first is not None else "."))
+    return stats
+
+
+def execute_plan(plan: StrokePlan,
+                 start_x: int,
+                 start_y: int,
+                 rate: float = 0,
+                 backend: OutputBackend = None,
+                 pace_travel: bool = False,
+                 job=None,
+                 swatches=None,
+                 report=print) -> dict:
+    """Replay one compiled StrokePlan; see execute_stream for the arguments."""
+    return execute_stream([plan], start_x, start_y, rate, backend, pace_travel, job, swatches,
+                          report)
+
+
+def render_plan(plan: StrokePlan) -> SimulatedCanvasBackend:
+    """Draw a plan headlessly onto a simulated canvas the size of the plan."""
+    canvas = SimulatedCanvasBackend(plan.width, plan.height)
+    execute_plan(plan, 0, 0, backend=canvas, report=None)
+    return canvas
+
+
+def estimate_job(plan: StrokePlan,
+                 seconds_per_event: float,
+                 rate: float = 0,
+                 pace_travel: bool = False) -> dict:
+    """
+    Pre-flight figures for replaying `plan`: mouse events, inked and pen-up
+    pixels, and the expected duration given the backend's measured
+    seconds_per_event (see backends.calibrate) and the pacing rate.
+
+    The executor can't go faster than its events allow, and the Pacer only
+    sleeps while ahead of its deadline, so the duration is whichever of the
+    two takes longer. Multi-colour plans add one swatch click (three events)
+    per colour switch.
+    """
+    return estimate_stream([plan], seconds_per_event, rate, pace_travel)
+
+
+def estimate_stream(plans,
+                    seconds_per_event: float,
+                    rate: float = 0,
+                    pace_travel: bool = False) -> dict:
+    """
+    estimate_job for a sequence of plans replayed as one job (see
+    execute_stream), taking one plan at a time so a stream of bands never
+    has to exist as a whole. Travel from each plan's last point to the next
+    plan's first is included.
+    """
+    events = switches = dots = 0
+    ink = travel = 0.0
+    last_point = last_color = None
+    for plan in plans:
+        lengths = np.diff(plan.offsets)
+        if plan.num_points > 1:
+            seg = np.hypot(*np.diff(plan.points, axis=0).T.astype(np.float64))
+            stroke_of = np.repeat(np.arange(plan.num_strokes), lengths)
+            # Segments inside a pen-down stroke draw; everything else is travel
+            drawn = (stroke_of[1:] == stroke_of[:-1]) & (plan.pen[stroke_of[1:]] == PEN_DOWN)
+            ink += float(seg[drawn].sum())
+            travel += float(seg[~drawn].sum())
+        if plan.num_points:
+            if last_point is not None:
+                travel += float(np.hypot(*(plan.points[0] - last_point)))
+            last_point = plan.points[-1].astype(np.float64)
+
+        plan_switches = plan.color_switches()
+        if plan_switches:
+            # The swatch picked last in the previous plan is still selected
+            if last_color is not None and plan.color[0] == last_color:
+                plan_switches -= 1
+            last_color = plan.color[-1]
+        switches += plan_switches
+        events += plan.event_count() + 3 * plan_switches
+        if rate > 0:
+            dots += int(np.count_nonzero((plan.pen == PEN_DOWN) & (lengths > 0)))
+
+    event_s = events * seconds_per_event
+    paced_s = 0.0
+    if rate > 0:
+        paced_s = (ink + dots + (travel if pace_travel else 0.0)) / rate
+    return {
+        "events": events,
+        "ink_px": ink,
+        "travel_px": travel,
+        "color_switches": switches,
+        "seconds_per_event": seconds_per_event,
+        "duration_s": max(event_s, paced_s),
+    }
+
+
+def format_duration(seconds: float) -> str:
+    """Short human form, e.g. '45 s', '3 min 20 s', '2 h 05 min'."""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds} s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes} min {seconds:02d} s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours} h {minutes:02d} min"
+
+
 def draw_image_with_mouse(img: Image.Image,
                           start_x: int,
                           start_y: int,
                           step: int,
                           threshold: int,
-                          delay: float) -> None:
-    """Use pyautogui to 'draw' the grayscale image on the screen."""
-    pixels = img.load()
-    width, height = img.size
-
-    # Safety: allow moving mouse to top-left corner to abort
-    pyautogui.FAILSAFE = True
-    # Extra speed: remove global pause between actions
-    pyautogui.PAUSE = 0
-
-    print("Starting drawing... Move mouse to TOP-LEFT corner of the screen to ABORT.")
-
-    for y in range(0, height, step):
-        drawing = False  # are we currently holding the mouse button?
-
-        for x in range(0, width, step):
-            brightness = pixels[x, y]  # 0 = black, 255 = white
-            screen_x = start_x + x
-            screen_y = start_y + y
-
-            if brightness < threshold:
-                # dark pixel -> we should be drawing
-                if not drawing:
-                    pyautogui.moveTo(screen_x, screen_y)
-                    pyautogui.mouseDown()
-                    drawing = True
-                else:
-                    pyautogui.moveTo(screen_x, screen_y)
-            else:
-                # bright pixel -> we should stop drawing if we were
-                if drawing:
-                    pyautogui.mouseUp()
-                    drawing = False
-
-            if delay > 0:
-                time.sleep(delay)
-
-        # at end of row, make sure we release the mouse if still drawing
-        if drawing:
-            pyautogui.mouseUp()
-            drawing = False
+                          delay: float = None,
+                          backend: OutputBackend = None,
+                          previous=None,
+                          *,
+                          rate: float = 0) -> None:
+    """
+    Use an output backend (pyautogui by default) to 'draw' the grayscale image.
+
+    rate is the drawing speed in px/s (0 = unlimited). delay, the old pause
+    in seconds after every sampled pixel, is deprecated: it becomes the rate
+    the old loop moved the pen along a dark run, step / delay px/s.
+
+    previous is the image (or StrokePlan) already drawn at the same spot;
+    with it only the strokes the new image adds are drawn (see delta.py).
+    """
+    if delay:
+        # delay=0 was the old "no pause" and keeps working silently
+        warnings.warn("draw_image_with_mouse(delay=...) is deprecated; "
+                      "pass rate= in px/s instead.", DeprecationWarning, stacklevel=2)
+        rate = step / delay
+    if previous is not None:
+        from delta import compile_delta_plan
 
-    print("Done!")
+        plan = compile_delta_plan(img, previous, step, threshold)
+    else:
+        plan = plan_image(img, step, threshold)
+    print(describe_plan(plan))
+    execute_plan(plan, start_x, start_y, rate, backend)
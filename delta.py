@@ -0,0 +1,270 @@
+# delta.py
+"""
+Delta planning: draw only what changed since the previous image or plan.
+
+    python delta.py old.png new.png --out edit.gbplan
+    python delta.py before.gbplan after.png --out edit.gbplan --step 2
+    python delta.py anim.gif --out frames/ --scale 0.5
+    python delta.py anim.gif --out frames/ --draw 200 200 --backend pyautogui
+
+The mouse can only add ink, so a delta plan draws the pixels the new plan
+inks that the previous one did not: dark samples for row plans, and for
+outline/skeleton plans the traced lines themselves. Pixels that went from
+dark to light are counted and reported; they have to be erased by hand (or
+the frame redrawn on a clean canvas).
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+import tracing
+from core import estimate_job, format_duration, load_and_prepare_image
+from ordering import optimize_order
+from planner import (
+    PLANNER_MODES,
+    compile_plan,
+    dark_mask,
+    describe_plan,
+    mask_row_runs,
+    plan_image,
+    plan_traced_mask,
+)
+from simplify import simplify_plan
+from stroke_plan import StrokePlan, rasterize
+
+# =======================
+# MASK DIFFS
+# =======================
+
+def _check_plan_size(plan: StrokePlan, size) -> None:
+    if (plan.width, plan.height) != tuple(size):
+        raise ValueError(
+            f"Previous plan is {plan.width}x{plan.height}, the new image {size[0]}x{size[1]}."
+        )
+
+
+def _fit(img, size):
+    """A previous image resized to `size` and made grayscale if needed."""
+    if img.size != tuple(size):
+        img = img.resize(size)
+    return img.convert("L") if img.mode != "L" else img
+
+
+def drawn_mask(previous, size, step: int, threshold: int) -> np.ndarray:
+    """
+    The step-sampled mask of what is already on the canvas: `previous` is
+    either the last image (resized to `size` if needed) or the StrokePlan
+    that drew it.
+    """
+    width, height = size
+    if isinstance(previous, StrokePlan):
+        _check_plan_size(previous, size)
+        return rasterize(previous, (height, width))[::step, ::step]
+    return dark_mask(_fit(previous, size), step, threshold)
+
+
+def traced_ink(source, size, step: int, threshold: int, mode: str,
+               tolerance: float = 0) -> np.ndarray:
+    """
+    Full-resolution mask of the pixels a traced (outline/skeleton) drawing
+    inks: `source` is the StrokePlan that drew it, or an image, planned and
+    simplified here with the same settings as the new one.
+    """
+    width, height = size
+    if isinstance(source, StrokePlan):
+        _check_plan_size(source, size)
+        plan = source
+    else:
+        plan = simplify_plan(plan_image(_fit(source, size), step, threshold, mode), tolerance)
+    return rasterize(plan, (height, width))
+
+
+def delta_masks(old: np.ndarray, new: np.ndarray):
+    """(added, removed): pixels that gained ink and pixels that lost it."""
+    return new & ~old, old & ~new
+
+
+def delta_row_runs(added: np.ndarray, new: np.ndarray, step: int):
+    """
+    Row runs covering the added pixels. A full row stroke also inks the
+    unsampled pixels between neighbouring samples, so a run that borders
+    ink already on the canvas starts (or ends) on that neighbour.
+    """
+    ys, x_starts, x_ends = mask_row_runs(added, step)
+    rows, cols = new.shape
+    r = ys // step
+    first, last = x_starts // step, x_ends // step
+    left = (first > 0) & new[r, np.maximum(first - 1, 0)]
+    right = (last < cols - 1) & new[r, np.minimum(last + 1, cols - 1)]
+    return ys, x_starts - step * left, x_ends + step * right
+
+
+def compile_delta_plan(img, previous, step: int, threshold: int, mode: str = "rows",
+                       tolerance: float = 0) -> StrokePlan:
+    """
+    Plan only the ink `img` adds to `previous` (an image or StrokePlan).
+
+    Row plans are diffed on the step-sampled dark masks. Outline and
+    skeleton plans are diffed on the pixels the full plans ink (see
+    traced_ink), and the new pixels are traced as they are: outlining or
+    thinning them again, or simplifying the result, would draw lines the
+    full plan never draws.
+
+    meta["delta"] records how many pixels (samples for rows) were added,
+    removed (left for the user to erase) and unchanged.
+    """
+    width, height = img.size
+    with tracing.span("delta", mode=mode, step=step):
+        if mode == "rows":
+            new = dark_mask(img, step, threshold)
+            old = drawn_mask(previous, img.size, step, threshold)
+        elif mode in PLANNER_MODES:
+            new = traced_ink(img, img.size, step, threshold, mode, tolerance)
+            old = traced_ink(previous, img.size, step, threshold, mode, tolerance)
+        else:
+            raise ValueError(f"Unknown planner mode: {mode!r}")
+        added, removed = delta_masks(old, new)
+
+        meta = {
+            "mode": mode,
+            "step": step,
+            "threshold": threshold,
+            "delta": {
+                "added": int(np.count_nonzero(added)),
+                "removed": int(np.count_nonzero(removed)),
+                "unchanged": int(np.count_nonzero(new & old)),
+            },
+        }
+        if mode == "rows":
+            plan = StrokePlan.from_row_runs(*delta_row_runs(added, new, step),
+                                            width=width, height=height, meta=meta)
+            return optimize_order(simplify_plan(plan, tolerance))
+        plan = plan_traced_mask(added, 1, width, height, meta)
+    return optimize_order(plan)
+
+
+# =======================
+# FRAME SEQUENCES
+# =======================
+
+def load_frames(path, scale: float):
+    """
+    Yield every frame of a (possibly animated) image as grayscale at `scale`.
+
+    Pillow composites GIF frames onto the earlier ones, so each frame is the
+    full picture; transparent areas become paper.
+    """
+    with Image.open(path) as img:
+        animated = getattr(img, "n_frames", 1) > 1
+    if not animated:
+        yield load_and_prepare_image(path, scale)
+        return
+
+    with Image.open(path) as img:
+        w, h = img.size
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        for frame in ImageSequence.Iterator(img):
+            rgba = frame.convert("RGBA")
+            paper = Image.new("RGBA", rgba.size, "white")
+            gray = Image.alpha_composite(paper, rgba).convert("L")
+            yield gray.resize(size) if gray.size != size else gray
+
+
+def compile_sequence(frames, step: int, threshold: int, mode: str = "rows",
+                     tolerance: float = 0):
+    """
+    Yield one plan per frame: the first frame in full, every later one as
+    the delta against the frame before it.
+    """
+    previous = None
+    for index, img in enumerate(frames):
+        if previous is None:
+            plan = compile_plan(img, step, threshold, mode, tolerance)
+        else:
+            plan = compile_delta_plan(img, previous, step, threshold, mode, tolerance)
+        plan.meta = dict(plan.meta, frame=index)
+        previous = img
+        yield plan
+
+
+# =======================
+# CLI
+# =======================
+
+def _load_previous(path, scale):
+    if path.lower().endswith(".gbplan"):
+        return StrokePlan.load(path)
+    return load_and_prepare_image(path, scale)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+",
+                        help="PREVIOUS NEW (image or .gbplan, then image), "
+                             "or one multi-frame image")
+    parser.add_argument("--out", required=True,
+                        help=".gbplan file for a pair, directory for a sequence")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--step", type=int, default=1)
+    parser.add_argument("--threshold", type=int, default=200)
+    parser.add_argument("--mode", choices=PLANNER_MODES, default=PLANNER_MODES[0])
+    parser.add_argument("--tolerance", type=float, default=1.0)
+    parser.add_argument("--draw", type=int, nargs=2, metavar=("X", "Y"),
+                        help="also draw the plans with their top-left at X Y")
+    parser.add_argument("--backend", default="pyautogui")
+    parser.add_argument("--rate", type=float, default=0, help="draw rate in px/s (0 = unlimited)")
+    parser.add_argument("--no-wait", action="store_true",
+                        help="draw frames back to back instead of waiting for Enter")
+    args = parser.parse_args(argv)
+    if len(args.inputs) > 2:
+        parser.error("give PREVIOUS NEW or a single multi-frame image")
+
+    settings = (args.step, args.threshold, args.mode, args.tolerance)
+    if len(args.inputs) == 2:
+        previous = _load_previous(args.inputs[0], args.scale)
+        img = load_and_prepare_image(args.inputs[1], args.scale)
+        plans = [compile_delta_plan(img, previous, *settings)]
+        paths = [args.out]
+    else:
+        os.makedirs(args.out, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(args.inputs[0]))[0]
+        plans, paths = [], []
+        for plan in compile_sequence(load_frames(args.inputs[0], args.scale), *settings):
+            plans.append(plan)
+            paths.append(os.path.join(args.out, f"{stem}-{len(paths):04d}.gbplan"))
+
+    for plan, path in zip(plans, paths):
+        print(describe_plan(plan))
+        plan.save(path)
+        est = estimate_job(plan, 0.0)
+        print(f"{os.path.basename(path)}: {plan.num_strokes:,} strokes, {est['events']:,} events")
+    if len(plans) > 1:
+        full = estimate_job(plans[0], 0.0)["events"]
+        rest = sum(estimate_job(p, 0.0)["events"] for p in plans[1:])
+        print(f"{len(plans)} frames: {full:,} events for the first, {rest:,} for the "
+              f"other {len(plans) - 1} together ({rest / max(1, len(plans) - 1):,.0f} per frame).")
+
+    if args.draw:
+        from backends import calibrate, get_backend
+        from core import execute_plan
+
+        x, y = args.draw
+        seconds_per_event = calibrate(args.backend, x=max(x, 20), y=max(y, 20))
+        for index, plan in enumerate(plans):
+            est = estimate_job(plan, seconds_per_event, args.rate)
+            prompt = (f"Frame {index}: {est['events']:,} events, "
+                      f"about {format_duration(est['duration_s'])}.")
+            if args.no_wait:
+                print(prompt)
+            else:
+                input(prompt + " Press Enter to draw...")
+            execute_plan(plan, x, y, args.rate, backend=get_backend(args.backend))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
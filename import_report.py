@@ -0,0 +1,77 @@
+# import_report.py
+"""
+Import-time report for the app's startup path.
+
+    python import_report.py                 (what `python main.py` imports before the window)
+    python import_report.py core planner    (any modules)
+    python import_report.py --top 25
+
+Runs `python -X importtime` in a fresh interpreter, so nothing imported
+here skews the numbers, and lists the slowest modules plus any heavy
+dependency that was pulled in.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# What main.py imports before it creates the window
+STARTUP_MODULES = ("app",)
+
+# Dependencies that should only load once the window is up
+HEAVY_MODULES = ("numpy", "PIL", "pyautogui", "Xlib", "concurrent.futures", "multiprocessing")
+
+
+def measure(modules, repeat: int = 3):
+    """
+    Best-of-`repeat` import times for `modules` in a fresh interpreter.
+
+    Returns (total_us, {module: (self_us, cumulative_us)}) from the fastest run.
+    """
+    code = "; ".join(f"import {m}" for m in modules)
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=BASE_DIR, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+        times = {}
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            self_us, cumulative, name = line[len("import time:"):].split("|")
+            times[name.strip()] = (int(self_us), int(cumulative))
+        total = sum(self_us for self_us, _ in times.values())
+        if best is None or total < best[0]:
+            best = (total, times)
+    return best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=list(STARTUP_MODULES))
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    total, times = measure(args.modules, args.repeat)
+    print(f"import {', '.join(args.modules)}: {total / 1000:.1f} ms "
+          f"({len(times)} modules, best of {args.repeat})")
+
+    print(f"\nSlowest {args.top} (cumulative):")
+    ranked = sorted(times.items(), key=lambda kv: kv[1][1], reverse=True)
+    for name, (self_us, cumulative) in ranked[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {self_us / 1000:7.1f} ms self  {name}")
+
+    loaded = [m for m in HEAVY_MODULES if m in times]
+    print("\nHeavy dependencies loaded:", ", ".join(loaded) if loaded else "none")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
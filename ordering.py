@@ -0,0 +1,216 @@
+# ordering.py
+import math
+
+import numpy as np
+
+import tracing
+from stroke_plan import StrokePlan
+
+# =======================
+# PEN-UP TRAVEL
+# =======================
+
+def _endpoints(plan: StrokePlan):
+    """First and last vertex of every stroke as (S, 2) float arrays."""
+    starts = plan.points[plan.offsets[:-1]].astype(np.float64)
+    ends = plan.points[plan.offsets[1:] - 1].astype(np.float64)
+    return starts, ends
+
+
+def travel_distance(plan: StrokePlan) -> float:
+    """Total pen-up distance (pixels) between consecutive strokes."""
+    if plan.num_strokes < 2:
+        return 0.0
+    starts, ends = _endpoints(plan)
+    return float(np.hypot(*(starts[1:] - ends[:-1]).T).sum())
+
+
+def reorder(plan: StrokePlan, order, reverse=None) -> StrokePlan:
+    """
+    Return a new plan with strokes taken in `order`; strokes whose
+    `reverse` flag is set are walked from their last vertex to the first.
+    """
+    order = np.asarray(order, dtype=np.int64)
+    if reverse is None:
+        reverse = np.zeros(len(order), dtype=bool)
+    reverse = np.asarray(reverse, dtype=bool)
+
+    lengths = np.diff(plan.offsets)[order]
+    offsets = np.zeros(len(order) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    # Index of every new vertex inside the old points array
+    within = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+    first = np.repeat(plan.offsets[order], lengths)
+    last = np.repeat(plan.offsets[order + 1] - 1, lengths)
+    src = np.where(np.repeat(reverse, lengths), last - within, first + within)
+
+    return StrokePlan(
+        plan.points[src],
+        offsets,
+        pen=plan.pen[order],
+        width=plan.width,
+        height=plan.height,
+        meta=plan.meta,
+        color=None if plan.color is None else plan.color[order],
+    )
+
+
+# =======================
+# ORDERING STRATEGIES
+# =======================
+
+def serpentine_rows(plan: StrokePlan):
+    """
+    Boustrophedon order for row-run plans: even sampled rows go left to
+    right, odd rows right to left with every run reversed.
+    Returns (order, reverse) arrays for reorder().
+    """
+    starts, _ = _endpoints(plan)
+    ys = starts[:, 1]
+    xs = starts[:, 0]
+    _, row_index = np.unique(ys, return_inverse=True)
+    odd = (row_index % 2).astype(bool)
+
+    # Sort by row, then by x (descending on odd rows)
+    order = np.lexsort((np.where(odd, -xs, xs), row_index))
+    return order, odd[order]
+
+
+def nearest_neighbour(plan: StrokePlan, start=(0.0, 0.0)):
+    """
+    Greedy nearest-neighbour tour over stroke endpoints; a stroke may be
+    entered from either end. Candidates are looked up in a uniform grid.
+    Returns (order, reverse) arrays for reorder().
+    """
+    n = plan.num_strokes
+    starts, ends = _endpoints(plan)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool)
+
+    span = max(plan.width, plan.height, 1)
+    cell = max(span / math.sqrt(n), 1.0)
+    grid = {}
+    for end_flag, pts in ((False, starts), (True, ends)):
+        cells = np.floor(pts / cell).astype(np.int64).tolist()
+        for i, key in enumerate(map(tuple, cells)):
+            grid.setdefault(key, []).append((i, end_flag))
+
+    start_pts, end_pts = starts.tolist(), ends.tolist()
+    visited = bytearray(n)
+    order = []
+    reverse = []
+    cx, cy = start
+
+    for _ in range(n):
+        gx, gy = int(cx // cell), int(cy // cell)
+        best = None
+        best_d = math.inf
+        ring = 0
+        while True:
+            # Check the square ring of cells at Chebyshev distance `ring`
+            for kx in range(gx - ring, gx + ring + 1):
+                for ky in range(gy - ring, gy + ring + 1):
+                    if ring and gx - ring < kx < gx + ring and gy - ring < ky < gy + ring:
+                        continue
+                    bucket = grid.get((kx, ky))
+                    if not bucket:
+                        continue
+                    live = [e for e in bucket if not visited[e[0]]]
+                    if len(live) != len(bucket):
+                        bucket[:] = live
+                    for i, end_flag in live:
+                        px, py = end_pts[i] if end_flag else start_pts[i]
+                        d = (px - cx) ** 2 + (py - cy) ** 2
+                        if d < best_d:
+                            best, best_d = (i, end_flag), d
+            # Anything beyond this ring is at least ring * cell away
+            if best is not None and best_d <= (ring * cell) ** 2:
+                break
+            ring += 1
+            if ring * cell > 2 * span + cell and best is not None:
+                break
+
+        i, entered_at_end = best
+        visited[i] = 1
+        order.append(i)
+        reverse.append(entered_at_end)
+        # Leave from the opposite end of the one we entered
+        cx, cy = start_pts[i] if entered_at_end else end_pts[i]
+
+    return np.array(order, dtype=np.int64), np.array(reverse, dtype=bool)
+
+
+def two_opt(plan: StrokePlan, window: int = 64, max_passes: int = 2) -> StrokePlan:
+    """
+    Windowed 2-opt over the stroke sequence: reversing strokes i+1..j
+    (order and direction) replaces the hops E[i]->S[i+1] and E[j]->S[j+1]
+    with E[i]->E[j] and S[i+1]->S[j+1]. Gains for a whole window of j are
+    evaluated at once with NumPy.
+    """
+    n = plan.num_strokes
+    if n < 3:
+        return plan
+    starts, ends = _endpoints(plan)
+    order = np.arange(n)
+    reverse = np.zeros(n, dtype=bool)
+
+    for _ in range(max_passes):
+        improved = False
+        for i in range(n - 2):
+            hi = min(i + 1 + window, n)
+            js = np.arange(i + 1, hi)
+
+            old = np.hypot(*(starts[i + 1] - ends[i]))
+            new = np.hypot(*(ends[js] - ends[i]).T)
+            has_next = js + 1 < n
+            nxt = np.minimum(js + 1, n - 1)
+            old = old + np.where(has_next, np.hypot(*(starts[nxt] - ends[js]).T), 0.0)
+            new = new + np.where(has_next, np.hypot(*(starts[nxt] - starts[i + 1]).T), 0.0)
+
+            gain = old - new
+            k = int(np.argmax(gain))
+            if gain[k] > 1e-9:
+                j = int(js[k])
+                seg = slice(i + 1, j + 1)
+                starts[seg], ends[seg] = ends[seg][::-1].copy(), starts[seg][::-1].copy()
+                order[seg] = order[seg][::-1].copy()
+                reverse[seg] = ~reverse[seg][::-1]
+                improved = True
+        if not improved:
+            break
+
+    return reorder(plan, order, reverse)
+
+
+# 2-opt walks the strokes one by one in Python (about 0.1 ms each); bigger
+# plans keep the serpentine / nearest-neighbour order as it is
+TWO_OPT_MAX_STROKES = 200_000
+
+
+def optimize_order(plan: StrokePlan, refine: bool = True) -> StrokePlan:
+    """
+    Reorder strokes to cut pen-up travel: serpentine rows for row-run plans,
+    nearest-neighbour for traced ones, then 2-opt refinement for plans of up
+    to TWO_OPT_MAX_STROKES strokes. Travel before/after is stored in
+    meta["travel_px"].
+    """
+    with tracing.span("order", strokes=plan.num_strokes):
+        return _optimize_order(plan, refine)
+
+
+def _optimize_order(plan, refine):
+    before = travel_distance(plan)
+
+    if plan.meta.get("mode", "rows") == "rows":
+        order, reverse = serpentine_rows(plan)
+    else:
+        order, reverse = nearest_neighbour(plan)
+    optimized = reorder(plan, order, reverse)
+    if refine and optimized.num_strokes <= TWO_OPT_MAX_STROKES:
+        optimized = two_opt(optimized)
+
+    after = travel_distance(optimized)
+    optimized.meta = dict(plan.meta, travel_px={"before": round(before, 1),
+                                                "after": round(after, 1)})
+    return optimized
@@ -0,0 +1,63 @@
+# pacing.py
+import time
+
+import tracing
+
+# =======================
+# DEADLINE PACING
+# =======================
+
+
+class Pacer:
+    """
+    Keeps drawing at a target rate against a monotonic clock.
+
+    Every call to advance() moves a deadline forward by the time that work
+    is allowed to take (pixels / rate, or 1 / rate per event). We only sleep
+    when we are ahead of the deadline, so call overhead and sleep oversleep
+    are absorbed instead of added, and tiny waits are batched until they are
+    worth a real sleep. Pen-up travel is free unless pace_travel is set.
+
+    rate <= 0 means "as fast as possible".
+    """
+
+    # Sleeps shorter than this are deferred; OS timers can't honour them anyway
+    MIN_SLEEP = 0.002
+    # If we fall this far behind (a stall), forgive the debt instead of bursting
+    MAX_LAG = 0.25
+
+    def __init__(self, rate: float, unit: str = "px", pace_travel: bool = False,
+                 clock=time.perf_counter):
+        if unit not in ("px", "events"):
+            raise ValueError(f"Unknown pacing unit: {unit!r}")
+        self.rate = float(rate)
+        self.unit = unit
+        self.pace_travel = pace_travel
+        self.clock = clock
+        self.deadline = None
+        self.slept = 0.0
+
+    @property
+    def active(self) -> bool:
+        return self.rate > 0
+
+    def start(self) -> None:
+        self.deadline = self.clock()
+        self.slept = 0.0
+
+    def advance(self, pixels: float, drawing: bool = True) -> None:
+        """Account for one emitted move covering `pixels` of distance."""
+        if not drawing and not self.pace_travel:
+            return
+        if self.deadline is None:
+            self.start()
+
+        amount = pixels if self.unit == "px" else 1
+        self.deadline += amount / self.rate
+
+        remaining = self.deadline - self.clock()
+        if remaining >= self.MIN_SLEEP:
+            tracing.timed_sleep(remaining)
+            self.slept += remaining
+        elif remaining < -self.MAX_LAG:
+            self.deadline = self.clock() - self.MAX_LAG
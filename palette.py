@@ -0,0 +1,148 @@
+# palette.py
+import numpy as np
+
+import tracing
+from ordering import optimize_order
+from planner import plan_mask
+from simplify import simplify_plan
+from stroke_plan import StrokePlan
+
+# =======================
+# COLOUR QUANTIZATION
+# =======================
+
+# Pixels the palette is fitted on; assignment still covers every pixel
+KMEANS_SAMPLE = 65536
+KMEANS_ITERATIONS = 12
+
+# Rec. 601 luma, the same weights PIL uses for convert("L")
+_LUMA = np.array([0.299, 0.587, 0.114])
+
+
+def _nearest(pixels: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """Index of the closest centre for each (N, 3) float pixel."""
+    # |p - c|^2 = |p|^2 - 2 p.c + |c|^2, and |p|^2 doesn't change the argmin
+    d = (centers * centers).sum(axis=1) - 2.0 * (pixels @ centers.T)
+    return d.argmin(axis=1)
+
+
+def kmeans(pixels: np.ndarray, n_colors: int, iterations: int = KMEANS_ITERATIONS,
+           seed: int = 0) -> np.ndarray:
+    """
+    Vectorized k-means (k-means++ seeding, Lloyd iterations) on (N, 3) pixels.
+
+    Returns the (k, 3) float centres, k <= n_colors (fewer when the image
+    has fewer distinct colours).
+    """
+    rng = np.random.default_rng(seed)
+    pixels = pixels.astype(np.float64)
+    n_colors = min(n_colors, len(np.unique(pixels, axis=0)))
+    if n_colors == 0:
+        return np.zeros((0, 3))
+
+    centers = [pixels[rng.integers(len(pixels))]]
+    dist = ((pixels - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, n_colors):
+        # Pick far-away pixels with probability proportional to squared distance
+        centers.append(pixels[rng.choice(len(pixels), p=dist / dist.sum())])
+        dist = np.minimum(dist, ((pixels - centers[-1]) ** 2).sum(axis=1))
+    centers = np.array(centers)
+
+    for _ in range(iterations):
+        labels = _nearest(pixels, centers)
+        counts = np.bincount(labels, minlength=n_colors)
+        sums = np.stack([np.bincount(labels, weights=pixels[:, c], minlength=n_colors)
+                         for c in range(3)], axis=1)
+        # An empty cluster keeps its old centre
+        moved = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centers)
+        if np.allclose(moved, centers, atol=0.5):
+            centers = moved
+            break
+        centers = moved
+    return centers
+
+
+def quantize(img, n_colors: int, step: int = 1, seed: int = 0):
+    """
+    Reduce an RGB image to at most n_colors.
+
+    Only the pixels on the step grid are labelled, since those are the only
+    ones a plan with that step samples. Returns (labels, palette): a
+    (rows, cols) uint8 index array and a (k, 3) uint8 colour array.
+    """
+    rgb = np.asarray(img.convert("RGB") if img.mode != "RGB" else img)[::step, ::step]
+    pixels = rgb.reshape(-1, 3)
+    rng = np.random.default_rng(seed)
+    sample = pixels
+    if len(pixels) > KMEANS_SAMPLE:
+        sample = pixels[rng.choice(len(pixels), KMEANS_SAMPLE, replace=False)]
+
+    with tracing.span("quantize", colors=n_colors, pixels=len(pixels)):
+        centers = kmeans(sample, n_colors, seed=seed)
+        labels = np.empty(len(pixels), dtype=np.uint8)
+        chunk = 1 << 20  # bounds the (chunk, k) distance matrix
+        for lo in range(0, len(pixels), chunk):
+            labels[lo:lo + chunk] = _nearest(pixels[lo:lo + chunk].astype(np.float64), centers)
+    palette = np.clip(np.rint(centers), 0, 255).astype(np.uint8)
+    return labels.reshape(rgb.shape[:2]), palette
+
+
+# =======================
+# PALETTE PLANNING
+# =======================
+
+def paper_color(palette: np.ndarray, threshold: int):
+    """
+    Index of the palette colour nearest white in RGB, if it is light enough
+    (luminance >= threshold) to be the paper; None when every colour is ink.
+    """
+    if len(palette) == 0:
+        return None
+    k = int(((palette.astype(np.float64) - 255.0) ** 2).sum(axis=1).argmin())
+    return k if palette[k] @ _LUMA >= threshold else None
+
+
+def compile_palette_plan(img, n_colors: int, step: int, threshold: int,
+                         mode: str = "rows", tolerance: float = 0) -> StrokePlan:
+    """
+    Quantize `img` to n_colors and plan every colour as its own layer.
+
+    Only the colour closest to white is taken for paper and left undrawn,
+    and only when its luminance is at or above `threshold` (the grayscale
+    planner's cut-off); light inks such as yellow are still drawn. Each layer is
+    planned, simplified and ordered on its own, and the layers are drawn
+    lightest first so darker detail lands on top. Since a colour's strokes
+    are contiguous, each colour is selected exactly once: the plan needs one
+    switch per drawn colour, the fewest possible.
+
+    The result carries plan.color (index per stroke), meta["palette"] and
+    the number of colours left as paper in meta["paper_colors"].
+    """
+    width, height = img.size
+    labels, palette = quantize(img, n_colors, step)
+    luma = palette @ _LUMA
+    paper = paper_color(palette, threshold)
+    drawn = [k for k in np.argsort(-luma, kind="stable").tolist() if k != paper]
+
+    layers = []
+    for index, k in enumerate(drawn):
+        meta = {"mode": mode, "step": step, "threshold": threshold}
+        with tracing.span("plan", mode=mode, step=step, color=index):
+            layer = plan_mask(labels == k, step, width, height, mode, meta)
+        layer = optimize_order(simplify_plan(layer, tolerance))
+        layer.color = np.full(layer.num_strokes, index, dtype=np.uint8)
+        layers.append(layer)
+
+    meta = {
+        "mode": mode,
+        "step": step,
+        "threshold": threshold,
+        "colors": n_colors,
+        "palette": palette[drawn].tolist(),
+        "paper_colors": len(palette) - len(drawn),
+    }
+    plan = StrokePlan.concatenate(layers, width=width, height=height, meta=meta)
+    if plan.color is None:  # nothing but paper
+        plan.color = np.zeros(0, dtype=np.uint8)
+    plan.meta["color_switches"] = plan.color_switches()
+    return plan
@@ -0,0 +1,209 @@
+# parallel.py
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from PIL import Image
+
+import tracing
+from ordering import optimize_order
+from planner import (
+    band_edges,
+    compile_band,
+    dark_mask,
+    iter_plan_bands,
+    outline_mask,
+    plan_image,
+    plan_row_runs,
+    plan_traced_mask,
+)
+from simplify import simplify_plan
+from stroke_plan import StrokePlan
+
+# =======================
+# TILE-PARALLEL PLANNING
+# =======================
+
+# Below this many pixels the pool start-up costs more than it saves
+MIN_PARALLEL_PIXELS = 4_000_000
+# Bands per worker, so uneven bands still balance across the pool
+BANDS_PER_WORKER = 4
+
+
+def process_pool(workers: int, **kwargs) -> ProcessPoolExecutor:
+    """
+    A process pool with the "spawn" start method. The app starts pools from
+    worker threads beside Tk, and a fork there could copy a lock another
+    thread holds into the child; spawned workers start from a clean interpreter.
+    """
+    return ProcessPoolExecutor(max_workers=workers,
+                               mp_context=multiprocessing.get_context("spawn"), **kwargs)
+
+
+def _attach(name, shape, dtype):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _band_runs(task):
+    """Worker: horizontal dark runs of image rows [top, bottom)."""
+    name, shape, top, bottom, step, threshold = task
+    shm, arr = _attach(name, shape, np.uint8)
+    try:
+        ys, x_starts, x_ends = plan_row_runs(arr[top:bottom], step, threshold)
+        return ys + top, x_starts, x_ends
+    finally:
+        del arr
+        shm.close()
+
+
+def _band_outline(task):
+    """
+    Worker: outline mask for sampled rows [r0, r1), written straight into
+    the shared output mask. One sampled row of halo on each side makes the
+    band edges match the whole-image result exactly.
+    """
+    name, shape, out_name, out_shape, r0, r1, step, threshold = task
+    shm, arr = _attach(name, shape, np.uint8)
+    out_shm, out = _attach(out_name, out_shape, np.bool_)
+    try:
+        lo = max(r0 - 1, 0)
+        hi = min(r1 + 1, out_shape[0])
+        slab = dark_mask(arr[lo * step:(hi - 1) * step + 1], step, threshold)
+        out[r0:r1] = outline_mask(slab)[r0 - lo:r1 - lo]
+    finally:
+        del arr, out
+        shm.close()
+        out_shm.close()
+
+
+def _band_plan(task):
+    """Worker: planner.compile_band for image rows [top, bottom)."""
+    name, shape, top, bottom, step, threshold, mode, tolerance = task
+    shm, arr = _attach(name, shape, np.uint8)
+    try:
+        piece = Image.fromarray(arr[top:bottom].copy(), mode="L")
+    finally:
+        del arr
+        shm.close()
+    return compile_band(piece, top, shape[0], step, threshold, mode, tolerance)
+
+
+def _band_edges(rows: int, parts: int):
+    edges = np.linspace(0, rows, parts + 1).round().astype(int)
+    return [(a, b) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+
+def plan_image_parallel(img, step: int, threshold: int, mode: str = "rows",
+                        workers: int = None) -> StrokePlan:
+    """
+    plan_image() split into horizontal bands and run in a process pool.
+
+    The grayscale pixels are placed in shared memory once, so workers read
+    them without pickling. Row plans are stitched by concatenating band runs
+    in order; outline masks are written by the workers into one shared mask
+    that is then traced as a whole. Both give output identical to
+    plan_image(). Skeleton thinning is not band-local, so that mode (and
+    small images) run in-process.
+    """
+    workers = workers or os.cpu_count() or 1
+    width, height = img.size
+    if workers < 2 or mode == "skeleton" or width * height < MIN_PARALLEL_PIXELS:
+        return plan_image(img, step, threshold, mode)
+    if mode not in ("rows", "outline"):
+        raise ValueError(f"Unknown planner mode: {mode!r}")
+
+    meta = {"mode": mode, "step": step, "threshold": threshold}
+    arr = np.asarray(img, dtype=np.uint8)
+    sampled_rows = -(-height // step)
+    bands = _band_edges(sampled_rows, workers * BANDS_PER_WORKER)
+
+    with tracing.span("plan", mode=mode, step=step, threshold=threshold, workers=workers):
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        out_shm = None
+        try:
+            shared = np.ndarray(arr.shape, dtype=np.uint8, buffer=shm.buf)
+            shared[:] = arr
+            del shared
+
+            with process_pool(workers) as pool:
+                if mode == "rows":
+                    tasks = [(shm.name, arr.shape, r0 * step, r1 * step, step, threshold)
+                             for r0, r1 in bands]
+                    parts = list(pool.map(_band_runs, tasks))
+                    ys, x_starts, x_ends = (np.concatenate(col) for col in zip(*parts))
+                    return StrokePlan.from_row_runs(
+                        ys, x_starts, x_ends, width=width, height=height, meta=meta
+                    )
+
+                out_shape = (sampled_rows, -(-width // step))
+                out_shm = shared_memory.SharedMemory(
+                    create=True, size=max(out_shape[0] * out_shape[1], 1)
+                )
+                tasks = [(shm.name, arr.shape, out_shm.name, out_shape, r0, r1, step, threshold)
+                         for r0, r1 in bands]
+                list(pool.map(_band_outline, tasks))
+
+            mask = np.ndarray(out_shape, dtype=np.bool_, buffer=out_shm.buf).copy()
+            return plan_traced_mask(mask, step, width, height, meta)
+        finally:
+            shm.close()
+            shm.unlink()
+            if out_shm is not None:
+                out_shm.close()
+                out_shm.unlink()
+
+
+def compile_plan_parallel(img, step: int, threshold: int, mode: str = "rows",
+                          tolerance: float = 0, workers: int = None) -> StrokePlan:
+    """planner.compile_plan with the planning stage spread over a process pool."""
+    plan = plan_image_parallel(img, step, threshold, mode, workers)
+    return optimize_order(simplify_plan(plan, tolerance))
+
+
+def iter_plan_bands_parallel(img, step: int, threshold: int, mode: str = "rows",
+                             tolerance: float = 0, band_rows: int = 256,
+                             workers: int = None):
+    """
+    planner.iter_plan_bands with whole bands (planning, simplification and
+    ordering, the expensive part) compiled in a process pool. Yields the
+    same plans in the same order; at most two bands per worker are in
+    flight, so a slow consumer (the drawing thread) keeps memory flat.
+    Small images and single-core machines plan in-process.
+    """
+    workers = workers or os.cpu_count() or 1
+    width, height = img.size
+    if workers < 2 or width * height < MIN_PARALLEL_PIXELS:
+        yield from iter_plan_bands(img, step, threshold, mode, tolerance, band_rows)
+        return
+
+    arr = np.asarray(img, dtype=np.uint8)
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    pool = None
+    try:
+        shared = np.ndarray(arr.shape, dtype=np.uint8, buffer=shm.buf)
+        shared[:] = arr
+        del shared
+
+        pool = process_pool(workers)
+        tasks = iter(
+            (shm.name, arr.shape, top, bottom, step, threshold, mode, tolerance)
+            for top, bottom in band_edges(height, step, band_rows)
+        )
+        pending = deque(pool.submit(_band_plan, task)
+                        for _, task in zip(range(2 * workers), tasks))
+        while pending:
+            plan = pending.popleft().result()
+            for task in tasks:
+                pending.append(pool.submit(_band_plan, task))
+                break
+            yield plan
+    finally:
+        if pool is not None:
+            # The consumer may stop early (an aborted drawing)
+            pool.shutdown(cancel_futures=True)
+        shm.close()
+        shm.unlink()
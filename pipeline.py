@@ -0,0 +1,59 @@
+# pipeline.py
+import queue
+import threading
+
+# =======================
+# BOUNDED PRODUCER / CONSUMER
+# =======================
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+def prefetch(iterable, maxsize: int = 4):
+    """
+    Run `iterable` in a background thread and yield its items here.
+
+    At most `maxsize` items are buffered, so a fast producer never runs far
+    ahead of the consumer and memory stays flat. Producer exceptions are
+    re-raised in the consumer; if the consumer stops early (e.g. the user
+    aborts), the producer is told to stop at its next item.
+    """
+    buffer = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(_Failure(e))
+            return
+        put(_DONE)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
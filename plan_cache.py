@@ -0,0 +1,215 @@
+# plan_cache.py
+import hashlib
+import json
+import os
+import struct
+import threading
+import zlib
+
+# =======================
+# ON-DISK PLAN CACHE
+# =======================
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "GHOSTBRUSH_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".ghostbrush", "plans")
+)
+DEFAULT_CACHE_MB = float(os.environ.get("GHOSTBRUSH_CACHE_MB", "256"))
+
+# Parameters that change the compiled plan (rate/backend only affect replay)
+PLAN_PARAMS = ("scale", "step", "threshold", "mode", "tolerance", "colors")
+
+# Bump when planner output changes so stale entries are never served
+PLANNER_VERSION = 3
+
+PLAN_SUFFIX = ".gbplan"
+
+
+class PlanCache:
+    """
+    Content-addressed cache of compiled StrokePlans.
+
+    Keys combine the SHA-256 of the image file bytes with the planning
+    parameters, so renamed or copied files still hit. Each entry is one plan
+    file; reading an entry refreshes its mtime and eviction removes the
+    least recently used files until the directory fits in max_bytes.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR,
+                 max_bytes: int = int(DEFAULT_CACHE_MB * 2**20)):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # (path, size, mtime) -> content hash, so unchanged files aren't re-read
+        self._digests = {}
+
+    # -------------------------
+    # KEYS
+    # -------------------------
+    def file_digest(self, path) -> str:
+        st = os.stat(path)
+        stamp = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        digest = self._digests.get(stamp)
+        if digest is None:
+            h = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+            digest = h.hexdigest()
+            self._digests[stamp] = digest
+        return digest
+
+    def key(self, path, params: dict) -> str:
+        relevant = {name: params.get(name) for name in PLAN_PARAMS}
+        blob = json.dumps(
+            {"image": self.file_digest(path), "params": relevant, "v": PLANNER_VERSION},
+            sort_keys=True,
+        )
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + PLAN_SUFFIX)
+
+    # -------------------------
+    # LOOKUP / STORE
+    # -------------------------
+    def get(self, key: str):
+        """
+        Return the cached plan or None; counts a hit or a miss. An entry
+        that can't be decoded (truncated, corrupt) is deleted and missed.
+        """
+        from stroke_plan import StrokePlan
+
+        entry = self._entry_path(key)
+        try:
+            plan = StrokePlan.load(entry)
+            os.utime(entry)  # mark as most recently used
+        except (ValueError, KeyError, zlib.error, struct.error):
+            try:
+                os.remove(entry)
+            except OSError:
+                pass
+            plan = None
+        except OSError:
+            plan = None
+        if plan is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return plan
+
+    def put(self, key: str, plan) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        entry = self._entry_path(key)
+        tmp = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+        plan.save(tmp)
+        os.replace(tmp, entry)
+        self.evict()
+
+    def writer(self, key: str, width: int, height: int, meta=None) -> "PlanCacheWriter":
+        """Store a plan streamed in pieces; see PlanCacheWriter."""
+        os.makedirs(self.directory, exist_ok=True)
+        return PlanCacheWriter(self, key, width, height, meta)
+
+    # -------------------------
+    # EVICTION / STATS
+    # -------------------------
+    def _entries(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        entries = []
+        for name in names:
+            if not name.endswith(PLAN_SUFFIX):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+        return entries
+
+    def evict(self) -> None:
+        """Drop least recently used entries until the cache fits max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def clear(self) -> None:
+        for _, _, name in self._entries():
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+class PlanCacheWriter:
+    """
+    A cache entry written piece by piece with a StrokePlanWriter: append()
+    each piece, then commit() to publish the entry or discard() to drop it
+    (e.g. when the stream stopped early). Nothing is visible to get()
+    before commit().
+    """
+
+    def __init__(self, cache: PlanCache, key: str, width: int, height: int, meta=None):
+        from stroke_plan import StrokePlanWriter
+
+        self.cache = cache
+        self.entry = cache._entry_path(key)
+        self.tmp = f"{self.entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self._writer = StrokePlanWriter(self.tmp, width, height, meta)
+
+    def append(self, plan) -> None:
+        self._writer.append(plan)
+
+    def commit(self, meta=None) -> None:
+        if meta is not None:
+            self._writer.meta = meta
+        self._writer.close()
+        os.replace(self.tmp, self.entry)
+        self.cache.evict()
+
+    def discard(self) -> None:
+        self._writer.discard()
+        try:
+            os.remove(self.tmp)
+        except FileNotFoundError:
+            pass
+
+
+_default_cache = None
+
+
+def default_cache() -> PlanCache:
+    """Process-wide cache in GHOSTBRUSH_CACHE_DIR (~/.ghostbrush/plans)."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = PlanCache()
+    return _default_cache
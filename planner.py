@@ -0,0 +1,371 @@
+# planner.py
+import numpy as np
+
+import tracing
+from ordering import optimize_order
+from simplify import simplify_plan
+from stroke_plan import StrokePlan
+
+# =======================
+# STROKE PLANNING
+# =======================
+
+def plan_row_runs(img, step: int, threshold: int):
+    """
+    Find every horizontal run of dark pixels on the sampled rows.
+
+    Returns three int arrays (ys, x_starts, x_ends) in image pixel
+    coordinates; x_ends is inclusive, so a single dark pixel is a run
+    with x_start == x_end.
+    """
+    return mask_row_runs(dark_mask(img, step, threshold), step)
+
+
+def mask_row_runs(dark: np.ndarray, step: int):
+    """plan_row_runs for an already step-sampled boolean mask."""
+    rows, cols = dark.shape
+    if rows == 0 or cols == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+
+    # Pad each row with a bright pixel on both sides so every run has
+    # a rising and a falling edge inside the row.
+    padded = np.zeros((rows, cols + 2), dtype=np.int8)
+    padded[:, 1:-1] = dark
+    edges = np.diff(padded, axis=1)
+
+    # nonzero() walks row-major, so starts and ends pair up in order
+    start_r, start_c = np.nonzero(edges == 1)
+    _, end_c = np.nonzero(edges == -1)
+
+    ys = start_r.astype(np.int64) * step
+    x_starts = start_c.astype(np.int64) * step
+    x_ends = (end_c.astype(np.int64) - 1) * step
+    return ys, x_starts, x_ends
+
+
+# =======================
+# CONTOUR / SKELETON TRACING
+# =======================
+
+# 4-neighbours first so traced paths prefer straight moves over diagonals
+_NEIGHBOUR_STEPS = ((1, 0), (-1, 0), (0, 1), (0, -1),
+                    (1, 1), (-1, 1), (1, -1), (-1, -1))
+
+
+def dark_mask(img, step: int, threshold: int) -> np.ndarray:
+    """Boolean mask of the step-sampled pixels that are darker than threshold."""
+    arr = np.asarray(img, dtype=np.uint8)
+    return arr[::step, ::step] < threshold
+
+
+def outline_mask(mask: np.ndarray) -> np.ndarray:
+    """Keep only dark pixels that touch a bright 4-neighbour (region outlines)."""
+    p = np.pad(mask, 1)
+    interior = p[:-2, 1:-1] & p[2:, 1:-1] & p[1:-1, :-2] & p[1:-1, 2:]
+    return mask & ~interior
+
+
+def _zhang_suen_tables():
+    """Removal lookup tables for both Zhang-Suen passes, indexed by neighbour code."""
+    tables = (np.zeros(256, dtype=bool), np.zeros(256, dtype=bool))
+    for code in range(256):
+        # bit k holds neighbour P(k + 2), clockwise from north
+        p = [(code >> k) & 1 for k in range(8)]
+        p2, p3, p4, p5, p6, p7, p8, p9 = p
+        count = sum(p)
+        transitions = sum((p[k] == 0 and p[(k + 1) % 8] == 1) for k in range(8))
+        if not (2 <= count <= 6 and transitions == 1):
+            continue
+        tables[0][code] = p2 * p4 * p6 == 0 and p4 * p6 * p8 == 0
+        tables[1][code] = p2 * p4 * p8 == 0 and p2 * p6 * p8 == 0
+    return tables
+
+
+_ZHANG_SUEN = _zhang_suen_tables()
+
+
+def thin_mask(mask: np.ndarray) -> np.ndarray:
+    """
+    Zhang-Suen thinning to one-pixel-wide centre lines.
+
+    Only the dark pixels are visited: each pass gathers their 8-neighbour
+    codes in one vectorized step and looks the removal rule up in a table.
+    """
+    padded = np.pad(mask, 1).astype(np.uint8)
+    flat = padded.ravel()
+    stride = padded.shape[1]
+    # P2..P9 as flat offsets, clockwise from north
+    neighbours = np.array([-stride, -stride + 1, 1, stride + 1,
+                           stride, stride - 1, -1, -stride - 1])
+    weights = (1 << np.arange(8)).astype(np.int32)
+
+    idx = np.flatnonzero(flat)
+    while True:
+        changed = False
+        for table in _ZHANG_SUEN:
+            codes = flat[idx[:, None] + neighbours] @ weights
+            remove = table[codes]
+            if remove.any():
+                flat[idx[remove]] = 0
+                idx = idx[~remove]
+                changed = True
+        if not changed:
+            return padded[1:-1, 1:-1].astype(bool)
+
+
+def trace_polylines(mask: np.ndarray):
+    """
+    Walk an (ideally one-pixel-wide) mask into ordered 8-connected paths.
+
+    Paths start at line ends first, so open curves become a single path;
+    closed loops are picked up afterwards. Returns a list of (k, 2) arrays
+    of (col, row) mask coordinates with collinear vertices removed.
+    """
+    h, w = mask.shape
+    stride = w + 2
+    padded = np.pad(mask, 1)
+    remaining = bytearray(padded.astype(np.uint8).tobytes())
+    steps = [dy * stride + dx for dx, dy in _NEIGHBOUR_STEPS]
+
+    # Degree of each pixel, so we can seed walks from line ends
+    degree = sum(
+        np.roll(np.roll(padded, dy, axis=0), dx, axis=1).astype(np.int8)
+        for dx, dy in _NEIGHBOUR_STEPS
+    )
+    flat_degree = np.where(padded, degree, 0).ravel()
+    ends = np.flatnonzero(flat_degree == 1)
+    others = np.flatnonzero(flat_degree > 1)
+    isolated = np.flatnonzero(padded.ravel() & (flat_degree == 0))
+
+    def walk(cur):
+        path = []
+        while True:
+            for s in steps:
+                nxt = cur + s
+                if remaining[nxt]:
+                    break
+            else:
+                return path
+            remaining[nxt] = 0
+            path.append(nxt)
+            cur = nxt
+
+    paths = []
+    for start in np.concatenate([ends, others, isolated]).tolist():
+        if not remaining[start]:
+            continue
+        remaining[start] = 0
+        forward = walk(start)
+        backward = walk(start)
+        backward.reverse()
+        paths.append(backward + [start] + forward)
+
+    polylines = []
+    for path in paths:
+        idx = np.asarray(path, dtype=np.int64)
+        pts = np.column_stack([idx % stride - 1, idx // stride - 1])
+        polylines.append(_drop_collinear(pts))
+    return polylines
+
+
+def _drop_collinear(pts: np.ndarray) -> np.ndarray:
+    """Remove interior vertices where the step direction does not change."""
+    if len(pts) < 3:
+        return pts
+    d = np.diff(pts, axis=0)
+    turn = np.any(d[1:] != d[:-1], axis=1)
+    keep = np.concatenate([[True], turn, [True]])
+    return pts[keep]
+
+
+# =======================
+# PLAN COMPILATION
+# =======================
+
+PLANNER_MODES = ("rows", "outline", "skeleton")
+
+
+def plan_image(img, step: int, threshold: int, mode: str = "rows") -> StrokePlan:
+    """
+    Compile the grayscale image into a StrokePlan.
+
+    mode="rows" emits one stroke per horizontal dark run; "outline" traces
+    the borders of dark regions and "skeleton" traces their thinned centre
+    lines, so curves and diagonals become single long strokes.
+    """
+    with tracing.span("plan", mode=mode, step=step, threshold=threshold):
+        return _plan_image(img, step, threshold, mode)
+
+
+def _plan_image(img, step, threshold, mode):
+    width, height = img.size
+    meta = {"mode": mode, "step": step, "threshold": threshold}
+    return plan_mask(dark_mask(img, step, threshold), step, width, height, mode, meta)
+
+
+def plan_mask(mask, step, width, height, mode, meta) -> StrokePlan:
+    """plan_image for a step-sampled mask of the pixels to ink (e.g. one colour layer)."""
+    if mode == "rows":
+        ys, x_starts, x_ends = mask_row_runs(mask, step)
+        return StrokePlan.from_row_runs(
+            ys, x_starts, x_ends, width=width, height=height, meta=meta
+        )
+
+    if mode == "outline":
+        mask = outline_mask(mask)
+    elif mode == "skeleton":
+        with tracing.span("thin"):
+            mask = thin_mask(mask)
+    else:
+        raise ValueError(f"Unknown planner mode: {mode!r}")
+    return plan_traced_mask(mask, step, width, height, meta)
+
+
+def plan_traced_mask(mask, step, width, height, meta) -> StrokePlan:
+    """Trace an outline/skeleton mask into a plan in image coordinates."""
+    with tracing.span("trace"):
+        polylines = [p * step for p in trace_polylines(mask)]
+    return StrokePlan.from_polylines(polylines, width=width, height=height, meta=meta)
+
+
+def compile_plan(img, step: int, threshold: int, mode: str = "rows",
+                 tolerance: float = 0) -> StrokePlan:
+    """Full planning pipeline: trace, simplify, then order for short travel."""
+    plan = plan_image(img, step, threshold, mode)
+    return optimize_order(simplify_plan(plan, tolerance))
+
+
+def describe_plan(plan: StrokePlan) -> str:
+    """
+    The planning stats recorded in plan.meta (simplification, pen-up travel,
+    palette, delta), one line each, for CLIs and the UI to print. Planning
+    functions only record them, so library callers stay quiet.
+    """
+    meta = plan.meta
+    lines = []
+    if "delta" in meta:
+        d = meta["delta"]
+        changed = 100.0 * d["added"] / max(1, d["added"] + d["unchanged"])
+        lines.append(f"Delta: {d['added']:,} pixels to add ({changed:.1f}% of the ink), "
+                     f"{d['removed']:,} to erase.")
+    if "palette" in meta:
+        drawn = len(meta["palette"])
+        paper = meta.get("paper_colors", 0)
+        lines.append(f"Palette: {drawn + paper} colours, {drawn} drawn "
+                     f"({paper} left as paper), {meta.get('color_switches', 0)} colour switches.")
+    if "simplified" in meta:
+        s = meta["simplified"]
+        of = f" of {s['points']}" if "points" in s else ""  # cached before it was recorded
+        lines.append(f"Simplification (tolerance {s['tolerance']}px): "
+                     f"removed {s['removed']}{of} points.")
+    if "travel_px" in meta:
+        before, after = meta["travel_px"]["before"], meta["travel_px"]["after"]
+        saved = 100.0 * (1 - after / before) if before else 0.0
+        lines.append(f"Pen-up travel: {before:.0f}px -> {after:.0f}px ({saved:.1f}% less)")
+    lines.append(f"{plan.num_strokes:,} strokes, {plan.event_count():,} mouse events.")
+    return "\n".join(lines)
+
+
+def iter_plan_bands(img, step: int, threshold: int, mode: str = "rows",
+                    tolerance: float = 0, band_rows: int = 256):
+    """
+    Compile the image band by band, yielding one StrokePlan per horizontal
+    band in full-image coordinates, so drawing can start on the first band
+    while later ones are still being planned.
+
+    Bands start on sampled rows, so row plans hold exactly the runs that
+    plan_image finds; traced modes are cut at band edges.
+    """
+    width, height = img.size
+    for top, bottom in band_edges(height, step, band_rows):
+        piece = img.crop((0, top, width, bottom))
+        yield compile_band(piece, top, height, step, threshold, mode, tolerance)
+
+
+def band_edges(height: int, step: int, band_rows: int = 256):
+    """(top, bottom) image rows of the bands iter_plan_bands plans."""
+    band = max(1, band_rows // step) * step
+    return [(top, min(top + band, height)) for top in range(0, height, band)]
+
+
+def compile_band(piece, top: int, height: int, step: int, threshold: int,
+                 mode: str = "rows", tolerance: float = 0) -> StrokePlan:
+    """compile_plan for the band image `piece` cut from row `top` of an image `height` tall."""
+    plan = compile_plan(piece, step, threshold, mode, tolerance)
+    plan.points[:, 1] += top
+    plan.height = height
+    plan.meta = dict(plan.meta, band=[top, top + piece.height])
+    return plan
+
+
+# =======================
+# LIVE PREVIEW
+# =======================
+
+def _sample_positions(n_draw: int, step: int, n_view: int):
+    """
+    View coordinates of the sampled drawing rows (or columns), deduplicated
+    when several samples land on one view pixel, plus the real sample count.
+    """
+    pos = np.arange(0, n_draw, step, dtype=np.int64) * n_view // max(n_draw, 1)
+    return np.unique(np.minimum(pos, n_view - 1)), len(pos)
+
+
+def _spread(ink: np.ndarray, pos: np.ndarray, n_view: int, axis: int) -> np.ndarray:
+    """
+    Lay sampled ink out along one view axis: a view pixel on a sample shows
+    that sample, one between two inked samples is covered by the stroke
+    joining them.
+    """
+    cells = np.arange(n_view)
+    k = np.maximum(np.searchsorted(pos, cells, side="right") - 1, 0)
+    nxt = np.minimum(k + 1, len(pos) - 1)
+
+    shape = [1, 1]
+    shape[axis] = n_view
+    on_sample = (pos[k] == cells).reshape(shape)
+    has_next = (nxt > k).reshape(shape)
+
+    here = np.take(ink, k, axis=axis)
+    return here & (on_sample | (has_next & np.take(ink, nxt, axis=axis)))
+
+
+def preview_mask(gray: np.ndarray, draw_size, step: int, threshold: int,
+                 mode: str = "rows"):
+    """
+    Approximate what plan_image would draw, at the resolution of `gray`.
+
+    gray is a small grayscale array of the whole source (e.g. the ConfigPage
+    preview) and draw_size the (width, height) the image is drawn at. Only
+    the samples that land on a view pixel are thresholded, so the cost
+    follows the view size, not the drawing. Returns (mask, strokes) with
+    an estimated stroke count: row runs are scaled up to the drawing's rows;
+    traced strokes are only counted when no samples were folded together
+    (None otherwise), since merged samples change how lines split.
+
+    Rows take a few milliseconds; outline and skeleton tracing take tens,
+    so interactive callers should run those off the UI thread.
+    """
+    vh, vw = gray.shape
+    dw, dh = draw_size
+    if vh == 0 or vw == 0 or dw <= 0 or dh <= 0:
+        return np.zeros((vh, vw), dtype=bool), 0
+
+    ys, n_rows = _sample_positions(dh, step, vh)
+    xs, n_cols = _sample_positions(dw, step, vw)
+    dark = gray[np.ix_(ys, xs)] < threshold
+
+    if mode == "rows":
+        runs = np.count_nonzero(np.diff(dark, axis=1, prepend=False) & dark)
+        # Rows folded onto one view pixel would each have their own runs
+        strokes = runs * n_rows / len(ys)
+        view = np.zeros((vh, vw), dtype=bool)
+        view[ys] = _spread(dark, xs, vw, axis=1)
+        return view, int(round(strokes))
+
+    ink = outline_mask(dark) if mode == "outline" else thin_mask(dark)
+    folded = (len(ys), len(xs)) != (n_rows, n_cols)
+    strokes = None if folded else len(trace_polylines(ink))
+    view = _spread(_spread(ink, xs, vw, axis=1), ys, vh, axis=0)
+    return view, strokes
@@ -0,0 +1,134 @@
+# simplify.py
+import numpy as np
+
+import tracing
+from stroke_plan import StrokePlan
+
+# =======================
+# POLYLINE SIMPLIFICATION
+# =======================
+
+def rdp_keep_mask(pts: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Ramer-Douglas-Peucker on one polyline.
+
+    Returns a boolean mask of the vertices to keep; endpoints are always
+    kept. Distances for a whole span are computed at once with NumPy, so
+    the Python work is per kept vertex rather than per input vertex.
+    """
+    n = len(pts)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    if n < 3:
+        return keep
+
+    p = pts.astype(np.float64)
+    stack = [(0, n - 1)]
+    while stack:
+        lo, hi = stack.pop()
+        if hi - lo < 2:
+            continue
+        a = p[lo]
+        seg = p[hi] - a
+        rel = p[lo + 1:hi] - a
+        seg_len = np.hypot(*seg)
+        if seg_len == 0:
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            # Perpendicular distance to the chord a -> b
+            dist = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / seg_len
+        k = int(np.argmax(dist))
+        if dist[k] > tolerance:
+            mid = lo + 1 + k
+            keep[mid] = True
+            stack.append((lo, mid))
+            stack.append((mid, hi))
+    return keep
+
+
+def simplify_plan(plan: StrokePlan, tolerance: float) -> StrokePlan:
+    """
+    Drop vertices that move the drawn path by at most `tolerance` screen
+    pixels. The number of removed points is stored in meta["simplified"].
+    """
+    if tolerance <= 0 or plan.num_points == 0:
+        return plan
+    with tracing.span("simplify", tolerance=tolerance):
+        return _simplify_plan(plan, tolerance)
+
+
+def rdp_plan_keep_mask(plan: StrokePlan, tolerance: float) -> np.ndarray:
+    """
+    rdp_keep_mask for every stroke of a plan at once.
+
+    The recursion runs level by level: each pass takes all open spans of
+    all strokes together and finds their farthest vertices with a few array
+    operations. The Python work is per level, not per stroke or vertex.
+    Results match calling rdp_keep_mask on each stroke.
+    """
+    p = plan.points.astype(np.float64)
+    keep = np.ones(plan.num_points, dtype=bool)
+    lengths = np.diff(plan.offsets)
+    long = np.flatnonzero(lengths > 2)
+    lo = plan.offsets[long]
+    hi = plan.offsets[long + 1] - 1
+    # Interior vertices start dropped; endpoints and short strokes stay
+    inner = lengths[long] - 2
+    keep[np.repeat(lo + 1, inner) + _ranks(inner)] = False
+
+    while len(lo):
+        counts = hi - lo - 1
+        owner = np.repeat(np.arange(len(lo)), counts)
+        idx = lo[owner] + 1 + _ranks(counts)
+
+        a = p[lo][owner]
+        seg = p[hi][owner] - a
+        rel = p[idx] - a
+        seg_len = np.hypot(seg[:, 0], seg[:, 1])
+        cross = np.abs(seg[:, 0] * rel[:, 1] - seg[:, 1] * rel[:, 0])
+        dist = np.where(
+            seg_len == 0,
+            np.hypot(rel[:, 0], rel[:, 1]),
+            cross / np.where(seg_len == 0, 1.0, seg_len),
+        )
+
+        # First farthest vertex of every span, like np.argmax
+        starts = np.cumsum(counts) - counts
+        best = np.maximum.reduceat(dist, starts)
+        at_max = np.flatnonzero(dist == best[owner])
+        _, first = np.unique(owner[at_max], return_index=True)
+        mid = idx[at_max[first]]
+
+        split = best > tolerance
+        mid = mid[split]
+        keep[mid] = True
+        lo, hi = np.concatenate([lo[split], mid]), np.concatenate([mid, hi[split]])
+        wide = hi - lo >= 2
+        lo, hi = lo[wide], hi[wide]
+    return keep
+
+
+def _ranks(counts: np.ndarray) -> np.ndarray:
+    """0..count-1 for each count, concatenated."""
+    total = int(counts.sum())
+    return np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+def _simplify_plan(plan, tolerance):
+    keep = rdp_plan_keep_mask(plan, tolerance)
+
+    removed = int(plan.num_points - keep.sum())
+    # Kept vertices before each stroke boundary give the new offsets
+    kept_before = np.concatenate([[0], np.cumsum(keep)])
+    offsets = kept_before[plan.offsets]
+
+    return StrokePlan(
+        plan.points[keep],
+        offsets,
+        pen=plan.pen,
+        width=plan.width,
+        height=plan.height,
+        meta=dict(plan.meta, simplified={"tolerance": tolerance, "removed": removed,
+                                    "points": plan.num_points}),
+        color=plan.color,
+    )
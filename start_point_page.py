@@ -3,13 +3,18 @@ import tkinter as tk
 from tkinter import messagebox
 import threading
 
-import pyautogui  # for FailSafeException
-
-from core import (
+import tracing
+from backends import DrawingAborted, calibrate, get_backend, is_calibrated
+from checkpoint import DEFAULT_CHECKPOINT, DrawingJob
+from pipeline import prefetch
+from plan_cache import default_cache
+
+# Planner, stroke plans and the executor are imported where they are used,
+# so building this page doesn't load the drawing stack
+from theme import (
     APP_BG,
     CARD_BG,
     TEXT_FG,
-    draw_image_with_mouse,
     FONT_TITLE,
     FONT_LABEL,
     FONT_BUTTON,
@@ -19,9 +24,19 @@ from core import (
 
 
 class StartPointPage(tk.Frame):
+    # Planned bands allowed to wait ahead of the drawing thread
+    STREAM_BUFFER_BANDS = 4
+    # Time the target application gets to repaint before a verify capture
+    VERIFY_SETTLE_S = 0.5
+
     def __init__(self, parent, controller):
         super().__init__(parent)
         self.controller = controller
+        self.job = None  # checkpoint.DrawingJob of the current or last drawing
+        self.verifying = False  # repairs aren't part of the job and can't be paused
+        self.drawing = False
+        self._paused_shown = False  # the UI shows the job as paused
+        self.swatch_vars = []  # "x,y" of each palette colour's swatch, for colour plans
 
         self.configure(bg=APP_BG)
 
@@ -92,6 +107,28 @@ class StartPointPage(tk.Frame):
         )
         entry_y.grid(row=0, column=3, sticky="w", pady=5)
 
+        tk.Label(
+            controls_frame,
+            text="Verify passes:",
+            font=FONT_ENTRY,
+            bg=CARD_BG,
+            fg=TEXT_FG,
+        ).grid(row=0, column=4, sticky="e", padx=(15, 5), pady=0)
+
+        # 0 = off; otherwise screenshot the area and redraw gaps up to N times
+        self.verify_var = tk.StringVar(value="0")
+        tk.Entry(
+            controls_frame,
+            textvariable=self.verify_var,
+            width=4,
+            font=FONT_ENTRY,
+            justify="center",
+        ).grid(row=0, column=5, sticky="w", pady=5)
+
+        # Palette swatch positions (filled in for colour plans only)
+        self.swatch_frame = tk.Frame(self.center_frame, bg=CARD_BG)
+        self.swatch_frame.pack(pady=(0, 5))
+
         # Buttons row (centered)
         buttons_frame = tk.Frame(self.center_frame, bg=CARD_BG)
         buttons_frame.pack(pady=(10, 0))
@@ -116,6 +153,16 @@ class StartPointPage(tk.Frame):
         )
         self.btn_start.pack(side="left", padx=10)
 
+        # Shown only while there is an interrupted job for this image + params
+        self.btn_resume = tk.Button(
+            buttons_frame,
+            text="Resume",
+            command=lambda: self.start_drawing(resume=True),
+            font=FONT_ENTRY,
+            padx=18,
+            pady=5,
+        )
+
         # Live update of the red box when user edits X/Y
         self.start_x_var.trace_add("write", lambda *args: self.draw_preview_rect())
         self.start_y_var.trace_add("write", lambda *args: self.draw_preview_rect())
@@ -124,6 +171,80 @@ class StartPointPage(tk.Frame):
     def update_info(self):
         if self.controller.img_width and self.controller.img_height:
             self.draw_preview_rect()
+        self._refresh_swatches()
+        self._refresh_resume()
+
+    def _refresh_swatches(self):
+        """One "x,y" entry per colour of a palette plan, next to a sample of the colour."""
+        frame = self.swatch_frame
+        for child in frame.winfo_children():
+            child.destroy()
+        plan = self.controller.plan
+        palette = plan.palette if plan is not None else None
+        previous = [var.get() for var in self.swatch_vars]
+        self.swatch_vars = []
+        if not palette:
+            return
+
+        tk.Label(
+            frame,
+            text="Swatch positions on screen (x,y), clicked once per colour:",
+            font=FONT_LABEL,
+            bg=CARD_BG,
+            fg=TEXT_FG,
+        ).grid(row=0, column=0, columnspan=8, pady=(5, 3))
+        for i, rgb in enumerate(palette):
+            r, c = divmod(i, 4)
+            tk.Label(
+                frame,
+                bg="#{:02x}{:02x}{:02x}".format(*rgb),
+                width=2,
+                relief="solid",
+                bd=1,
+            ).grid(row=1 + r, column=2 * c, padx=(10, 3), pady=3)
+            var = tk.StringVar(value=previous[i] if i < len(previous) else "")
+            tk.Entry(
+                frame,
+                textvariable=var,
+                width=9,
+                font=FONT_ENTRY,
+                justify="center",
+            ).grid(row=1 + r, column=2 * c + 1, pady=3)
+            self.swatch_vars.append(var)
+
+    def _read_swatches(self):
+        """The swatch positions as [(x, y), ...], [] without a palette, None if invalid."""
+        swatches = []
+        for i, var in enumerate(self.swatch_vars):
+            try:
+                x, y = (int(v) for v in var.get().replace(" ", ",").split(",") if v)
+            except ValueError:
+                messagebox.showerror(
+                    "Invalid swatch",
+                    f"Enter the screen position of colour {i + 1}'s swatch as x,y.",
+                )
+                return None
+            swatches.append((x, y))
+        return swatches
+
+    def _refresh_resume(self):
+        """Offer Resume when an unfinished job (in memory or on disk) matches."""
+        key = self.controller.plan_key
+        job = self.job
+        if job is None or job.key != key:
+            job = DrawingJob.load(DEFAULT_CHECKPOINT)
+        if job is not None and key is not None and job.key == key and job.resumable:
+            self.job = job
+            # After a restart the swatches come back from the checkpoint
+            saved = job.params.get("swatches") or []
+            for var, (x, y) in zip(self.swatch_vars, saved):
+                if not var.get():
+                    var.set(f"{x},{y}")
+            total = f" of {job.total:,}" if job.total else ""
+            self.btn_resume.config(text=f"Resume ({job.done:,}{total} strokes done)")
+            self.btn_resume.pack(side="left", padx=10)
+        else:
+            self.btn_resume.pack_forget()
 
     def draw_preview_rect(self):
         """
@@ -177,29 +298,88 @@ class StartPointPage(tk.Frame):
     # =========================
     # START DRAWING + COUNTDOWN
     # =========================
-    def start_drawing(self):
-        if self.controller.img is None:
+    def start_drawing(self, resume=False):
+        if (self.controller.plan is None and self.controller.img is None
+                and self.controller.mask is None):
             messagebox.showerror("No image", "Go back and select an image first.")
             return
 
+        plan = self.controller.plan
+        params = self.controller.params
+
+        if resume:
+            # Strokes only line up with what is on screen at the original spot
+            job = self.job
+            start_x, start_y = job.start
+            self.start_x_var.set(str(start_x))
+            self.start_y_var.set(str(start_y))
+        else:
+            try:
+                start_x = int(self.start_x_var.get())
+                start_y = int(self.start_y_var.get())
+            except ValueError:
+                messagebox.showerror("Invalid input", "Start X and Y must be integers.")
+                return
+            job = DrawingJob(
+                key=self.controller.plan_key,
+                image_path=self.controller.image_path,
+                params=params,
+                start=(start_x, start_y),
+                path=DEFAULT_CHECKPOINT,
+                total=plan.num_strokes if plan is not None else None,
+            )
+
+        swatches = self._read_swatches()
+        if swatches is None:
+            return
+        job.params["swatches"] = swatches
         try:
-            start_x = int(self.start_x_var.get())
-            start_y = int(self.start_y_var.get())
+            job.params["verify_passes"] = max(0, int(self.verify_var.get() or 0))
         except ValueError:
-            messagebox.showerror("Invalid input", "Start X and Y must be integers.")
+            messagebox.showerror("Invalid input", "Verify passes must be a whole number.")
             return
 
+        remaining = plan.slice(job.done) if plan is not None and job.done else plan
+        name = params.get("backend", "pyautogui")
+        measure = is_calibrated(name) or messagebox.askyesno(
+            "Estimate",
+            f"To estimate the drawing time, the speed of the {name} backend is measured\n"
+            "first. The pointer will move by itself near the start point for a moment;\n"
+            "don't touch the mouse until it stops.\n\n"
+            "Measure now? (No shows the estimate without a duration.)",
+        )
+        self.btn_start.config(state="disabled")
+        self.btn_resume.config(state="disabled")
+        self.controller.global_status_var.set("Estimating…")
+
+        def worker():
+            # Calibration and counting a big plan would freeze the window
+            try:
+                text = self._estimate_text(remaining, params, start_x, start_y, measure)
+            except Exception as e:
+                print("Could not estimate the drawing:", e)
+                text = ""
+            self.after(0, lambda: self._confirm_start(text, plan, params, start_x, start_y,
+                                                      job))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _confirm_start(self, estimate, plan, params, start_x, start_y, job):
+        self.btn_start.config(state="normal")
+        self.btn_resume.config(state="normal")
+        self.controller.global_status_var.set("")
         if not messagebox.askokcancel(
             "Confirm",
-            "The UI will disappear and a countdown will start.\n"
+            estimate
+            + "The UI will disappear and a countdown will start.\n"
             "When it reaches 0, drawing will begin.\n\n"
-            "Move the mouse to the TOP-LEFT corner of the screen to ABORT.\n\n"
+            "Move the mouse to the TOP-LEFT corner of the screen to ABORT,\n"
+            "or hold it in the TOP-RIGHT corner to PAUSE. While paused, press\n"
+            "Space in this window to resume or S to stop (Resume continues later).\n\n"
             "Continue?"
         ):
             return
-
-        img = self.controller.img
-        params = self.controller.params
+        self.job = job
 
         # Hide all UI elements (panel with title, inputs, buttons)
         self.center_frame.place_forget()
@@ -207,13 +387,66 @@ class StartPointPage(tk.Frame):
         # Start a 5-second countdown on the canvas
         self._run_countdown(
             seconds=5,
-            img=img,
+            plan=plan,
             start_x=start_x,
             start_y=start_y,
             params=params,
+            job=job,
         )
 
-    def _run_countdown(self, seconds, img, start_x, start_y, params):
+    def _estimate_text(self, plan, params, start_x, start_y, measure=True):
+        """
+        Event total and expected duration for the confirm dialog, using the
+        backend's per-event latency measured on this machine. Runs off the
+        Tk thread; without `measure` an uncalibrated backend gets no duration.
+        """
+        from core import estimate_job, estimate_stream, format_duration
+
+        name = params.get("backend", "pyautogui")
+        seconds_per_event = None
+        if measure:
+            try:
+                # Jiggles the cursor near the start point once per backend
+                # (confirmed by the user); keep clear of the (0, 0) failsafe corner
+                seconds_per_event = calibrate(name, x=max(start_x, 20), y=max(start_y, 20))
+            except Exception as e:
+                print("Could not calibrate the output backend:", e)
+
+        rough = False
+        if plan is not None:
+            est = estimate_job(plan, seconds_per_event or 0.0, params["rate"])
+        elif self.controller.mask is not None:
+            from bitmask import estimate_mask
+
+            # Counted chunk by chunk; the whole plan would not fit
+            est = estimate_mask(self.controller.mask, seconds_per_event or 0.0, params["rate"])
+            rough = True
+        else:
+            # Streamed jobs aren't planned yet: plan the bands here, one at a
+            # time, and add them up
+            est = estimate_stream(self._band_source(params), seconds_per_event or 0.0,
+                                  params["rate"])
+        print(f"Pre-flight: {est['events']:,} events, {est['ink_px']:.0f} px ink, "
+              f"{est['travel_px']:.0f} px travel"
+              + (f", {seconds_per_event * 1000:.3f} ms/event on {name}"
+                 if seconds_per_event is not None else ""))
+        switches = (
+            f"{est['color_switches']} colour switches (each colour is picked once)\n"
+            if est["color_switches"] else ""
+        )
+        if seconds_per_event is None:
+            duration = (f"duration unknown\n(the speed of the {name} backend "
+                        "has not been measured)\n")
+        else:
+            duration = (f"about {format_duration(est['duration_s'])}\n"
+                        f"({seconds_per_event * 1000:.2f} ms per event measured on {name})\n")
+        return (
+            f"{'Rough estimate' if rough else 'Estimate'}: "
+            f"{est['events']:,} mouse events, " + duration
+            + switches + "\n"
+        )
+
+    def _run_countdown(self, seconds, plan, start_x, start_y, params, job):
         canvas = self.preview_canvas
         canvas.delete("all")
 
@@ -233,49 +466,189 @@ class StartPointPage(tk.Frame):
                 1000,
                 self._run_countdown,
                 seconds - 1,
-                img,
+                plan,
                 start_x,
                 start_y,
                 params,
+                job,
             )
         else:
             # countdown finished: show "Drawing..." and start in background thread
-            canvas.delete("all")
-            canvas.create_text(
-                cw / 2,
-                ch / 2,
-                text="Drawing…",
-                fill=TEXT_FG,
-                font=FONT_COUNTDOWN,
-            )
+            self._show_message("Drawing…")
+            self.drawing = True
+            self._paused_shown = False
+            self.controller.bind("<space>", self._toggle_pause)
+            self.controller.bind("<Key-s>", self._stop_job)
+            self._watch_pause()
 
             def worker():
+                from core import execute_stream
+
                 aborted = False
+                verifying = False
                 try:
                     # perform the drawing (blocking) in a separate thread
-                    draw_image_with_mouse(
-                        img,
+                    backend = get_backend(params.get("backend", "pyautogui"))
+                    execute_stream(
+                        self._job_plans(plan, params),
                         start_x,
                         start_y,
-                        params["step"],
-                        params["threshold"],
-                        params["delay"],
+                        params["rate"],
+                        backend=backend,
+                        job=job,
+                        swatches=job.params.get("swatches"),
                     )
-                except pyautogui.FailSafeException:
-                    # user hit the TOP-LEFT failsafe
+                    passes = job.params.get("verify_passes", 0)
+                    if passes:
+                        from verify import verify_and_repair, verify_bands
+
+                        verifying = self.verifying = True
+                        self.after(0, lambda: self._show_message("Verifying…"))
+                        options = dict(
+                            passes=passes,
+                            rate=params["rate"],
+                            slack=1,
+                            settle_s=self.VERIFY_SETTLE_S,
+                            swatches=job.params.get("swatches"),
+                        )
+                        if plan is not None:
+                            verify_and_repair(plan, start_x, start_y, backend, **options)
+                        else:
+                            # Streamed jobs are re-planned and checked a band at a time
+                            verify_bands(self._band_source(params), start_x, start_y,
+                                         backend, **options)
+                    job.complete()
+                except DrawingAborted:
+                    # user hit the TOP-LEFT failsafe or stopped a paused job
                     aborted = True
                 except Exception as e:
                     # any other unexpected error -> treat as aborted but keep app alive
                     print("Error while drawing:", e)
                     aborted = True
                 finally:
+                    self.verifying = False
+                    if verifying and not job.finished:
+                        # Every stroke was drawn; only the repairs were cut short
+                        job.complete()
+                    # Keep the last completed stroke for Resume (no-op once complete)
+                    job.save()
+                    tracing.flush()
                     # when done, update UI in main thread
-                    self.after(0, lambda: self._on_drawing_done(aborted))
+                    self.after(0, lambda: self._on_drawing_done(aborted, verifying))
 
             threading.Thread(target=worker, daemon=True).start()
 
-    def _on_drawing_done(self, aborted=False):
+    def _band_source(self, params):
+        """Band plans of the streamed image or packed mask, planned as they are pulled."""
+        mask = self.controller.mask
+        if mask is not None:
+            from bitmask import iter_mask_bands
+
+            return iter_mask_bands(mask, params["mode"], params["tolerance"])
+
+        from parallel import iter_plan_bands_parallel
+
+        # Bands are planned and ordered in a process pool on multi-core machines
+        return iter_plan_bands_parallel(
+            self.controller.img,
+            params["step"],
+            params["threshold"],
+            params["mode"],
+            params["tolerance"],
+        )
+
+    def _job_plans(self, plan, params):
+        """
+        The plans to draw: the compiled plan if ConfigPage made one, otherwise
+        bands planned in a background thread while earlier bands are drawn.
+        Bands of an image stream are written to the plan cache as they go,
+        and the entry is kept once every band was drawn; masked images are
+        too big to cache and are only streamed.
+        """
+        if plan is not None:
+            return [plan]
+
+        source = prefetch(self._band_source(params), maxsize=self.STREAM_BUFFER_BANDS)
+        key = self.controller.plan_key
+        if self.controller.mask is not None or key is None:
+            return source
+
+        width, height = self.controller.img.size
+
+        def bands():
+            writer = default_cache().writer(key, width, height)
+            meta = None
+            try:
+                for band in source:
+                    if meta is None:
+                        meta = {k: v for k, v in band.meta.items() if k != "band"}
+                    writer.append(band)
+                    yield band
+            except BaseException:
+                writer.discard()
+                raise
+            writer.commit(meta or {})
+
+        return bands()
+
+    def _show_message(self, text):
+        canvas = self.preview_canvas
+        canvas.delete("all")
+        cw = canvas.winfo_width() or 1
+        ch = canvas.winfo_height() or 1
+        canvas.create_text(
+            cw / 2,
+            ch / 2,
+            text=text,
+            fill=TEXT_FG,
+            font=FONT_COUNTDOWN,
+        )
+
+    def _toggle_pause(self, event=None):
+        job = self.job
+        if job is None or job.finished or self.verifying:
+            return
+        if job.paused:
+            job.resume()
+            self._paused_shown = False
+            self._show_message("Drawing…")
+        else:
+            # Takes effect at the next stroke boundary, with the button up
+            job.pause()
+            self._show_paused()
+
+    def _show_paused(self):
+        self._paused_shown = True
+        self._show_message("Paused")
+        if hasattr(self.controller, "global_status_var"):
+            self.controller.global_status_var.set(
+                f"Paused after {self.job.done:,} strokes. "
+                "Press Space to resume or S to stop."
+            )
+
+    def _watch_pause(self):
+        """Show pauses the drawing thread took from the pause corner."""
+        job = self.job
+        if not self.drawing or job is None:
+            return
+        if job.paused and not self._paused_shown:
+            self._show_paused()
+        self.after(200, self._watch_pause)
+
+    def _stop_job(self, event=None):
+        """End a paused job; its checkpoint stays, so Resume can continue it."""
+        job = self.job
+        if job is None or not job.paused or self.verifying:
+            return
+        job.cancel()
+        self._show_message("Stopping…")
+
+    def _on_drawing_done(self, aborted=False, verifying=False):
         """Called when the background drawing thread finishes or is aborted."""
+        self.drawing = False
+        self.controller.unbind("<space>")
+        self.controller.unbind("<Key-s>")
+        self._refresh_resume()
         # Restore controls (back to StartPointPage UI)
         self.center_frame.place(relx=0.5, rely=0.25, anchor="center")
         # Redraw preview rectangle
@@ -283,9 +656,14 @@ class StartPointPage(tk.Frame):
 
         # Status text in bottom bar
         if hasattr(self.controller, "global_status_var"):
-            if aborted:
+            if aborted and verifying:
+                self.controller.global_status_var.set(
+                    "Verification stopped; the drawing itself is complete."
+                )
+            elif aborted:
                 self.controller.global_status_var.set(
-                    "Drawing aborted (failsafe: mouse moved to top-left)."
+                    f"Drawing stopped after {self.job.done:,} strokes. "
+                    "Press Resume to continue."
                 )
             else:
                 self.controller.global_status_var.set("Done drawing.")
@@ -0,0 +1,386 @@
+# stroke_plan.py
+import json
+import struct
+import tempfile
+import zlib
+
+import numpy as np
+
+# =======================
+# STROKE PLAN FORMAT
+# =======================
+
+PEN_UP = 0
+PEN_DOWN = 1
+
+
+class StrokePlan:
+    """
+    A compiled drawing: every stroke is a polyline in image pixel coordinates.
+
+    Storage is array-backed:
+      points  - (N, 2) int32 array of x, y vertices for all strokes
+      offsets - (S + 1,) int64 array; stroke i is points[offsets[i]:offsets[i + 1]]
+      pen     - (S,) uint8 array; PEN_DOWN strokes are drawn, PEN_UP ones are
+                only travelled through with the button released
+      color   - optional (S,) uint8 array of indexes into meta["palette"]
+                ([r, g, b] lists) for multi-colour plans; None means one ink
+    """
+
+    MAGIC = b"GBPLAN"
+    VERSION = 2
+
+    def __init__(self, points, offsets, pen=None, width=0, height=0, meta=None,
+                 color=None):
+        self.points = np.ascontiguousarray(points, dtype=np.int32).reshape(-1, 2)
+        self.offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+        if len(self.offsets) == 0:
+            self.offsets = np.zeros(1, dtype=np.int64)
+        if pen is None:
+            pen = np.full(len(self.offsets) - 1, PEN_DOWN, dtype=np.uint8)
+        self.pen = np.ascontiguousarray(pen, dtype=np.uint8)
+        self.color = None if color is None else np.ascontiguousarray(color, dtype=np.uint8)
+        self.width = int(width)
+        self.height = int(height)
+        self.meta = dict(meta or {})
+
+    # -------------------------
+    # CONSTRUCTION
+    # -------------------------
+    @classmethod
+    def from_row_runs(cls, ys, x_starts, x_ends, width=0, height=0, meta=None):
+        """Build a plan with one two-point stroke per horizontal run."""
+        n = len(ys)
+        points = np.empty((n * 2, 2), dtype=np.int32)
+        points[0::2, 0] = x_starts
+        points[1::2, 0] = x_ends
+        points[0::2, 1] = ys
+        points[1::2, 1] = ys
+        offsets = np.arange(0, n * 2 + 1, 2, dtype=np.int64)
+        return cls(points, offsets, width=width, height=height, meta=meta)
+
+    @classmethod
+    def from_polylines(cls, polylines, width=0, height=0, meta=None):
+        """Build a plan from a sequence of (k, 2) vertex arrays."""
+        polylines = [np.asarray(p, dtype=np.int32).reshape(-1, 2) for p in polylines]
+        lengths = np.array([len(p) for p in polylines], dtype=np.int64)
+        offsets = np.zeros(len(polylines) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        if polylines:
+            points = np.concatenate(polylines)
+        else:
+            points = np.zeros((0, 2), dtype=np.int32)
+        return cls(points, offsets, width=width, height=height, meta=meta)
+
+    @classmethod
+    def concatenate(cls, plans, width=None, height=None, meta=None):
+        """Join plans (e.g. streamed bands) into one, keeping stroke order."""
+        plans = list(plans)
+        if not plans:
+            return cls(np.zeros((0, 2)), np.zeros(1), width=width or 0,
+                       height=height or 0, meta=meta)
+        points = np.concatenate([p.points for p in plans])
+        colored = all(p.color is not None for p in plans)
+        shifts = np.cumsum([0] + [p.num_points for p in plans[:-1]])
+        offsets = np.concatenate(
+            [[0]] + [p.offsets[1:] + shift for p, shift in zip(plans, shifts)]
+        )
+        return cls(
+            points,
+            offsets,
+            pen=np.concatenate([p.pen for p in plans]),
+            width=max(p.width for p in plans) if width is None else width,
+            height=max(p.height for p in plans) if height is None else height,
+            meta=plans[0].meta if meta is None else meta,
+            color=np.concatenate([p.color for p in plans]) if colored else None,
+        )
+
+    def slice(self, start: int, stop: int = None) -> "StrokePlan":
+        """A new plan holding strokes[start:stop] (e.g. the rest of a resumed job)."""
+        start, stop, _ = slice(start, stop).indices(self.num_strokes)
+        stop = max(start, stop)
+        lo, hi = self.offsets[start], self.offsets[stop]
+        return StrokePlan(
+            self.points[lo:hi],
+            self.offsets[start:stop + 1] - lo,
+            pen=self.pen[start:stop],
+            width=self.width,
+            height=self.height,
+            meta=self.meta,
+            color=None if self.color is None else self.color[start:stop],
+        )
+
+    # -------------------------
+    # INSPECTION
+    # -------------------------
+    @property
+    def num_strokes(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def num_points(self) -> int:
+        return len(self.points)
+
+    def stroke(self, i: int) -> np.ndarray:
+        return self.points[self.offsets[i]:self.offsets[i + 1]]
+
+    def polylines(self):
+        """Return the strokes as a list of (k, 2) views into self.points."""
+        return np.split(self.points, self.offsets[1:-1])
+
+    def event_count(self) -> int:
+        """Number of mouse calls the executor will emit for this plan."""
+        lengths = np.diff(self.offsets)
+        down = self.pen == PEN_DOWN
+        # pen-down: moveTo(first) + mouseDown + moveTo per remaining point + mouseUp
+        return int(lengths[down].sum() + 2 * down.sum() + lengths[~down].sum())
+
+    @property
+    def palette(self):
+        """[r, g, b] per colour index, or None for a single-ink plan."""
+        return self.meta.get("palette") if self.color is not None else None
+
+    def color_switches(self) -> int:
+        """Palette selections needed to draw the strokes in order (0 for one ink)."""
+        if self.color is None or self.num_strokes == 0:
+            return 0
+        return 1 + int(np.count_nonzero(self.color[1:] != self.color[:-1]))
+
+    def __repr__(self):
+        return (f"StrokePlan({self.num_strokes} strokes, {self.num_points} points, "
+                f"{self.width}x{self.height})")
+
+    # -------------------------
+    # SERIALIZATION
+    # -------------------------
+    def _arrays(self):
+        # Points are delta-encoded so long runs of nearby vertices compress well
+        deltas = self.points.copy()
+        deltas[1:] -= self.points[:-1]
+        arrays = {
+            "points": deltas,
+            "offsets": np.diff(self.offsets),
+            "pen": self.pen,
+        }
+        if self.color is not None:
+            arrays["color"] = self.color
+        return arrays
+
+    @classmethod
+    def _preamble(cls, width, height, meta, specs) -> bytes:
+        """Magic, version and JSON header; `specs` are (name, dtype, shape)."""
+        header = {
+            "width": width,
+            "height": height,
+            "meta": meta,
+            "arrays": [
+                {"name": name, "dtype": dtype.str, "shape": list(shape)}
+                for name, dtype, shape in specs
+            ],
+        }
+        header_bytes = json.dumps(header).encode("utf-8")
+        return cls.MAGIC + struct.pack("<HI", cls.VERSION, len(header_bytes)) + header_bytes
+
+    def to_bytes(self) -> bytes:
+        arrays = self._arrays()
+        specs = [(name, arr.dtype, arr.shape) for name, arr in arrays.items()]
+        payload = zlib.compress(b"".join(arr.tobytes() for arr in arrays.values()), 9)
+        return self._preamble(self.width, self.height, self.meta, specs) + payload
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "StrokePlan":
+        if not data.startswith(cls.MAGIC):
+            raise ValueError("Not a GhostBrush stroke plan.")
+        pos = len(cls.MAGIC)
+        version, header_len = struct.unpack_from("<HI", data, pos)
+        if version > cls.VERSION:
+            raise ValueError(f"Unsupported stroke plan version: {version}")
+        pos += struct.calcsize("<HI")
+        header = json.loads(data[pos:pos + header_len].decode("utf-8"))
+        payload = zlib.decompress(data[pos + header_len:])
+
+        arrays = {}
+        cursor = 0
+        for spec in header["arrays"]:
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"], dtype=np.int64))
+            arr = np.frombuffer(payload, dtype=dtype, count=count, offset=cursor)
+            arrays[spec["name"]] = arr.reshape(spec["shape"])
+            cursor += count * dtype.itemsize
+
+        points = np.cumsum(arrays["points"], axis=0, dtype=np.int32)
+        offsets = np.zeros(len(arrays["offsets"]) + 1, dtype=np.int64)
+        np.cumsum(arrays["offsets"], out=offsets[1:])
+        return cls(
+            points,
+            offsets,
+            pen=arrays["pen"],
+            width=header["width"],
+            height=header["height"],
+            meta=header.get("meta"),
+            color=arrays.get("color"),
+        )
+
+    def save(self, path) -> None:
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path) -> "StrokePlan":
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+    # -------------------------
+    # EXPORT
+    # -------------------------
+    def to_svg(self, path=None, stroke_width: float = 1.0) -> str:
+        """Render pen-down strokes as SVG polylines; write to path if given."""
+        lines = [
+            '<svg xmlns="http://www.w3.org/2000/svg" '
+            f'width="{self.width}" height="{self.height}" '
+            f'viewBox="0 0 {self.width} {self.height}">',
+            f'<g fill="none" stroke="black" stroke-width="{stroke_width}" '
+            'stroke-linecap="round" stroke-linejoin="round">',
+        ]
+        palette = self.palette
+        colors = self.color.tolist() if palette else [None] * self.num_strokes
+        for pen, color, pts in zip(self.pen.tolist(), colors, self.polylines()):
+            if pen != PEN_DOWN or len(pts) == 0:
+                continue
+            ink = "black" if color is None else "#{:02x}{:02x}{:02x}".format(*palette[color])
+            if len(pts) == 1:
+                x, y = pts[0].tolist()
+                lines.append(f'<circle cx="{x}" cy="{y}" r="{stroke_width / 2}" fill="{ink}"/>')
+            else:
+                coords = " ".join(f"{x},{y}" for x, y in pts.tolist())
+                stroke = "" if color is None else f' stroke="{ink}"'
+                lines.append(f'<polyline points="{coords}"{stroke}/>')
+        lines.append("</g>")
+        lines.append("</svg>")
+        svg = "\n".join(lines)
+
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(svg)
+        return svg
+
+
+class StrokePlanWriter:
+    """
+    Writes a plan file piece by piece, e.g. streamed bands as they are
+    drawn, without holding the whole plan: append() spills each array to a
+    temporary file and close() writes the same file StrokePlan.save would
+    for the concatenated plan. The plan is only colour-coded if every
+    appended piece is.
+    """
+
+    _CHUNK = 1 << 20
+
+    def __init__(self, path, width: int, height: int, meta=None):
+        self.path = path
+        self.width = int(width)
+        self.height = int(height)
+        self.meta = meta
+        self._spills = {name: tempfile.TemporaryFile()
+                        for name in ("points", "offsets", "pen", "color")}
+        self._last = np.zeros(2, dtype=np.int32)  # points are deltas across pieces too
+        self._points = 0
+        self._strokes = 0
+        self._colored = True
+
+    def append(self, plan: StrokePlan) -> None:
+        if self.meta is None:
+            self.meta = plan.meta
+        if plan.num_points:
+            deltas = plan.points.copy()
+            deltas[1:] -= plan.points[:-1]
+            deltas[0] -= self._last
+            self._last = plan.points[-1].copy()
+            self._spills["points"].write(deltas.tobytes())
+        self._spills["offsets"].write(np.diff(plan.offsets).tobytes())
+        self._spills["pen"].write(plan.pen.tobytes())
+        self._colored = self._colored and plan.color is not None
+        if self._colored:
+            self._spills["color"].write(plan.color.tobytes())
+        self._points += plan.num_points
+        self._strokes += plan.num_strokes
+
+    def close(self) -> None:
+        """Write the plan file and drop the spilled arrays."""
+        specs = [
+            ("points", np.dtype(np.int32), (self._points, 2)),
+            ("offsets", np.dtype(np.int64), (self._strokes,)),
+            ("pen", np.dtype(np.uint8), (self._strokes,)),
+        ]
+        if self._colored and self._strokes:
+            specs.append(("color", np.dtype(np.uint8), (self._strokes,)))
+        try:
+            with open(self.path, "wb") as f:
+                f.write(StrokePlan._preamble(self.width, self.height, self.meta or {}, specs))
+                packer = zlib.compressobj(9)
+                for name, _, _ in specs:
+                    spill = self._spills[name]
+                    spill.seek(0)
+                    for chunk in iter(lambda: spill.read(self._CHUNK), b""):
+                        f.write(packer.compress(chunk))
+                f.write(packer.flush())
+        finally:
+            self.discard()
+
+    def discard(self) -> None:
+        """Drop the spilled arrays without writing anything."""
+        for spill in self._spills.values():
+            spill.close()
+
+
+# =======================
+# RASTERIZING
+# =======================
+
+def stroke_pixels(plan):
+    """
+    Every pixel the pen-down strokes pass over, the way a SimulatedCanvasBackend
+    draws them: the dot at each stroke start, then every segment. Returns
+    int64 arrays (xs, ys, vertex, t): vertex is the index of the point the dot
+    or segment starts at, t the pixel's position along the segment.
+    """
+    empty = np.zeros(0, dtype=np.int64)
+    if plan.num_points == 0:
+        return empty, empty, empty, empty
+
+    lengths = np.diff(plan.offsets)
+    stroke_of = np.repeat(np.arange(plan.num_strokes), lengths)
+    down = plan.pen[stroke_of] == PEN_DOWN
+    pts = plan.points.astype(np.int64)
+
+    # Pen-down dots at every stroke start, then every drawn segment
+    firsts = plan.offsets[:-1][(plan.pen == PEN_DOWN) & (lengths > 0)]
+    xs, ys = [pts[firsts, 0]], [pts[firsts, 1]]
+
+    drawn = (stroke_of[1:] == stroke_of[:-1]) & down[1:]
+    starts = np.flatnonzero(drawn)
+    a = pts[starts]
+    d = pts[starts + 1] - a
+    n = np.abs(d).max(axis=1) + 1
+    seg = np.repeat(np.arange(len(n)), n)
+    t = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    frac = t / np.maximum(n - 1, 1)[seg]
+    xs.append(np.rint(a[seg, 0] + d[seg, 0] * frac).astype(np.int64))
+    ys.append(np.rint(a[seg, 1] + d[seg, 1] * frac).astype(np.int64))
+
+    vertex = np.concatenate([firsts, starts[seg]])
+    t = np.concatenate([np.zeros(len(firsts), dtype=np.int64), t])
+    return np.concatenate(xs), np.concatenate(ys), vertex, t
+
+
+def rasterize(plan, shape) -> np.ndarray:
+    """
+    Vectorized equivalent of replaying the plan onto a SimulatedCanvasBackend:
+    the boolean (h, w) mask of pixels covered by pen-down strokes.
+    """
+    h, w = shape
+    mask = np.zeros((h, w), dtype=bool)
+    xs, ys, _, _ = stroke_pixels(plan)
+    inside = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+    mask[ys[inside], xs[inside]] = True
+    return mask
@@ -0,0 +1,25 @@
+# conftest.py
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+# The modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def gray_image():
+    """A 160x120 grayscale test image: a ring, a bar, a diagonal and some noise."""
+    h, w = 120, 160
+    yy, xx = np.mgrid[:h, :w]
+    arr = np.full((h, w), 255, dtype=np.uint8)
+    ring = np.abs(np.hypot(xx - 50, yy - 60) - 30) < 6
+    arr[ring] = 40
+    arr[20:30, 90:150] = 0
+    arr[np.abs(xx - 100 - (yy - 40)) < 3] = 90
+    noise = np.random.default_rng(0).random((h, w)) < 0.01
+    arr[noise] = 10
+    return Image.fromarray(arr, mode="L")
@@ -0,0 +1,68 @@
+# test_autotune.py
+import numpy as np
+import pytest
+
+from autotune import autotune, coverage, fidelity
+from core import estimate_job
+from planner import compile_plan, dark_mask
+
+
+def test_fidelity_bounds():
+    mask = np.zeros((16, 16), dtype=bool)
+    mask[4:12, 4:12] = True
+    ref = coverage(mask, 4)
+    assert fidelity(ref, ref) == 1.0
+    assert fidelity(ref, coverage(~mask, 4)) < 0.5
+    assert fidelity(coverage(np.zeros_like(mask), 4), coverage(np.zeros_like(mask), 4)) == 1.0
+
+
+def test_best_fits_the_event_budget(gray_image):
+    full = compile_plan(gray_image, 1, 200, "rows").event_count()
+    budget = full // 3
+    result = autotune(gray_image, max_events=budget, steps=(1, 2, 4),
+                      tolerances=(0, 1), workers=1)
+    best = result["best"]
+    assert best is not None and best["events"] <= budget
+    # Nothing within the budget scores better
+    assert all(c["fidelity"] <= best["fidelity"]
+               for c in result["candidates"] if c["fits"])
+    # The best candidate's figures are those of the plan it describes
+    plan = compile_plan(gray_image, best["step"], best["threshold"], best["mode"],
+                        best["tolerance"])
+    assert best["events"] == plan.event_count()
+
+
+def test_unlimited_budget_picks_the_reference(gray_image):
+    result = autotune(gray_image, steps=(1, 3), modes=("rows",), workers=1)
+    best = result["best"]
+    assert (best["step"], best["fidelity"]) == (1, 1.0)
+    # Any threshold that keeps every dark level of the test image is as good
+    assert np.array_equal(dark_mask(gray_image, 1, best["threshold"]),
+                          dark_mask(gray_image, 1, 200))
+
+
+def test_time_budget_uses_seconds_per_event(gray_image):
+    result = autotune(gray_image, max_seconds=1.0, seconds_per_event=0.001, rate=0,
+                      steps=(1, 2, 4, 8), modes=("rows",), workers=1)
+    for c in result["candidates"]:
+        plan = compile_plan(gray_image, c["step"], c["threshold"], "rows")
+        assert c["duration_s"] == pytest.approx(estimate_job(plan, 0.001)["duration_s"],
+                                                abs=0.01)
+        assert c["fits"] == (c["duration_s"] <= 1.0)
+    with pytest.raises(ValueError):
+        autotune(gray_image, max_seconds=1.0)
+
+
+def test_pareto_front_trades_events_for_fidelity(gray_image):
+    front = autotune(gray_image, steps=(1, 2, 4), workers=1)["pareto"]
+    events = [c["events"] for c in front]
+    scores = [c["fidelity"] for c in front]
+    assert events == sorted(events)
+    assert scores == sorted(scores) and len(set(scores)) == len(scores)
+
+
+def test_process_pool_matches_in_process(gray_image):
+    kwargs = dict(max_events=2000, steps=(2, 4), tolerances=(0, 1))
+    serial = autotune(gray_image, workers=1, **kwargs)["candidates"]
+    pooled = autotune(gray_image, workers=2, **kwargs)["candidates"]
+    assert pooled == serial
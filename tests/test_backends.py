@@ -0,0 +1,87 @@
+# test_backends.py
+import numpy as np
+import pytest
+
+from backends import RecordingBackend, SimulatedCanvasBackend, get_backend
+
+
+def drag(backend, *points):
+    backend.move_to(*points[0])
+    backend.mouse_down()
+    for x, y in points[1:]:
+        backend.move_to(x, y)
+    backend.mouse_up()
+
+
+def test_canvas_draws_pen_down_moves_only():
+    canvas = SimulatedCanvasBackend(10, 8)
+    canvas.move_to(1, 1)
+    canvas.move_to(8, 1)
+    assert not canvas.mask().any()
+    drag(canvas, (1, 2), (5, 2), (5, 6))
+    expected = np.zeros((8, 10), dtype=bool)
+    expected[2, 1:6] = True
+    expected[2:7, 5] = True
+    assert np.array_equal(canvas.mask(), expected)
+
+
+def test_canvas_origin_and_clipping():
+    canvas = SimulatedCanvasBackend(6, 4, origin_x=100, origin_y=50)
+    drag(canvas, (95, 51), (110, 51))
+    expected = np.zeros((4, 6), dtype=bool)
+    expected[1, :] = True
+    assert np.array_equal(canvas.mask(), expected)
+    assert canvas.image().size == (6, 4)
+
+
+def test_capture_pads_with_paper():
+    canvas = SimulatedCanvasBackend(4, 4, origin_x=10, origin_y=10)
+    drag(canvas, (10, 10), (13, 13))
+    out = canvas.capture(8, 9, 4, 3)
+    assert out.shape == (3, 4)
+    expected = np.full((3, 4), 255, dtype=np.uint8)
+    expected[1, 2] = 0
+    expected[2, 3] = 0
+    assert np.array_equal(out, expected)
+    assert (canvas.capture(100, 100, 2, 2) == 255).all()
+
+
+def test_drop_rate_is_seeded():
+    def run(seed):
+        canvas = SimulatedCanvasBackend(40, 40, drop_rate=0.3, seed=seed)
+        for y in range(0, 40, 2):
+            drag(canvas, (0, y), (20, y), (39, y))
+        return canvas
+
+    a, b = run(3), run(3)
+    assert a.dropped > 0
+    assert a.dropped == b.dropped
+    assert np.array_equal(a.mask(), b.mask())
+    assert SimulatedCanvasBackend(4, 4).dropped == 0
+
+
+def test_recording_counts_and_forwards():
+    canvas = SimulatedCanvasBackend(8, 8)
+    recorder = RecordingBackend(canvas)
+    recorder.begin()
+    drag(recorder, (1, 1), (6, 1), (6, 4))
+    recorder.end()
+    assert recorder.counts() == {"move": 3, "down": 1, "up": 1}
+    assert [kind for _, kind, _, _ in recorder.events] == ["move", "down", "move", "move", "up"]
+    assert recorder.events[1][2:] == (1, 1)
+    assert canvas.mask().sum() == 9
+    assert np.array_equal(recorder.capture(0, 0, 8, 8), canvas.capture(0, 0, 8, 8))
+    assert not recorder.pause_requested()
+
+
+def test_recording_without_inner_cannot_capture():
+    with pytest.raises(NotImplementedError):
+        RecordingBackend().capture(0, 0, 1, 1)
+
+
+def test_get_backend():
+    canvas = get_backend("simulated", width=5, height=3)
+    assert isinstance(canvas, SimulatedCanvasBackend)
+    assert canvas.canvas.shape == (3, 5)
+    with pytest.raises(ValueError):
+        get_backend("plotter")
@@ -0,0 +1,73 @@
+# test_batch.py
+import json
+import os
+
+import numpy as np
+import pytest
+
+import batch
+from core import load_and_prepare_image
+from plan_cache import PlanCache
+from planner import compile_plan
+from stroke_plan import StrokePlan
+
+
+@pytest.fixture
+def images(gray_image, tmp_path):
+    src = tmp_path / "in"
+    (src / "more").mkdir(parents=True)
+    gray_image.save(src / "a.png")
+    gray_image.transpose(0).convert("P").save(src / "b.gif")
+    gray_image.save(src / "more" / "a.png")
+    (src / "notes.txt").write_text("not an image")
+    return src
+
+
+def test_find_images(images):
+    found = batch.find_images([str(images), str(images / "a.png"),
+                               str(images / "more" / "*.png")])
+    assert found == [str(images / "a.png"), str(images / "b.gif"),
+                     str(images / "more" / "a.png")]
+
+
+def test_output_names_never_clash():
+    assert batch.output_names(["x/a.png", "y/a.png", "a.jpg", "b.png"]) == [
+        "a.gbplan", "a-2.gbplan", "a-3.gbplan", "b.gbplan"]
+
+
+def test_cli_writes_the_plans_the_app_would_make(images, tmp_path):
+    out, cache_dir = tmp_path / "out", tmp_path / "cache"
+    code = batch.main([str(images), str(images / "more"), "--out", str(out),
+                       "--scale", "0.5", "--step", "2", "--mode", "outline",
+                       "--ms-per-event", "0.5", "--cache-dir", str(cache_dir),
+                       "--workers", "2"])
+    assert code == 0
+
+    with open(out / "manifest.json", encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert [os.path.basename(r["plan"]) for r in manifest["results"]] == [
+        "a.gbplan", "b.gbplan", "a-2.gbplan"]
+
+    cache = PlanCache(str(cache_dir))
+    for result in manifest["results"]:
+        img = load_and_prepare_image(result["image"], 0.5, report=None)
+        expected = compile_plan(img, 2, 200, "outline", 1.0)
+        plan = StrokePlan.load(result["plan"])
+        assert np.array_equal(plan.points, expected.points)
+        assert result["events"] == expected.event_count()
+        assert result["estimated_s"] == pytest.approx(expected.event_count() * 0.0005, abs=0.1)
+        cached = cache.get(cache.key(result["image"], manifest["params"]))
+        assert np.array_equal(cached.points, expected.points)
+
+
+def test_failures_are_reported_and_skipped(images, tmp_path):
+    (images / "broken.png").write_bytes(b"\x89PNG not really")
+    lines = []
+    paths = batch.find_images([str(images)])
+    results = batch.compile_all(paths, str(tmp_path / "out"),
+                                {"scale": 1.0, "step": 1, "threshold": 200, "rate": 0,
+                                 "tolerance": 1.0, "colors": 0, "mode": "rows"},
+                                workers=2, report=lines.append)
+    assert [os.path.basename(r["image"]) for r in results] == ["a.png", "b.gif"]
+    assert any(line.startswith("broken.png: FAILED") for line in lines)
+    assert all(r["estimated_s"] is None for r in results)
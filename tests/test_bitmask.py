@@ -0,0 +1,113 @@
+# test_bitmask.py
+import numpy as np
+import pytest
+from PIL import Image
+
+from bitmask import (
+    PackedMask,
+    TiledSource,
+    build_mask,
+    compile_mask_plan,
+    estimate_mask,
+    iter_mask_bands,
+    load_gray,
+)
+from core import estimate_job, load_and_prepare_image
+from planner import compile_plan, dark_mask, iter_plan_bands
+
+# Small enough that a 160x120 image is read in many bands
+CEILING_MB = 0.05
+
+
+@pytest.fixture(params=["bmp", "ppm", "png", "jpg"])
+def image_file(request, gray_image, tmp_path):
+    """The test image as RGB, with the ceiling its format can be read under.
+
+    bmp and ppm are read raw in tiles; png and jpg are decoded whole.
+    """
+    path = str(tmp_path / f"image.{request.param}")
+    gray_image.convert("RGB").save(path)
+    return path, CEILING_MB if request.param in ("bmp", "ppm") else None
+
+
+@pytest.mark.parametrize("scale, step", [(1.0, 1), (0.5, 2), (0.3, 1), (0.37, 3), (1.6, 2)])
+def test_build_mask_matches_whole_image_load(image_file, scale, step):
+    image_file, ceiling_mb = image_file
+    img = load_and_prepare_image(image_file, scale, report=None)
+    with build_mask(image_file, scale, step, 200, ceiling_mb=ceiling_mb, report=None) as mask:
+        assert (mask.width, mask.height) == img.size
+        assert np.array_equal(mask.read_rows(0, mask.shape[0]), dark_mask(img, step, 200))
+
+
+def test_load_gray_matches_whole_image_load(image_file):
+    image_file, ceiling_mb = image_file
+    expected = np.asarray(load_and_prepare_image(image_file, 0.45, report=None))
+    got = np.asarray(load_gray(image_file, 0.45, ceiling_mb=ceiling_mb, report=None))
+    assert np.array_equal(got, expected)
+
+
+@pytest.mark.parametrize("scale", [0.3, 0.75, 1.6])
+def test_tiled_rows_match_whole_image_resize(tmp_path, scale):
+    # Noise puts gray levels next to every threshold, so any rounding shows
+    rng = np.random.default_rng(1)
+    path = str(tmp_path / "noise.bmp")
+    Image.fromarray((rng.random((900, 700)) * 255).astype(np.uint8)).convert("RGB").save(path)
+    expected = np.asarray(load_and_prepare_image(path, scale, report=None))
+    source = TiledSource(path, scale, 0.2)
+    try:
+        rows = source.band_rows(int(0.1 * 2**20))
+        assert rows < source.new_size[1]
+        bands = [source.rows(y, min(y + rows, source.new_size[1]))
+                 for y in range(0, source.new_size[1], rows)]
+    finally:
+        source.close()
+    assert np.array_equal(np.concatenate(bands), expected)
+
+
+def test_raw_formats_are_read_in_tiles(gray_image, tmp_path):
+    path = str(tmp_path / "image.bmp")
+    gray_image.convert("RGB").save(path)
+    source = TiledSource(path, 0.5, CEILING_MB)
+    try:
+        assert source.path_kind == "raw"
+        assert source.held == 0
+    finally:
+        source.close()
+
+
+def test_packed_mask_round_trip():
+    rng = np.random.default_rng(0)
+    bits = rng.random((37, 50)) < 0.3
+    mask = PackedMask(100, 74, 2)
+    assert mask.shape == bits.shape
+    mask.write_rows(0, bits[:20])
+    mask.write_rows(20, bits[20:])
+    assert np.array_equal(mask.read_rows(0, 37), bits)
+    assert np.array_equal(mask.read_rows(10, 15), bits[10:15])
+    assert mask.count() == bits.sum()
+    assert mask.nbytes == 37 * 7
+
+
+@pytest.mark.parametrize("mode", ["rows", "outline"])
+def test_mask_bands_match_image_bands(gray_image, tmp_path, mode):
+    path = str(tmp_path / "image.png")
+    gray_image.save(path)
+    with build_mask(path, 1.0, 2, 200, report=None) as mask:
+        got = list(iter_mask_bands(mask, mode, 1.0, band_rows=32))
+    expected = list(iter_plan_bands(gray_image, 2, 200, mode, 1.0, band_rows=32))
+    assert len(got) == len(expected)
+    for a, b in zip(got, expected):
+        assert np.array_equal(a.points, b.points)
+        assert a.meta["band"] == b.meta["band"]
+
+
+def test_mask_plan_and_estimate(gray_image, tmp_path):
+    path = str(tmp_path / "image.png")
+    gray_image.save(path)
+    with build_mask(path, 1.0, 1, 200, report=None) as mask:
+        plan = compile_mask_plan(mask, "rows")
+        est = estimate_mask(mask, 0.001, chunk_rows=16)
+    whole = compile_plan(gray_image, 1, 200, "rows")
+    assert plan.num_strokes == whole.num_strokes
+    assert est["events"] == estimate_job(whole, 0.001)["events"]
+    assert est["ink_px"] == pytest.approx(estimate_job(whole, 0.001)["ink_px"])
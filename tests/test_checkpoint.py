@@ -0,0 +1,130 @@
+# test_checkpoint.py
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from backends import DrawingAborted, RecordingBackend, SimulatedCanvasBackend
+from checkpoint import DrawingJob
+from core import execute_plan, execute_stream, render_plan
+from planner import compile_plan, iter_plan_bands
+from stroke_plan import PEN_DOWN
+
+
+class AbortingCanvas(SimulatedCanvasBackend):
+    """Raises DrawingAborted on the n-th move, like the top-left failsafe."""
+
+    def __init__(self, *args, abort_after=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.abort_after = abort_after
+        self.moves = 0
+
+    def move_to(self, x, y):
+        self.moves += 1
+        if self.moves == self.abort_after:
+            raise DrawingAborted("Mouse moved to the top-left corner.")
+        super().move_to(x, y)
+
+
+class CornerCanvas(SimulatedCanvasBackend):
+    """Reports the pointer in the pause corner after the n-th move, until it moves again."""
+
+    def __init__(self, *args, corner_after=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.corner_after = corner_after
+        self.moves = 0
+
+    def move_to(self, x, y):
+        self.moves += 1
+        super().move_to(x, y)
+
+    def pause_requested(self):
+        return self.moves == self.corner_after
+
+
+def test_resume_draws_identical_canvas(gray_image):
+    plan = compile_plan(gray_image, 1, 200, "outline", 1.0)
+    expected = render_plan(plan).canvas
+
+    canvas = AbortingCanvas(plan.width, plan.height, abort_after=plan.num_points // 2)
+    job = DrawingJob(total=plan.num_strokes)
+    with pytest.raises(DrawingAborted):
+        execute_plan(plan, 0, 0, backend=canvas, job=job, report=None)
+    assert 0 < job.done < plan.num_strokes
+
+    execute_plan(plan, 0, 0, backend=canvas, job=job, report=None)
+    assert job.done == plan.num_strokes
+    assert np.array_equal(canvas.canvas, expected)
+
+
+def test_resume_streamed_bands(gray_image):
+    def bands():
+        return iter_plan_bands(gray_image, 1, 200, "rows", 1.0, band_rows=32)
+
+    expected = SimulatedCanvasBackend(*gray_image.size)
+    execute_stream(bands(), 0, 0, backend=expected, report=None)
+
+    canvas = AbortingCanvas(*gray_image.size, abort_after=300)
+    job = DrawingJob()
+    with pytest.raises(DrawingAborted):
+        execute_stream(bands(), 0, 0, backend=canvas, job=job, report=None)
+    execute_stream(bands(), 0, 0, backend=canvas, job=job, report=None)
+    assert np.array_equal(canvas.canvas, expected.canvas)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_pause_corner_pauses_mid_stroke(gray_image):
+    plan = compile_plan(gray_image, 1, 200, "outline", 1.0)
+    long_strokes = np.flatnonzero((plan.pen == PEN_DOWN) & (np.diff(plan.offsets) > 4))
+    i = int(long_strokes[len(long_strokes) // 2])
+    # The corner shows up after the stroke's third vertex, with the button held
+    canvas = CornerCanvas(plan.width, plan.height, corner_after=int(plan.offsets[i]) + 3)
+    recorder = RecordingBackend(canvas)
+    job = DrawingJob(total=plan.num_strokes)
+    worker = threading.Thread(target=execute_plan, args=(plan, 0, 0),
+                              kwargs={"backend": recorder, "job": job, "report": None})
+    worker.start()
+    try:
+        wait_for(lambda: job.paused)
+        assert job.done == i
+        assert not canvas.down
+        assert recorder.events[-1][1] == "up"
+        paused_at = len(recorder.events)
+    finally:
+        job.resume()
+        worker.join(5)
+
+    # The stroke carries on from the same point with the button pressed again
+    _, kind, x, y = recorder.events[paused_at - 1]
+    assert [e[1:] for e in recorder.events[paused_at:paused_at + 2]] == [
+        ("move", x, y), ("down", x, y)]
+    assert job.done == plan.num_strokes
+    assert np.array_equal(canvas.canvas, render_plan(plan).canvas)
+
+
+def test_cancel_while_paused_in_the_corner(gray_image):
+    plan = compile_plan(gray_image, 1, 200, "rows", 1.0)
+    canvas = CornerCanvas(plan.width, plan.height, corner_after=50)
+    job = DrawingJob(total=plan.num_strokes)
+    errors = []
+
+    def draw():
+        try:
+            execute_plan(plan, 0, 0, backend=canvas, job=job, report=None)
+        except DrawingAborted as e:
+            errors.append(e)
+
+    worker = threading.Thread(target=draw)
+    worker.start()
+    wait_for(lambda: job.paused)
+    job.cancel()
+    worker.join(5)
+    assert len(errors) == 1
+    assert not canvas.down
@@ -0,0 +1,82 @@
+# test_decode.py
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import core
+import tracing
+from config_page import ConfigPage
+from core import decode_image, load_and_prepare_image
+
+
+@pytest.fixture
+def opens(monkeypatch):
+    """Counts the decodes core actually runs (header reads aren't counted)."""
+    calls = []
+    real_span = tracing.span
+
+    def counting_span(name, **kwargs):
+        if name == "decode":
+            calls.append(name)
+        return real_span(name, **kwargs)
+
+    monkeypatch.setattr(tracing, "span", counting_span)
+    monkeypatch.setattr(core, "_decoded", type(core._decoded)())
+    return calls
+
+
+@pytest.fixture
+def photo(gray_image, tmp_path):
+    path = str(tmp_path / "photo.jpg")
+    gray_image.convert("RGB").resize((640, 480)).save(path, quality=95)
+    return path
+
+
+def test_preview_and_load_share_one_decode(photo, opens):
+    preview, gray, full_size = ConfigPage._render_preview(photo, 200, 200, 1.0)
+    assert full_size == (640, 480)
+    assert preview.size == (200, 150)
+    assert gray.shape == (150, 200) and gray.dtype == np.uint8
+    decodes = len(opens)
+
+    load_and_prepare_image(photo, 1.0, report=None)
+    assert len(opens) == decodes
+
+
+def test_draft_decode_covers_the_requested_size(photo, opens):
+    small = decode_image(photo, (100, 80))
+    assert small.size == (160, 120)  # JPEG DCT scaling by 1/4
+    # A later caller that needs more pixels gets a fresh decode
+    assert decode_image(photo, (300, 200)).size == (320, 240)
+    # while a smaller request reuses the one already there
+    opened = len(opens)
+    assert decode_image(photo, (150, 100)).size == (320, 240)
+    assert len(opens) == opened
+
+
+def test_changed_file_is_decoded_again(gray_image, tmp_path, opens):
+    path = str(tmp_path / "a.png")
+    gray_image.save(path)
+    first = decode_image(path)
+    assert decode_image(path) is first
+
+    gray_image.transpose(Image.FLIP_LEFT_RIGHT).save(path)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    second = decode_image(path)
+    assert second is not first
+    assert np.array_equal(np.asarray(second), np.asarray(gray_image)[:, ::-1])
+
+
+def test_only_recent_decodes_are_kept(gray_image, tmp_path, opens):
+    paths = []
+    for k in range(core.DECODE_CACHE_ENTRIES + 1):
+        paths.append(str(tmp_path / f"{k}.png"))
+        gray_image.save(paths[-1])
+        decode_image(paths[-1])
+    assert len(core._decoded) == core.DECODE_CACHE_ENTRIES
+    opened = len(opens)
+    decode_image(paths[0])
+    assert len(opens) == opened + 1
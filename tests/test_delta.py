@@ -0,0 +1,70 @@
+# test_delta.py
+import numpy as np
+import pytest
+from PIL import Image
+
+from core import execute_plan, render_plan
+from delta import compile_delta_plan, compile_sequence
+from planner import compile_plan
+
+
+@pytest.fixture
+def revised(gray_image):
+    """The test image with a new dark block and the bar removed."""
+    arr = np.asarray(gray_image).copy()
+    arr[70:110, 100:150] = 0
+    arr[20:30, 90:150] = 255
+    return Image.fromarray(arr, mode="L")
+
+
+@pytest.mark.parametrize("mode", ["rows", "outline"])
+def test_delta_completes_the_new_drawing(gray_image, revised, mode):
+    before = compile_plan(gray_image, 1, 200, mode, 1.0)
+    canvas = render_plan(before)
+
+    execute_plan(compile_delta_plan(revised, before, 1, 200, mode, 1.0), 0, 0,
+                 backend=canvas, report=None)
+    full = compile_plan(revised, 1, 200, mode, 1.0)
+    assert np.array_equal(canvas.mask(), render_plan(full).mask() | render_plan(before).mask())
+
+
+@pytest.mark.parametrize("step", [1, 2, 3])
+def test_rows_delta_against_an_image(gray_image, revised, step):
+    canvas = render_plan(compile_plan(gray_image, step, 200))
+    delta = compile_delta_plan(revised, gray_image, step, 200)
+    execute_plan(delta, 0, 0, backend=canvas, report=None)
+    expected = render_plan(compile_plan(revised, step, 200)).mask()
+    # Nothing the new image needs is missing; removed ink is left to erase
+    assert not (expected & ~canvas.mask()).any()
+    assert delta.num_strokes < compile_plan(revised, step, 200).num_strokes
+
+
+def test_delta_counts(gray_image, revised):
+    d = compile_delta_plan(revised, gray_image, 1, 200).meta["delta"]
+    old = np.asarray(gray_image) < 200
+    new = np.asarray(revised) < 200
+    assert d == {"added": int((new & ~old).sum()), "removed": int((old & ~new).sum()),
+                 "unchanged": int((new & old).sum())}
+
+
+def test_unchanged_image_draws_nothing(gray_image):
+    for mode in ("rows", "skeleton"):
+        previous = compile_plan(gray_image, 1, 200, mode, 1.0)
+        assert compile_delta_plan(gray_image, previous, 1, 200, mode, 1.0).num_strokes == 0
+
+
+def test_plan_size_must_match(gray_image):
+    small = compile_plan(gray_image.resize((80, 60)), 1, 200)
+    with pytest.raises(ValueError):
+        compile_delta_plan(gray_image, small, 1, 200)
+
+
+def test_sequence_builds_frame_on_frame(gray_image, revised):
+    plans = list(compile_sequence([gray_image, revised, revised], 1, 200))
+    assert [p.meta["frame"] for p in plans] == [0, 1, 2]
+    assert "delta" not in plans[0].meta
+    assert plans[2].num_strokes == 0
+    canvas = render_plan(plans[0])
+    for plan in plans[1:]:
+        execute_plan(plan, 0, 0, backend=canvas, report=None)
+    assert not (render_plan(compile_plan(revised, 1, 200)).mask() & ~canvas.mask()).any()
@@ -0,0 +1,66 @@
+# test_estimate.py
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import start_point_page
+from core import estimate_job, format_duration
+from planner import compile_plan
+from stroke_plan import StrokePlan
+
+
+def test_event_bound_duration(gray_image):
+    plan = compile_plan(gray_image, 1, 200, "outline", 1.0)
+    est = estimate_job(plan, 0.002)
+    assert est["events"] == plan.event_count()
+    assert est["duration_s"] == pytest.approx(plan.event_count() * 0.002)
+    assert est["ink_px"] > 0 and est["travel_px"] > 0
+
+
+def test_pacing_bound_duration():
+    # One 100 px drag and one dot, 50 px of travel between them
+    plan = StrokePlan.from_polylines([[(0, 0), (100, 0)], [(100, 50)]], width=101, height=51)
+    est = estimate_job(plan, 0.0, rate=10)
+    assert est["ink_px"] == pytest.approx(100)
+    assert est["travel_px"] == pytest.approx(50)
+    # Each press inks one pixel before the drag
+    assert est["duration_s"] == pytest.approx((100 + 2) / 10)
+    assert estimate_job(plan, 0.0, rate=10, pace_travel=True)["duration_s"] == \
+        pytest.approx((100 + 2 + 50) / 10)
+    # Slow events win over a fast pacing rate
+    assert estimate_job(plan, 1.0, rate=1e6)["duration_s"] == pytest.approx(plan.event_count())
+
+
+def test_colour_switches_cost_a_click_each():
+    plan = StrokePlan.from_polylines([[(0, 0), (5, 0)], [(0, 2), (5, 2)], [(0, 4), (5, 4)]],
+                                     width=6, height=5, meta={"palette": [[0, 0, 0], [255, 0, 0]]})
+    plan.color = np.array([0, 1, 0], dtype=np.uint8)
+    est = estimate_job(plan, 0.0)
+    assert est["color_switches"] == plan.color_switches() == 3
+    assert est["events"] == plan.event_count() + 9
+
+
+@pytest.mark.parametrize("seconds, text", [
+    (44.6, "45 s"), (200, "3 min 20 s"), (7500, "2 h 05 min"),
+])
+def test_format_duration(seconds, text):
+    assert format_duration(seconds) == text
+
+
+def test_estimate_without_measuring_leaves_the_cursor_alone(gray_image, monkeypatch):
+    def calibrate(*args, **kwargs):
+        raise AssertionError("calibrated without the user's consent")
+
+    monkeypatch.setattr(start_point_page, "calibrate", calibrate)
+    page = SimpleNamespace(controller=SimpleNamespace(mask=None, img=gray_image))
+    params = {"backend": "pyautogui", "rate": 0, "step": 1, "threshold": 200, "mode": "rows"}
+    plan = compile_plan(gray_image, 1, 200, "rows", 1.0)
+    text = start_point_page.StartPointPage._estimate_text(page, plan, params, 0, 0,
+                                                          measure=False)
+    assert f"{plan.event_count():,} mouse events" in text
+    assert "duration unknown" in text
+
+    monkeypatch.setattr(start_point_page, "calibrate", lambda *args, **kwargs: 0.001)
+    text = start_point_page.StartPointPage._estimate_text(page, plan, params, 0, 0)
+    assert format_duration(plan.event_count() * 0.001) in text
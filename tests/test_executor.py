@@ -0,0 +1,20 @@
+# test_executor.py
+import numpy as np
+import pytest
+
+from core import render_plan
+from planner import compile_plan, dark_mask
+from stroke_plan import rasterize
+
+
+def test_rows_plan_is_pixel_exact(gray_image):
+    plan = compile_plan(gray_image, 1, 200, "rows", 1.0)
+    canvas = render_plan(plan)
+    assert np.array_equal(canvas.mask(), dark_mask(gray_image, 1, 200))
+
+
+@pytest.mark.parametrize("mode", ["rows", "outline", "skeleton"])
+@pytest.mark.parametrize("step", [1, 2])
+def test_rasterize_matches_canvas(gray_image, mode, step):
+    plan = compile_plan(gray_image, step, 200, mode, 1.0)
+    assert np.array_equal(rasterize(plan, (plan.height, plan.width)), render_plan(plan).mask())
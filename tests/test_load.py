@@ -0,0 +1,89 @@
+# test_load.py
+import numpy as np
+import pytest
+from PIL import Image
+
+import core
+from core import GrayResizer, load_and_prepare_image, plan_load, resize_gray
+
+
+@pytest.fixture
+def color_image(gray_image):
+    """An RGB version of the test image with a coloured gradient mixed in."""
+    g = np.asarray(gray_image).astype(np.int32)
+    yy, xx = np.mgrid[:g.shape[0], :g.shape[1]]
+    rgb = np.stack([g, (g + xx) % 256, np.clip(g - yy, 0, 255)], axis=2)
+    return Image.fromarray(rgb.astype(np.uint8), mode="RGB")
+
+
+def baseline(path, scale):
+    """What load_and_prepare_image did before the lean loading paths."""
+    img = Image.open(path).convert("L")
+    return np.asarray(img.resize((int(img.width * scale), int(img.height * scale))))
+
+
+@pytest.mark.parametrize("name, convert", [
+    ("palette.png", lambda im: im.quantize(32)),
+    ("palette.gif", lambda im: im.quantize(32)),
+    ("bilevel.png", lambda im: im.convert("1")),
+    ("alpha.png", lambda im: im.convert("LA")),
+])
+@pytest.mark.parametrize("scale", [0.3, 0.4, 0.5, 0.75, 1.0, 1.5])
+def test_non_rgb_modes_load_like_the_baseline(color_image, tmp_path, name, convert, scale):
+    path = str(tmp_path / name)
+    convert(color_image).save(path)
+    img = load_and_prepare_image(path, scale, report=None)
+    assert img.mode == "L"
+    assert np.array_equal(np.asarray(img), baseline(path, scale))
+    assert load_and_prepare_image(path, scale, mode="RGB", report=None).mode == "RGB"
+
+
+def test_shrunk_palette_image_keeps_its_gray_levels(color_image, tmp_path):
+    path = str(tmp_path / "palette.png")
+    color_image.quantize(32).save(path)
+    img = load_and_prepare_image(path, 0.75, report=None)
+    # A nearest-neighbour resize in "P" mode would leave only the palette's levels
+    assert len(np.unique(np.asarray(img))) > 32
+
+
+@pytest.mark.parametrize("size", [(48, 37), (160, 120), (97, 301), (333, 250)])
+def test_gray_resizer_bands_match_pillow(gray_image, size):
+    expected = np.asarray(gray_image.resize(size))
+    assert np.array_equal(np.asarray(resize_gray(gray_image, size)), expected)
+
+    resizer = GrayResizer(gray_image.size, size)
+    src = np.asarray(gray_image)
+    bands = []
+    for y0 in range(0, size[1], 7):
+        y1 = min(y0 + 7, size[1])
+        s0, s1 = resizer.source_span(y0, y1)
+        bands.append(resizer.rows(src[s0:s1], s0, y0, y1))
+    assert np.array_equal(np.concatenate(bands), expected)
+
+
+def test_plan_load_paths(color_image, tmp_path):
+    png, jpg = str(tmp_path / "a.png"), str(tmp_path / "a.jpg")
+    color_image.save(png)
+    color_image.save(jpg)
+    assert plan_load(jpg, 0.25)["path"] == "draft"
+    assert plan_load(jpg, 0.25)["factor"] == 4
+    assert plan_load(jpg, 1.0)["path"] == "full"
+    assert plan_load(png, 0.25)["path"] == "full"
+    # The estimate follows the output size when the decoder can shrink
+    assert plan_load(jpg, 0.25)["estimate"] < plan_load(png, 0.25)["estimate"]
+
+
+def test_draft_load_has_the_requested_size(color_image, tmp_path):
+    path = str(tmp_path / "a.jpg")
+    color_image.save(path)
+    img = load_and_prepare_image(path, 0.3, report=None)
+    assert img.size == (48, 36)
+    assert img.mode == "L"
+
+
+def test_over_the_limit_raises_before_decoding(color_image, tmp_path, monkeypatch):
+    path = str(tmp_path / "a.png")
+    color_image.save(path)
+    monkeypatch.setattr(core, "MAX_LOAD_MB", 0.01)
+    with pytest.raises(MemoryError):
+        load_and_prepare_image(path, 1.0, mode="RGB", report=None)
@@ -0,0 +1,80 @@
+# test_ordering.py
+import numpy as np
+import pytest
+
+from ordering import (
+    nearest_neighbour,
+    optimize_order,
+    reorder,
+    serpentine_rows,
+    travel_distance,
+    two_opt,
+)
+from planner import plan_image
+from stroke_plan import StrokePlan, rasterize
+
+
+def shuffled(plan, seed=0):
+    order = np.random.default_rng(seed).permutation(plan.num_strokes)
+    return reorder(plan, order)
+
+
+def drawn(plan):
+    return rasterize(plan, (plan.height, plan.width))
+
+
+def test_reorder_walks_reversed_strokes_backwards():
+    plan = StrokePlan.from_polylines([[(0, 0), (4, 0)], [(0, 2), (2, 3), (4, 2)]],
+                                     width=5, height=4)
+    out = reorder(plan, [1, 0], [True, False])
+    assert out.points.tolist() == [[4, 2], [2, 3], [0, 2], [0, 0], [4, 0]]
+    assert out.offsets.tolist() == [0, 3, 5]
+    assert np.array_equal(drawn(out), drawn(plan))
+
+
+def test_serpentine_alternates_row_direction(gray_image):
+    plan = plan_image(gray_image, 2, 200, "rows")
+    order, reverse = serpentine_rows(plan)
+    out = reorder(plan, order, reverse)
+    ys = out.points[out.offsets[:-1], 1]
+    assert np.all(np.diff(ys) >= 0)
+    rows = np.unique(ys)
+    for k, y in enumerate(rows[:6]):
+        xs = out.points[out.offsets[:-1], 0][ys == y]
+        assert np.all(np.diff(xs) >= 0) if k % 2 == 0 else np.all(np.diff(xs) <= 0)
+    assert travel_distance(out) < travel_distance(shuffled(plan))
+
+
+def test_nearest_neighbour_visits_every_stroke_once(gray_image):
+    plan = shuffled(plan_image(gray_image, 1, 200, "outline"))
+    order, reverse = nearest_neighbour(plan)
+    assert sorted(order.tolist()) == list(range(plan.num_strokes))
+    out = reorder(plan, order, reverse)
+    assert travel_distance(out) < travel_distance(plan) / 2
+    assert np.array_equal(drawn(out), drawn(plan))
+
+
+def test_two_opt_never_adds_travel(gray_image):
+    plan = shuffled(plan_image(gray_image, 1, 200, "outline"), seed=3)
+    out = two_opt(plan)
+    assert travel_distance(out) <= travel_distance(plan)
+    assert np.array_equal(drawn(out), drawn(plan))
+
+
+@pytest.mark.parametrize("mode", ["rows", "outline", "skeleton"])
+def test_optimize_order_keeps_the_drawing_and_records_travel(gray_image, mode):
+    plan = shuffled(plan_image(gray_image, 1, 200, mode))
+    out = optimize_order(plan)
+    assert np.array_equal(drawn(out), drawn(plan))
+    travel = out.meta["travel_px"]
+    assert travel["before"] == pytest.approx(travel_distance(plan), abs=0.1)
+    assert travel["after"] == pytest.approx(travel_distance(out), abs=0.1)
+    assert travel["after"] < travel["before"]
+
+
+def test_tiny_plans_are_left_alone():
+    empty = StrokePlan.from_polylines([], width=3, height=3)
+    assert optimize_order(empty).num_strokes == 0
+    one = StrokePlan.from_polylines([[(1, 1), (2, 2)]], width=3, height=3)
+    assert travel_distance(one) == 0.0
+    assert optimize_order(one).points.tolist() == [[1, 1], [2, 2]]
@@ -0,0 +1,116 @@
+# test_pacing.py
+import warnings
+
+import pytest
+
+import core
+import tracing
+from pacing import Pacer
+
+
+class FakeClock:
+    """A perf_counter stand-in that only moves when slept on or told to."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+
+    def sleep(seconds):
+        clock.now += seconds
+
+    monkeypatch.setattr(tracing, "timed_sleep", sleep)
+    return clock
+
+
+def test_holds_the_rate(clock):
+    pacer = Pacer(50, clock=clock)
+    pacer.start()
+    for _ in range(100):
+        pacer.advance(1.0)
+    assert clock.now == pytest.approx(2.0)
+    assert pacer.slept == pytest.approx(2.0)
+
+
+def test_short_waits_are_batched(clock):
+    pacer = Pacer(1000, clock=clock)
+    pacer.start()
+    pacer.advance(1.0)  # 1 ms ahead: not worth a sleep yet
+    assert clock.now == 0.0
+    pacer.advance(1.0)
+    assert clock.now == pytest.approx(0.002)
+
+
+def test_travel_is_free_unless_paced(clock):
+    pacer = Pacer(10, clock=clock)
+    pacer.start()
+    pacer.advance(100.0, drawing=False)
+    assert clock.now == 0.0
+
+    pacer = Pacer(10, pace_travel=True, clock=clock)
+    pacer.start()
+    pacer.advance(100.0, drawing=False)
+    assert clock.now == pytest.approx(10.0)
+
+
+def test_event_unit(clock):
+    pacer = Pacer(100, unit="events", clock=clock)
+    pacer.start()
+    for _ in range(50):
+        pacer.advance(37.0)
+    assert clock.now == pytest.approx(0.5)
+
+
+def test_stall_is_forgiven_not_repaid(clock):
+    pacer = Pacer(100, clock=clock)
+    pacer.start()
+    clock.now += 10.0  # e.g. the target application hung
+    pacer.advance(1.0)
+    assert pacer.deadline == pytest.approx(clock.now - Pacer.MAX_LAG)
+    # Only MAX_LAG worth of moves go out unpaced before sleeping again
+    for _ in range(int(Pacer.MAX_LAG * 100) + 5):
+        pacer.advance(1.0)
+    assert pacer.slept > 0
+
+
+def test_inactive_rates():
+    assert not Pacer(0).active
+    assert not Pacer(-1).active
+    with pytest.raises(ValueError):
+        Pacer(10, unit="strokes")
+
+
+@pytest.fixture
+def drawn(monkeypatch):
+    """The rate draw_image_with_mouse hands to the executor."""
+    calls = {}
+
+    def execute_plan(plan, start_x, start_y, rate=0, backend=None):
+        calls["rate"] = rate
+
+    monkeypatch.setattr(core, "execute_plan", execute_plan)
+    return calls
+
+
+@pytest.mark.parametrize("step, delay", [(1, 0.01), (3, 0.002)])
+def test_delay_becomes_the_old_per_pixel_speed(gray_image, drawn, step, delay):
+    with pytest.warns(DeprecationWarning):
+        core.draw_image_with_mouse(gray_image, 0, 0, step, 200, delay)
+    # The old loop advanced the pen `step` px per sampled pixel and paused after each
+    assert drawn["rate"] == pytest.approx(step / delay)
+
+
+def test_zero_delay_is_unpaced_and_not_deprecated(gray_image, drawn):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        core.draw_image_with_mouse(gray_image, 0, 0, 1, 200, 0)
+        core.draw_image_with_mouse(gray_image, 0, 0, 1, 200, rate=300)
+    assert drawn["rate"] == 300
+    core.draw_image_with_mouse(gray_image, 0, 0, 1, 200, 0)
+    assert drawn["rate"] == 0
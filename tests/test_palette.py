@@ -0,0 +1,67 @@
+# test_palette.py
+import numpy as np
+import pytest
+from PIL import Image
+
+from ordering import reorder
+from palette import compile_palette_plan, kmeans, paper_color, quantize
+from stroke_plan import rasterize
+
+WHITE, RED, BLUE, YELLOW, BLACK = (255, 255, 255), (200, 30, 30), (20, 40, 180), \
+    (240, 220, 20), (0, 0, 0)
+
+
+@pytest.fixture
+def poster():
+    """White paper with four blocks of flat colour."""
+    arr = np.full((60, 80, 3), 255, dtype=np.uint8)
+    arr[5:25, 5:35] = RED
+    arr[5:25, 45:75] = BLUE
+    arr[35:55, 5:35] = YELLOW
+    arr[35:55, 45:75] = BLACK
+    return Image.fromarray(arr, mode="RGB")
+
+
+def test_kmeans_finds_flat_colours(poster):
+    pixels = np.asarray(poster).reshape(-1, 3)
+    centers = np.rint(kmeans(pixels, 5)).astype(int)
+    assert sorted(map(tuple, centers.tolist())) == sorted([WHITE, RED, BLUE, YELLOW, BLACK])
+    # Never more centres than distinct colours
+    assert len(kmeans(pixels, 12)) == 5
+
+
+def test_quantize_labels_the_step_grid(poster):
+    labels, palette = quantize(poster, 5, step=3)
+    assert labels.shape == (20, 27)
+    rgb = np.asarray(poster)[::3, ::3]
+    assert np.array_equal(palette[labels], rgb)
+
+
+def test_paper_is_the_colour_nearest_white():
+    palette = np.array([BLACK, YELLOW, WHITE], dtype=np.uint8)
+    assert paper_color(palette, 200) == 2
+    # Yellow is nearest white here, and light enough to count as paper at 200
+    assert paper_color(np.array([BLACK, YELLOW], dtype=np.uint8), 200) == 1
+    assert paper_color(np.array([BLACK, YELLOW], dtype=np.uint8), 240) is None
+    assert paper_color(np.zeros((0, 3), dtype=np.uint8), 200) is None
+
+
+@pytest.mark.parametrize("mode", ["rows", "outline"])
+def test_each_colour_is_picked_once(poster, mode):
+    plan = compile_palette_plan(poster, 5, 1, 200, mode)
+    drawn = [tuple(c) for c in plan.meta["palette"]]
+    assert WHITE not in drawn and len(drawn) == 4
+    assert plan.meta["paper_colors"] == 1
+    assert plan.color_switches() == plan.meta["color_switches"] == 4
+    # Lightest first, so darker detail lands on top
+    luma = [0.299 * r + 0.587 * g + 0.114 * b for r, g, b in drawn]
+    assert luma == sorted(luma, reverse=True)
+
+
+def test_rows_layers_ink_exactly_their_colour(poster):
+    plan = compile_palette_plan(poster, 5, 1, 200, "rows")
+    rgb = np.asarray(poster)
+    for index, color in enumerate(plan.meta["palette"]):
+        layer = reorder(plan, np.flatnonzero(plan.color == index))
+        ink = rasterize(layer, (plan.height, plan.width))
+        assert np.array_equal(ink, (rgb == color).all(axis=2))
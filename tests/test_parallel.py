@@ -0,0 +1,63 @@
+# test_parallel.py
+import os
+
+import numpy as np
+import pytest
+
+import parallel
+from planner import compile_plan, iter_plan_bands, plan_image
+
+
+@pytest.fixture
+def always_parallel(monkeypatch):
+    # The test image is far below the size where the pool pays off
+    monkeypatch.setattr(parallel, "MIN_PARALLEL_PIXELS", 0)
+
+
+@pytest.mark.parametrize("mode", ["rows", "outline"])
+def test_plan_image_parallel_matches_serial(gray_image, always_parallel, mode):
+    for step in (1, 3):
+        serial = plan_image(gray_image, step, 200, mode)
+        par = parallel.plan_image_parallel(gray_image, step, 200, mode, workers=2)
+        assert np.array_equal(par.points, serial.points)
+        assert np.array_equal(par.offsets, serial.offsets)
+
+
+def test_compile_plan_parallel_matches_serial(gray_image, always_parallel):
+    serial = compile_plan(gray_image, 1, 200, "outline", 1.0)
+    par = parallel.compile_plan_parallel(gray_image, 1, 200, "outline", 1.0, workers=2)
+    assert np.array_equal(par.points, serial.points)
+    assert np.array_equal(par.offsets, serial.offsets)
+
+
+@pytest.mark.parametrize("mode", ["rows", "skeleton"])
+def test_band_pool_matches_serial_bands(gray_image, always_parallel, mode):
+    serial = list(iter_plan_bands(gray_image, 2, 200, mode, 1.0, band_rows=32))
+    par = list(parallel.iter_plan_bands_parallel(gray_image, 2, 200, mode, 1.0,
+                                                 band_rows=32, workers=2))
+    assert len(par) == len(serial)
+    for a, b in zip(par, serial):
+        assert np.array_equal(a.points, b.points)
+        assert np.array_equal(a.offsets, b.offsets)
+        assert a.meta == b.meta
+
+
+def test_small_images_skip_the_pool(gray_image, monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("started a process pool for a small image")
+
+    monkeypatch.setattr(parallel, "process_pool", no_pool)
+    serial = plan_image(gray_image, 1, 200, "rows")
+    assert np.array_equal(parallel.plan_image_parallel(gray_image, 1, 200, workers=4).points,
+                          serial.points)
+    assert len(list(parallel.iter_plan_bands_parallel(gray_image, 1, 200, workers=4))) > 0
+
+
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="needs POSIX shared memory")
+def test_stopping_early_releases_shared_memory(gray_image, always_parallel):
+    before = set(os.listdir("/dev/shm"))
+    bands = parallel.iter_plan_bands_parallel(gray_image, 1, 200, "rows", band_rows=16,
+                                              workers=2)
+    next(bands)
+    bands.close()
+    assert set(os.listdir("/dev/shm")) <= before
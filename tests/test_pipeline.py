@@ -0,0 +1,92 @@
+# test_pipeline.py
+import threading
+
+import numpy as np
+import pytest
+
+from core import estimate_job, estimate_stream
+from pipeline import prefetch
+from plan_cache import PlanCache
+from planner import iter_plan_bands
+from stroke_plan import StrokePlan, StrokePlanWriter
+
+
+def test_prefetch_yields_everything_in_order():
+    assert list(prefetch(iter(range(100)), maxsize=3)) == list(range(100))
+
+
+def test_prefetch_reraises_producer_errors():
+    def produce():
+        yield 1
+        raise ValueError("planner failed")
+
+    items = prefetch(produce())
+    assert next(items) == 1
+    with pytest.raises(ValueError, match="planner failed"):
+        next(items)
+
+
+def test_prefetch_stops_the_producer_when_the_consumer_stops():
+    produced = []
+    finished = threading.Event()
+
+    def produce():
+        try:
+            for i in range(1000):
+                produced.append(i)
+                yield i
+        finally:
+            finished.set()
+
+    items = prefetch(produce(), maxsize=2)
+    assert next(items) == 0
+    items.close()
+    assert finished.wait(5)
+    # The producer never runs more than the buffer ahead
+    assert len(produced) < 10
+
+
+def test_writer_matches_concatenate(gray_image, tmp_path):
+    bands = list(iter_plan_bands(gray_image, 1, 200, "outline", 1.0, band_rows=32))
+    meta = {"mode": "outline"}
+    full = StrokePlan.concatenate(bands, width=gray_image.width, height=gray_image.height,
+                                  meta=meta)
+    path = str(tmp_path / "bands.gbplan")
+    writer = StrokePlanWriter(path, gray_image.width, gray_image.height, meta)
+    for band in bands:
+        writer.append(band)
+    writer.close()
+    with open(path, "rb") as f:
+        assert f.read() == full.to_bytes()
+
+
+def test_cache_writer_publishes_on_commit_only(gray_image, tmp_path):
+    cache = PlanCache(str(tmp_path))
+    bands = list(iter_plan_bands(gray_image, 2, 200, "rows", 1.0, band_rows=32))
+
+    writer = cache.writer("k", gray_image.width, gray_image.height)
+    writer.append(bands[0])
+    writer.discard()
+    assert cache.get("k") is None
+
+    writer = cache.writer("k", gray_image.width, gray_image.height)
+    for band in bands:
+        writer.append(band)
+        assert cache.get("k") is None
+    writer.commit({"mode": "rows"})
+    plan = cache.get("k")
+    assert np.array_equal(plan.points, np.concatenate([b.points for b in bands]))
+    assert plan.meta == {"mode": "rows"}
+
+
+@pytest.mark.parametrize("mode", ["rows", "outline"])
+def test_estimate_stream_matches_the_whole_plan(gray_image, mode):
+    bands = list(iter_plan_bands(gray_image, 1, 200, mode, 1.0, band_rows=32))
+    full = StrokePlan.concatenate(bands, width=gray_image.width, height=gray_image.height)
+    for rate in (0, 50):
+        streamed = estimate_stream(iter(bands), 0.001, rate, pace_travel=True)
+        whole = estimate_job(full, 0.001, rate, pace_travel=True)
+        assert streamed["events"] == whole["events"]
+        assert streamed["ink_px"] == pytest.approx(whole["ink_px"])
+        assert streamed["travel_px"] == pytest.approx(whole["travel_px"])
+        assert streamed["duration_s"] == pytest.approx(whole["duration_s"])
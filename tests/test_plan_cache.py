@@ -0,0 +1,76 @@
+# test_plan_cache.py
+import os
+import shutil
+
+import numpy as np
+
+from plan_cache import PlanCache
+from planner import compile_plan
+
+PARAMS = {"scale": 1.0, "step": 2, "threshold": 200, "mode": "rows", "tolerance": 1.0,
+          "colors": 0, "rate": 100}
+
+
+def same_plan(a, b):
+    return (np.array_equal(a.points, b.points) and np.array_equal(a.offsets, b.offsets)
+            and np.array_equal(a.pen, b.pen) and a.meta == b.meta)
+
+
+def test_keys_follow_content_and_planning_params(gray_image, tmp_path):
+    cache = PlanCache(str(tmp_path / "cache"))
+    a, b = str(tmp_path / "a.png"), str(tmp_path / "renamed.png")
+    gray_image.save(a)
+    shutil.copy(a, b)
+    assert cache.key(a, PARAMS) == cache.key(b, PARAMS)
+    # The drawing rate doesn't change the plan
+    assert cache.key(a, PARAMS) == cache.key(a, dict(PARAMS, rate=5))
+    assert cache.key(a, PARAMS) != cache.key(a, dict(PARAMS, step=1))
+
+    gray_image.transpose(0).save(b)
+    assert cache.key(a, PARAMS) != cache.key(b, PARAMS)
+
+
+def test_put_get_and_stats(gray_image, tmp_path):
+    cache = PlanCache(str(tmp_path))
+    plan = compile_plan(gray_image, 2, 200)
+    assert cache.get("k") is None
+    cache.put("k", plan)
+    assert same_plan(cache.get("k"), plan)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_least_recently_used_entries_are_evicted(gray_image, tmp_path):
+    plan = compile_plan(gray_image, 1, 200)
+    probe = PlanCache(str(tmp_path / "probe"))
+    probe.put("x", plan)
+    size = probe.stats()["bytes"]
+
+    cache = PlanCache(str(tmp_path / "cache"), max_bytes=int(size * 2.5))
+    cache.put("a", plan)
+    cache.put("b", plan)
+    # Give the entries distinct ages, then touch "a" so "b" is the oldest
+    for age, key in enumerate(("b", "a")):
+        os.utime(cache._entry_path(key), (1000 + age, 1000 + age))
+    assert cache.get("a") is not None
+    cache.put("c", plan)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_drops_corrupt_entries(gray_image, tmp_path):
+    cache = PlanCache(str(tmp_path))
+    plan = compile_plan(gray_image, 2, 200)
+    cache.put("k", plan)
+    assert same_plan(cache.get("k"), plan)
+
+    entry = cache._entry_path("k")
+    with open(entry, "rb") as f:
+        data = f.read()
+    with open(entry, "wb") as f:
+        f.write(data[:len(data) // 2])
+    assert cache.get("k") is None
+    assert not os.path.exists(entry)
+    assert cache.stats()["misses"] == 1
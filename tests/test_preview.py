@@ -0,0 +1,43 @@
+# test_preview.py
+import numpy as np
+import pytest
+
+from core import render_plan
+from planner import plan_image, preview_mask
+
+
+def test_native_rows_preview_is_the_drawing(gray_image):
+    gray = np.asarray(gray_image)
+    for step in (1, 2, 3):
+        plan = plan_image(gray_image, step, 200, "rows")
+        view, strokes = preview_mask(gray, gray_image.size, step, 200, "rows")
+        assert np.array_equal(view, render_plan(plan).mask())
+        assert strokes == plan.num_strokes
+
+
+@pytest.mark.parametrize("mode", ["outline", "skeleton"])
+def test_native_traced_preview_counts_strokes(gray_image, mode):
+    gray = np.asarray(gray_image)
+    view, strokes = preview_mask(gray, gray_image.size, 1, 200, mode)
+    plan = plan_image(gray_image, 1, 200, mode)
+    assert strokes == plan.num_strokes
+    assert np.array_equal(view, render_plan(plan).mask())
+
+
+def test_shrunk_preview_scales_the_row_count(gray_image):
+    # The drawing is twice the preview's size: every other row is folded away
+    gray = np.asarray(gray_image)
+    big = gray_image.resize((320, 240))
+    view, strokes = preview_mask(gray, big.size, 1, 200, "rows")
+    assert view.shape == gray.shape
+    assert strokes == pytest.approx(plan_image(big, 1, 200, "rows").num_strokes, rel=0.05)
+
+    # Traced counts depend on how lines split and aren't guessed
+    _, strokes = preview_mask(gray, big.size, 1, 200, "outline")
+    assert strokes is None
+
+
+def test_empty_drawing():
+    view, strokes = preview_mask(np.zeros((10, 12), dtype=np.uint8), (0, 0), 1, 200)
+    assert view.shape == (10, 12) and not view.any()
+    assert strokes == 0
@@ -0,0 +1,59 @@
+# test_simplify.py
+import numpy as np
+import pytest
+
+from planner import plan_image
+from simplify import rdp_keep_mask, rdp_plan_keep_mask, simplify_plan
+
+
+@pytest.fixture
+def traced(gray_image):
+    return plan_image(gray_image, 1, 200, "outline")
+
+
+def segment_distance(p, a, b):
+    """Distance from points p to the segment a -> b."""
+    ab = b - a
+    denom = float(ab @ ab)
+    t = np.zeros(len(p)) if denom == 0 else np.clip((p - a) @ ab / denom, 0, 1)
+    return np.hypot(*(p - (a + t[:, None] * ab)).T)
+
+
+@pytest.mark.parametrize("tolerance", [0.5, 1.0, 2.5])
+def test_dropped_vertices_stay_within_tolerance(traced, tolerance):
+    keep = rdp_plan_keep_mask(traced, tolerance)
+    pts = traced.points.astype(np.float64)
+    for lo, hi in zip(traced.offsets[:-1], traced.offsets[1:]):
+        kept = lo + np.flatnonzero(keep[lo:hi])
+        assert kept[0] == lo and kept[-1] == hi - 1
+        for a, b in zip(kept[:-1], kept[1:]):
+            if b - a > 1:
+                assert segment_distance(pts[a + 1:b], pts[a], pts[b]).max() <= tolerance + 1e-9
+
+
+def test_plan_mask_matches_per_stroke_rdp(traced):
+    keep = rdp_plan_keep_mask(traced, 1.5)
+    for lo, hi in zip(traced.offsets[:-1], traced.offsets[1:]):
+        assert np.array_equal(keep[lo:hi], rdp_keep_mask(traced.points[lo:hi], 1.5))
+
+
+def test_larger_tolerance_keeps_fewer_points(traced):
+    counts = [simplify_plan(traced, t).num_points for t in (0.5, 1, 2, 4)]
+    assert counts == sorted(counts, reverse=True)
+    assert counts[0] < traced.num_points
+
+
+def test_simplified_plan_keeps_its_strokes(traced):
+    out = simplify_plan(traced, 1.0)
+    assert out.num_strokes == traced.num_strokes
+    assert np.array_equal(out.pen, traced.pen)
+    assert out.meta["simplified"] == {"tolerance": 1.0,
+                                      "removed": traced.num_points - out.num_points,
+                                      "points": traced.num_points}
+
+
+def test_zero_tolerance_is_a_no_op(traced):
+    assert simplify_plan(traced, 0) is traced
+    # Straight runs still lose their collinear interior points at any tolerance
+    line = np.array([[0, 0], [1, 0], [2, 0], [3, 0]])
+    assert rdp_keep_mask(line, 0).tolist() == [True, False, False, True]
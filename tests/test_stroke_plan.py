@@ -0,0 +1,76 @@
+# test_stroke_plan.py
+import numpy as np
+
+from planner import compile_plan
+from stroke_plan import PEN_DOWN, PEN_UP, StrokePlan
+
+
+def assert_same_plan(a: StrokePlan, b: StrokePlan):
+    assert np.array_equal(a.points, b.points)
+    assert np.array_equal(a.offsets, b.offsets)
+    assert np.array_equal(a.pen, b.pen)
+    assert (a.color is None) == (b.color is None)
+    if a.color is not None:
+        assert np.array_equal(a.color, b.color)
+    assert (a.width, a.height) == (b.width, b.height)
+    assert a.meta == b.meta
+
+
+def test_round_trip(gray_image):
+    for mode in ("rows", "outline", "skeleton"):
+        plan = compile_plan(gray_image, 1, 200, mode, 1.0)
+        assert_same_plan(StrokePlan.from_bytes(plan.to_bytes()), plan)
+
+
+def test_round_trip_color_and_empty(tmp_path):
+    plan = StrokePlan.from_polylines([[(0, 0), (5, 5)], [(3, 1)], [(9, 2), (1, 2), (1, 8)]],
+                                     width=10, height=10, meta={"palette": [[255, 0, 0]]})
+    plan.color = np.array([0, 0, 0], dtype=np.uint8)
+    path = str(tmp_path / "plan.gbplan")
+    plan.save(path)
+    assert_same_plan(StrokePlan.load(path), plan)
+
+    empty = StrokePlan.from_polylines([], width=3, height=4)
+    assert_same_plan(StrokePlan.from_bytes(empty.to_bytes()), empty)
+
+
+def test_event_count_and_slice():
+    plan = StrokePlan.from_polylines([[(0, 0), (4, 0)], [(2, 2)], [(1, 1), (1, 5), (3, 5)]],
+                                     width=8, height=8)
+    plan.pen[1] = PEN_UP
+    # Down strokes: one move per point plus press and release; up strokes: moves only
+    assert plan.event_count() == (2 + 2) + 1 + (3 + 2)
+
+    rest = plan.slice(1)
+    assert rest.num_strokes == 2
+    assert np.array_equal(rest.stroke(0), [[2, 2]])
+    assert np.array_equal(rest.stroke(1), plan.stroke(2))
+    assert list(rest.pen) == [PEN_UP, PEN_DOWN]
+    assert plan.slice(3).num_strokes == 0
+    assert plan.slice(2, 1).num_strokes == 0
+
+
+def test_concatenate_shifts_offsets(gray_image):
+    plan = compile_plan(gray_image, 1, 200, "outline", 1.0)
+    half = plan.num_strokes // 2
+    joined = StrokePlan.concatenate([plan.slice(0, half), plan.slice(half)])
+    assert_same_plan(joined, plan)
+    assert [len(p) for p in joined.polylines()] == list(np.diff(plan.offsets))
+    assert StrokePlan.concatenate([], width=5, height=6).num_strokes == 0
+
+
+def test_color_switches_and_svg():
+    plan = StrokePlan.from_polylines([[(0, 0), (5, 0)], [(1, 1), (1, 4)], [(3, 3)]],
+                                     width=6, height=6,
+                                     meta={"palette": [[255, 0, 0], [0, 0, 255]]})
+    assert plan.color_switches() == 0
+    plan.color = np.array([0, 0, 1], dtype=np.uint8)
+    assert plan.color_switches() == 2
+
+    svg = plan.to_svg()
+    assert svg.count("<polyline") == 2
+    assert 'points="0,0 5,0" stroke="#ff0000"' in svg
+    assert '<circle cx="3" cy="3"' in svg and 'fill="#0000ff"' in svg
+
+    plan.pen[0] = PEN_UP
+    assert plan.to_svg().count("<polyline") == 1
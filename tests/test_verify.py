@@ -0,0 +1,62 @@
+# test_verify.py
+import numpy as np
+import pytest
+
+from backends import SimulatedCanvasBackend
+from core import execute_plan, execute_stream, render_plan
+from planner import compile_plan, iter_plan_bands
+from verify import verify_and_repair, verify_bands
+
+
+def draw(plan, drop_rate, seed=3):
+    canvas = SimulatedCanvasBackend(plan.width, plan.height, drop_rate=drop_rate, seed=seed)
+    execute_plan(plan, 0, 0, backend=canvas, report=None)
+    return canvas
+
+
+@pytest.mark.parametrize("mode", ["rows", "outline", "skeleton"])
+def test_dropped_events_are_found_and_repaired(gray_image, mode):
+    plan = compile_plan(gray_image, 1, 200, mode, 1.0)
+    canvas = draw(plan, drop_rate=0.05)
+    assert canvas.dropped > 0
+
+    stats = verify_and_repair(plan, 0, 0, canvas, passes=5, report=None)
+    expected = render_plan(plan).mask()
+    assert stats["expected_px"] == expected.sum()
+    assert stats["missing_px"][0] > 0
+    # Each pass leaves fewer pixels missing, and the last check finds none
+    assert all(a > b for a, b in zip(stats["missing_px"], stats["missing_px"][1:]))
+    assert stats["missing_px"][-1] == 0
+    assert stats["repair_events"] < plan.event_count()
+    assert canvas.mask()[expected].all()
+    # A dropped move mid-drag inks a stray line, which is reported, not undone
+    assert stats["extra_px"] == (canvas.mask() & ~expected).sum()
+
+
+def test_complete_drawing_is_pixel_exact(gray_image):
+    plan = compile_plan(gray_image, 2, 200, "outline", 1.0)
+    canvas = draw(plan, drop_rate=0)
+    stats = verify_and_repair(plan, 0, 0, canvas, passes=3, report=None)
+    assert stats["missing_px"] == [0]
+    assert stats["passes"] == stats["repair_strokes"] == 0
+    assert np.array_equal(canvas.mask(), render_plan(plan).mask())
+
+
+def test_verify_bands_repairs_each_band(gray_image):
+    def bands():
+        return iter_plan_bands(gray_image, 1, 200, "outline", 1.0, band_rows=32)
+
+    canvas = SimulatedCanvasBackend(*gray_image.size, origin_x=10, origin_y=20,
+                                    drop_rate=0.05, seed=5)
+    execute_stream(bands(), 10, 20, backend=canvas, report=None)
+    canvas.drop_rate = 0
+
+    lines = []
+    stats = verify_bands(bands(), 10, 20, canvas, passes=2, report=lines.append)
+    assert stats["missing_px"][0] > 0
+    assert stats["missing_px"][1] == 0
+    assert len(lines) == 1 and "after" in lines[0]
+
+    expected = SimulatedCanvasBackend(*gray_image.size, origin_x=10, origin_y=20)
+    execute_stream(bands(), 10, 20, backend=expected, report=None)
+    assert canvas.mask()[expected.mask()].all()
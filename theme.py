@@ -0,0 +1,30 @@
+# theme.py
+# Colours and fonts only: imported before the window opens, so keep it
+# free of imaging and drawing dependencies.
+
+# =======================
+# STYLE CONSTANTS
+# =======================
+
+APP_BG = "#1e1e1e"
+CARD_BG = "#252526"
+TEXT_FG = "#ffffff"
+SUBTLE_FG = "#bbbbbb"
+ACCENT_FG = "#3fa9f5"
+
+BLUE = "#0065a8"
+
+# =======================
+# GLOBAL FONT SETTINGS
+# =======================
+
+# Change this single line to swap fonts app-wide
+FONT_FAMILY = "Snowstorm"
+
+PG_NAME        = (FONT_FAMILY, 40, "bold")
+FONT_TITLE     = (FONT_FAMILY, 25, "bold")
+FONT_LABEL     = (FONT_FAMILY, 20)
+FONT_BUTTON    = (FONT_FAMILY, 16, "bold")
+FONT_ENTRY     = (FONT_FAMILY, 15)
+FONT_STATUS    = (FONT_FAMILY, 20)
+FONT_COUNTDOWN = (FONT_FAMILY, 100, "bold")
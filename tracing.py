@@ -0,0 +1,237 @@
+# tracing.py
+"""
+Low-overhead instrumentation for the load, plan and draw phases.
+
+Turn it on with GHOSTBRUSH_TRACE=1 (or tracing.enable()). When it is off,
+span() hands back a shared no-op context manager and the executor does not
+wrap its backend, so the hot path is untouched.
+
+GHOSTBRUSH_TRACE_FILE sets where flush() writes the Chrome trace-event JSON
+(open it in chrome://tracing or https://ui.perfetto.dev).
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+from backends import OutputBackend
+
+ENABLED = os.environ.get("GHOSTBRUSH_TRACE", "").lower() not in ("", "0", "false", "no")
+TRACE_FILE = os.environ.get("GHOSTBRUSH_TRACE_FILE", "ghostbrush_trace.json")
+
+_lock = threading.Lock()
+_events = []                         # Chrome "complete" events
+_counters = Counter()                # name -> count
+_phase_ns = Counter()                # span name -> total ns
+_latency = defaultdict(Counter)      # call name -> {log2(ns) bucket: count}
+_latency_total = Counter()           # call name -> total ns
+_latency_max = Counter()             # call name -> max ns
+_T0 = time.perf_counter_ns()
+
+
+# =======================
+# SPANS & COUNTERS
+# =======================
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        event = {
+            "name": self.name,
+            "cat": "phase",
+            "ph": "X",
+            "ts": (self.start - _T0) / 1000,
+            "dur": (end - self.start) / 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if self.args:
+            event["args"] = self.args
+        with _lock:
+            _events.append(event)
+            _phase_ns[self.name] += end - self.start
+        return False
+
+
+def span(name: str, **args):
+    """Context manager timing one phase; free when tracing is disabled."""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def count(name: str, n: int = 1) -> None:
+    if ENABLED:
+        with _lock:
+            _counters[name] += n
+
+
+def record_latency(name: str, ns: int) -> None:
+    """Add one call duration to the log2 histogram for `name`."""
+    with _lock:
+        _latency[name][ns.bit_length()] += 1
+        _latency_total[name] += ns
+        if ns > _latency_max[name]:
+            _latency_max[name] = ns
+
+
+def enable(flag: bool = True) -> None:
+    """Switch tracing on or off at runtime (the setting behind GHOSTBRUSH_TRACE)."""
+    global ENABLED
+    ENABLED = flag
+
+
+def reset() -> None:
+    with _lock:
+        _events.clear()
+        _counters.clear()
+        _phase_ns.clear()
+        _latency.clear()
+        _latency_total.clear()
+        _latency_max.clear()
+
+
+# =======================
+# BACKEND WRAPPER
+# =======================
+
+class TracedBackend(OutputBackend):
+    """Forwards to another backend and times every output call."""
+
+    def __init__(self, inner: OutputBackend):
+        self.inner = inner
+        self.name = inner.name
+
+    def begin(self):
+        self.inner.begin()
+
+    def end(self):
+        self.inner.end()
+
+    def _timed(self, name, fn, *args):
+        t0 = time.perf_counter_ns()
+        try:
+            return fn(*args)
+        finally:
+            record_latency(name, time.perf_counter_ns() - t0)
+
+    def move_to(self, x, y):
+        self._timed("move_to", self.inner.move_to, x, y)
+
+    def mouse_down(self):
+        self._timed("mouse_down", self.inner.mouse_down)
+
+    def mouse_up(self):
+        self._timed("mouse_up", self.inner.mouse_up)
+
+    def capture(self, left, top, width, height):
+        return self.inner.capture(left, top, width, height)
+
+    def pause_requested(self):
+        return self.inner.pause_requested()
+
+    def __getattr__(self, attr):
+        # Backend-specific extras (canvas, events, ...) stay reachable
+        return getattr(self.inner, attr)
+
+
+def traced_backend(backend: OutputBackend) -> OutputBackend:
+    return TracedBackend(backend) if ENABLED else backend
+
+
+def timed_sleep(seconds: float) -> None:
+    """time.sleep that also records how long it actually slept when tracing."""
+    if not ENABLED:
+        time.sleep(seconds)
+        return
+    t0 = time.perf_counter_ns()
+    time.sleep(seconds)
+    record_latency("sleep", time.perf_counter_ns() - t0)
+
+
+# =======================
+# EXPORT
+# =======================
+
+def _percentile(buckets: Counter, q: float) -> int:
+    """Upper bound (ns) of the log2 bucket holding the q-th quantile."""
+    total = sum(buckets.values())
+    seen = 0
+    for bucket in sorted(buckets):
+        seen += buckets[bucket]
+        if seen >= q * total:
+            return 1 << bucket
+    return 0
+
+
+def chrome_trace() -> dict:
+    with _lock:
+        events = list(_events)
+        counters = dict(_counters)
+    pid = os.getpid()
+    ts = (time.perf_counter_ns() - _T0) / 1000
+    for name, value in counters.items():
+        events.append({"name": name, "ph": "C", "ts": ts, "pid": pid,
+                       "args": {name: value}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def summary() -> str:
+    with _lock:
+        lines = ["Phase timings:"]
+        for name, ns in _phase_ns.most_common():
+            lines.append(f"  {name:<12} {ns / 1e6:10.1f} ms")
+        if _counters:
+            lines.append("Counters:")
+            for name, value in sorted(_counters.items()):
+                lines.append(f"  {name:<12} {value}")
+        if _latency:
+            lines.append("Call latency (p50 / p99 are log2 bucket upper bounds):")
+            for name in sorted(_latency):
+                buckets = _latency[name]
+                calls = sum(buckets.values())
+                mean_us = _latency_total[name] / calls / 1000
+                lines.append(
+                    f"  {name:<12} n={calls:<8} mean={mean_us:8.1f}us "
+                    f"p50<={_percentile(buckets, 0.5) / 1000:.1f}us "
+                    f"p99<={_percentile(buckets, 0.99) / 1000:.1f}us "
+                    f"max={_latency_max[name] / 1000:.1f}us"
+                )
+    return "\n".join(lines)
+
+
+def flush(path: str = None) -> None:
+    """Write the Chrome trace and print the summary (no-op when disabled)."""
+    if not ENABLED:
+        return
+    path = path or TRACE_FILE
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(chrome_trace(), f)
+    print(summary())
+    print(f"Trace written to {path}")
+
+
+atexit.register(flush)
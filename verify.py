@@ -0,0 +1,303 @@
+# verify.py
+"""
+Closed-loop verification: capture the drawn area, redraw what is missing.
+
+    python verify.py input.png --drop-rate 0.03 --passes 3
+    python verify.py input.png --step 2 --mode outline --drop-rate 0.1 --seed 7
+
+Target applications under load drop or coalesce synthetic events, which
+leaves gaps. After a drawing, verify_and_repair() captures only the drawn
+rectangle through the backend, compares it with the plan's expected pixels
+and redraws the pieces of the plan's strokes that cover the missing ones,
+up to `passes` times. The CLI replays a plan on a SimulatedCanvasBackend
+that drops events on purpose.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from ordering import optimize_order, reorder
+from planner import PLANNER_MODES, compile_plan
+from stroke_plan import StrokePlan, rasterize, stroke_pixels
+
+# =======================
+# COMPARISON
+# =======================
+
+def grow(mask: np.ndarray, px: int) -> np.ndarray:
+    """The mask dilated by `px` 4-connected steps."""
+    for _ in range(px):
+        grown = mask.copy()
+        grown[1:] |= mask[:-1]
+        grown[:-1] |= mask[1:]
+        grown[:, 1:] |= mask[:, :-1]
+        grown[:, :-1] |= mask[:, 1:]
+        mask = grown
+    return mask
+
+
+def ink_mask(gray: np.ndarray, threshold: int, slack: int = 0) -> np.ndarray:
+    """
+    Pixels of a capture dark enough to count as ink, grown by `slack` px so
+    a brush that lands a pixel off still covers its target.
+    """
+    return grow(gray < threshold, slack)
+
+
+def _layers(plan: StrokePlan):
+    """[(colour index or None, the strokes drawn in that colour)]."""
+    if plan.palette is None:
+        return [(None, plan)]
+    return [(int(k), reorder(plan, np.flatnonzero(plan.color == k)))
+            for k in np.unique(plan.color)]
+
+
+def expected_layers(plan: StrokePlan):
+    """[(colour index or None, bool mask of the pixels it should ink)]."""
+    shape = (plan.height, plan.width)
+    return [(color, rasterize(layer, shape)) for color, layer in _layers(plan)]
+
+
+# Unflagged segments a repair stroke runs through rather than lifting the
+# pen: each extra move is cheaper than the move, press and release of a new stroke
+REPAIR_JOIN_SEGMENTS = 2
+
+
+def _clip(a, b, t):
+    """
+    Pixel t of the segment a -> b, where redrawing a piece of the segment
+    inks exactly the same pixels (horizontal, vertical and 45 degree lines);
+    None for other slopes, which are redrawn whole.
+    """
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    if dx and dy and abs(dx) != abs(dy):
+        return None
+    n = max(abs(dx), abs(dy))
+    if n == 0:
+        return a
+    return [a[0] + dx * t // n, a[1] + dy * t // n]
+
+
+def _repair_spans(layer: StrokePlan, missing: np.ndarray):
+    """
+    Polylines that redraw the pieces of `layer`'s strokes over the missing
+    pixels: each stroke's segments that own a missing pixel, neighbouring
+    ones joined, with the first and last trimmed to the missing pixels
+    where that inks nothing new.
+    """
+    xs, ys, vertex, t = stroke_pixels(layer)
+    h, w = missing.shape
+    inside = np.flatnonzero((xs >= 0) & (xs < w) & (ys >= 0) & (ys < h))
+    # One owner per pixel (the last segment to pass over it)
+    owner = np.full((h, w), -1, dtype=np.int64)
+    owner[ys[inside], xs[inside]] = inside
+    hits = owner[missing]
+    hits = hits[hits >= 0]
+    if len(hits) == 0:
+        return []
+
+    # First and last missing pixel along every flagged segment
+    order = np.lexsort((t[hits], vertex[hits]))
+    hit_vertex, hit_t = vertex[hits][order], t[hits][order]
+    segs, first = np.unique(hit_vertex, return_index=True)
+    last = np.concatenate([first[1:], [len(hit_vertex)]]) - 1
+    t_lo, t_hi = hit_t[first], hit_t[last]
+    stroke_of = np.searchsorted(layer.offsets, segs, side="right") - 1
+
+    points = layer.points.tolist()
+    ends = layer.offsets[1:].tolist()
+    spans = []
+    chain = None  # [stroke, first vertex, t of first pixel, last vertex, t of last pixel]
+
+    def flush():
+        s, v0, lo, v1, hi = chain
+        if v1 + 1 >= ends[s]:  # the dot of a one-point stroke
+            spans.append([points[v0]])
+            return
+        start = _clip(points[v0], points[v0 + 1], lo) or points[v0]
+        end = _clip(points[v1], points[v1 + 1], hi) or points[v1 + 1]
+        span = [start] + points[v0 + 1:v1 + 1] + [end]
+        spans.append(span if span[0] != span[-1] or len(span) > 2 else span[:1])
+
+    for s, v, lo, hi in zip(stroke_of.tolist(), segs.tolist(), t_lo.tolist(), t_hi.tolist()):
+        if chain is not None and chain[0] == s and v - chain[3] - 1 <= REPAIR_JOIN_SEGMENTS:
+            chain[3], chain[4] = v, hi
+            continue
+        if chain is not None:
+            flush()
+        chain = [s, v, lo, v, hi]
+    flush()
+    return spans
+
+
+def repair_plan(plan: StrokePlan, missing_layers) -> StrokePlan:
+    """
+    Redraw the parts of the plan's own strokes that cover missing pixels,
+    in the plan's colours: whole segments for traced lines, trimmed to the
+    missing stretch on straight and diagonal ones such as row runs.
+    """
+    meta = {"mode": plan.meta.get("mode", "rows"), "step": 1, "repair": True}
+    if plan.palette is not None:
+        meta["palette"] = plan.palette
+    missing_by_color = dict(missing_layers)
+    layers = []
+    for color, layer in _layers(plan):
+        missing = missing_by_color.get(color)
+        if missing is None or not missing.any():
+            continue
+        spans = _repair_spans(layer, missing)
+        repair = StrokePlan.from_polylines(spans, width=plan.width, height=plan.height,
+                                           meta=dict(meta))
+        repair = optimize_order(repair)
+        if color is not None:
+            repair.color = np.full(repair.num_strokes, color, dtype=np.uint8)
+        layers.append(repair)
+    return StrokePlan.concatenate(layers, width=plan.width, height=plan.height, meta=meta)
+
+
+# =======================
+# VERIFY + REPAIR LOOP
+# =======================
+
+def verify_and_repair(plan: StrokePlan,
+                      start_x: int,
+                      start_y: int,
+                      backend,
+                      passes: int = 1,
+                      rate: float = 0,
+                      ink_threshold: int = None,
+                      slack: int = 0,
+                      settle_s: float = 0.0,
+                      swatches=None,
+                      report=print) -> dict:
+    """
+    Capture the drawn rectangle with backend.capture(), find expected pixels
+    without ink and redraw just those, up to `passes` times or until nothing
+    is missing. A pixel counts as ink when darker than ink_threshold (the
+    plan's threshold by default); settle_s gives the target application
+    time to repaint before each capture. Progress goes to `report`.
+
+    Ink where none was planned can't be undone and is only reported.
+    Returns the missing pixel count at each check and the repair totals.
+    """
+    from core import execute_plan
+
+    report = report or (lambda *args: None)
+    # Capture `slack` px around the rectangle too, so ink just across its
+    # edge (e.g. in the next band) still counts
+    mx, my = min(slack, max(start_x, 0)), min(slack, max(start_y, 0))
+    crop = (slice(my, my + plan.height), slice(mx, mx + plan.width))
+
+    if ink_threshold is None:
+        ink_threshold = plan.meta.get("threshold", 200)
+    layers = expected_layers(plan)
+    expected = np.logical_or.reduce([mask for _, mask in layers])
+    total = int(expected.sum())
+    stats = {"expected_px": total, "missing_px": [], "repair_strokes": 0,
+             "repair_events": 0, "passes": 0}
+
+    for n in range(passes + 1):
+        if settle_s:
+            time.sleep(settle_s)
+        gray = backend.capture(start_x - mx, start_y - my,
+                               plan.width + mx + slack, plan.height + my + slack)
+        ink = ink_mask(gray, ink_threshold, slack)[crop]
+        missing_layers = [(color, mask & ~ink) for color, mask in layers]
+        missing = sum(int(m.sum()) for _, m in missing_layers)
+        stats["missing_px"].append(missing)
+        share = 100.0 * missing / total if total else 0.0
+        if missing == 0 or n == passes:
+            report(f"Verify: {missing:,} of {total:,} pixels missing ({share:.2f}%)"
+                   + (" after repairs." if n else "."))
+            break
+
+        repair = repair_plan(plan, missing_layers)
+        report(f"Verify pass {n + 1}: {missing:,} of {total:,} pixels missing "
+               f"({share:.2f}%), redrawing {repair.num_strokes:,} strokes.")
+        execute_plan(repair, start_x, start_y, rate, backend, swatches=swatches, report=None)
+        stats["passes"] += 1
+        stats["repair_strokes"] += repair.num_strokes
+        stats["repair_events"] += repair.event_count()
+
+    stats["extra_px"] = int(((gray[crop] < ink_threshold) & ~grow(expected, slack)).sum())
+    return stats
+
+
+def verify_bands(bands, start_x: int, start_y: int, backend, passes: int = 1,
+                 report=print, **kwargs) -> dict:
+    """
+    verify_and_repair one band at a time, for streamed plans too big to
+    hold or rasterize whole. `bands` are plans in full-image coordinates
+    with meta["band"] = [top, bottom] (planner.iter_plan_bands,
+    bitmask.iter_mask_bands); each is checked against its own rows of the
+    screen. The summary goes to `report`. Returns the verify_and_repair
+    stats summed over the bands, with missing_px holding the first and the
+    final count.
+    """
+    report = report or (lambda *args: None)
+    totals = {"expected_px": 0, "missing_px": [0, 0], "repair_strokes": 0,
+              "repair_events": 0, "passes": 0, "extra_px": 0}
+    for band in bands:
+        top, bottom = band.meta.get("band", (0, band.height))
+        local = StrokePlan(band.points - np.array([0, top], dtype=np.int32), band.offsets,
+                           pen=band.pen, width=band.width, height=bottom - top,
+                           meta=band.meta, color=band.color)
+        stats = verify_and_repair(local, start_x, start_y + top, backend, passes,
+                                  report=None, **kwargs)
+        for key in ("expected_px", "repair_strokes", "repair_events", "extra_px"):
+            totals[key] += stats[key]
+        totals["missing_px"][0] += stats["missing_px"][0]
+        totals["missing_px"][1] += stats["missing_px"][-1]
+        totals["passes"] = max(totals["passes"], stats["passes"])
+
+    missing, total = totals["missing_px"], totals["expected_px"]
+    report(f"Verify: {missing[0]:,} of {total:,} pixels missing before repairs, "
+          f"{missing[1]:,} after; {totals['repair_strokes']:,} strokes redrawn.")
+    return totals
+
+
+# =======================
+# CLI (simulated canvas)
+# =======================
+
+def main(argv=None) -> int:
+    from PIL import Image
+
+    from backends import SimulatedCanvasBackend
+    from core import execute_plan
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("image")
+    parser.add_argument("--step", type=int, default=1)
+    parser.add_argument("--threshold", type=int, default=200)
+    parser.add_argument("--mode", choices=PLANNER_MODES, default=PLANNER_MODES[0])
+    parser.add_argument("--tolerance", type=float, default=1.0)
+    parser.add_argument("--passes", type=int, default=3)
+    parser.add_argument("--drop-rate", type=float, default=0.02,
+                        help="fraction of moves and presses the canvas loses")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with Image.open(args.image) as img:
+        gray = img.convert("L")
+    plan = compile_plan(gray, args.step, args.threshold, args.mode, args.tolerance)
+    canvas = SimulatedCanvasBackend(plan.width, plan.height,
+                                    drop_rate=args.drop_rate, seed=args.seed)
+    execute_plan(plan, 0, 0, backend=canvas, report=None)
+    print(f"Drew {plan.num_strokes:,} strokes ({plan.event_count():,} events), "
+          f"{canvas.dropped:,} events dropped.")
+
+    stats = verify_and_repair(plan, 0, 0, canvas, passes=args.passes)
+    print(f"{stats['passes']} repair pass(es), {stats['repair_strokes']:,} strokes / "
+          f"{stats['repair_events']:,} events redrawn "
+          f"({100.0 * stats['repair_events'] / max(1, plan.event_count()):.1f}% of a full redraw), "
+          f"{canvas.dropped:,} events dropped in total, "
+          f"{stats['extra_px']:,} stray pixels.")
+    return 0 if stats["missing_px"][-1] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())